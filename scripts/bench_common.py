@@ -0,0 +1,78 @@
+"""Helpers shared by the bench_*.py scripts: summary statistics, run metadata and JSON output.
+
+Every result file has the same envelope so bench_compare.py can diff any two runs of the same kind:
+
+    {"kind": "engines" | "load", "meta": {...}, "results": {...}}
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+from datetime import UTC, datetime
+from pathlib import Path
+
+
+def summarize(samples: list[float]) -> dict[str, float]:
+    """Mean and nearest-rank percentiles of a list of samples."""
+
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pct(p: float) -> float:
+        return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+    return {
+        "mean": statistics.fmean(ordered),
+        "p50": pct(50),
+        "p95": pct(95),
+        "p99": pct(99),
+        "min": ordered[0],
+        "max": ordered[-1],
+    }
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far."""
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macos
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _git(*args: str) -> str:
+    try:
+        return subprocess.run(["git", *args], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def run_metadata() -> dict[str, object]:
+    """Where and on what a run happened, so results from different machines are not compared blindly."""
+
+    from pppp.settings import settings
+
+    return {
+        "timestamp": datetime.now(UTC).isoformat(timespec="seconds"),
+        "git_rev": _git("rev-parse", "--short", "HEAD"),
+        "git_dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "settings": settings.model_dump(mode="json"),
+    }
+
+
+def write_json(path: str, *, kind: str, results: dict, **meta: object) -> None:
+    out = Path(path)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    payload = {"kind": kind, "meta": {**run_metadata(), **meta}, "results": results}
+    out.write_text(json.dumps(payload, indent=2) + "\n")
+    print(f"wrote {out}")
@@ -0,0 +1,105 @@
+"""Compare two result files of the same bench_*.py script (engines, load, startup, ocr_tiles, ocr_gif) and flag
+regressions.
+
+    uv run python scripts/bench_compare.py bench-results/before.json bench-results/after.json
+    uv run python scripts/bench_compare.py before.json after.json --threshold 0.05 --all
+
+Latencies and peak RSS regress when they go up, throughputs when they go down. Exits 1 if any tracked
+metric moved the wrong way by more than ``--threshold`` (relative), so it can gate a CI job.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# (path suffix, higher is better); metrics not listed here are shown with --all but never gate
+TRACKED = (
+    ("latency_ms.p50", False),
+    ("latency_ms.p95", False),
+    ("latency_ms.p99", False),
+    ("p50", False),  # per-stage medians
+    ("peak_rss_mb", False),
+    ("decoded_mb", False),
+    ("load_s", False),
+    ("images_per_s", True),
+    ("throughput_rps", True),
+    ("error_rate", False),
+    ("recall", True),
+    ("speedup", True),
+)
+
+
+def flatten(tree: object, prefix: str = "") -> dict[str, float]:
+    if isinstance(tree, dict):
+        out: dict[str, float] = {}
+        for key, value in tree.items():
+            out.update(flatten(value, f"{prefix}.{key}" if prefix else str(key)))
+        return out
+    if isinstance(tree, int | float) and not isinstance(tree, bool):
+        return {prefix: float(tree)}
+    return {}
+
+
+def direction(path: str) -> bool | None:
+    """True if higher is better, False if lower is better, None if the metric is not tracked."""
+
+    for suffix, higher in TRACKED:
+        if path == suffix or path.endswith(f".{suffix}"):
+            return higher
+    return None
+
+
+def _load(path: str) -> dict:
+    data = json.loads(Path(path).read_text())
+    if "kind" not in data or "results" not in data:
+        raise SystemExit(f"{path} is not a bench result file")
+    return data
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative change that counts, default 10%%")
+    parser.add_argument("--all", action="store_true", help="show every shared metric, not only changed ones")
+    args = parser.parse_args()
+
+    base, cand = _load(args.baseline), _load(args.candidate)
+    if base["kind"] != cand["kind"]:
+        raise SystemExit(f"cannot compare {base['kind']} results with {cand['kind']} results")
+
+    for key in ("cpu_count", "platform", "corpus"):
+        if base["meta"].get(key) != cand["meta"].get(key):
+            print(f"warning: runs differ in {key}, numbers may not be comparable", file=sys.stderr)
+    print(f"baseline  {base['meta'].get('git_rev', '?')} {base['meta'].get('timestamp', '')}")
+    print(f"candidate {cand['meta'].get('git_rev', '?')} {cand['meta'].get('timestamp', '')}\n")
+
+    old, new = flatten(base["results"]), flatten(cand["results"])
+    regressions = 0
+    for path in sorted(old.keys() & new.keys()):
+        higher = direction(path)
+        if higher is None and not args.all:
+            continue
+        a, b = old[path], new[path]
+        change = (b - a) / a if a else (0.0 if b == a else float("inf"))
+        worse = higher is not None and (change < -args.threshold if higher else change > args.threshold)
+        better = higher is not None and (change > args.threshold if higher else change < -args.threshold)
+        if not (worse or better or args.all):
+            continue
+        mark = "REGRESSION" if worse else "improved" if better else ""
+        print(f"{path:70s} {a:12.2f} -> {b:12.2f}  {change:+7.1%}  {mark}")
+        regressions += worse
+
+    for path in sorted(old.keys() ^ new.keys()):
+        if direction(path) is not None:
+            print(f"{path:70s} only in {'baseline' if path in old else 'candidate'}")
+
+    print(f"\n{regressions} regression(s) beyond {args.threshold:.0%}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Synthetic image corpus for the benchmarks, generated locally and byte-for-byte reproducible.
+
+    uv run python scripts/bench_corpus.py                    # list the corpus and its digests
+    uv run python scripts/bench_corpus.py --out corpus/      # also write the images and a manifest.json
+
+Nothing is downloaded: text-heavy PNGs, large photo-like JPEGs and long animated GIFs are drawn from a
+fixed seed, so two machines benchmark exactly the same bytes. The sha256 of each item is printed and
+recorded in every result file; if it changes, results from before and after are not comparable.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+WORDS = (
+    "the quick brown fox jumps over lazy dog invoice total amount due receipt order number shipping "
+    "address subtotal tax payment card ending thank you for your purchase meme caption when you"
+).split()
+
+
+def _font(size: int) -> ImageFont.ImageFont | ImageFont.FreeTypeFont:
+    try:
+        return ImageFont.load_default(size=size)
+    except (TypeError, OSError):
+        # pillow without freetype only has the fixed bitmap font
+        return ImageFont.load_default()
+
+
+def _lines(rng: np.random.Generator, count: int, words: int) -> list[str]:
+    return [" ".join(rng.choice(WORDS, size=words)) for _ in range(count)]
+
+
+def _save(im: Image.Image, fmt: str, **params: object) -> bytes:
+    buf = BytesIO()
+    im.save(buf, fmt, **params)
+    return buf.getvalue()
+
+
+def text_png(rng: np.random.Generator, w: int, h: int, *, font_size: int) -> bytes:
+    im = Image.new("RGB", (w, h), "white")
+    d = ImageDraw.Draw(im)
+    font = _font(font_size)
+    step = int(font_size * 1.4)
+    for i, line in enumerate(_lines(rng, (h - 2 * step) // step, 10)):
+        d.text((step, step + i * step), line, fill="black", font=font)
+    return _save(im, "PNG")
+
+
+def photo_jpeg(rng: np.random.Generator, w: int, h: int) -> bytes:
+    # smooth noise upscaled, so the jpeg is photo-sized rather than a flat colour that compresses to nothing
+    arr = rng.integers(0, 255, (h // 16, w // 16, 3), dtype=np.uint8)
+    im = Image.fromarray(arr).resize((w, h), Image.Resampling.BICUBIC)
+    return _save(im, "JPEG", quality=90)
+
+
+def scrolling_gif(rng: np.random.Generator, w: int, h: int, *, frames: int) -> bytes:
+    """A caption scrolling up a frame at a time, every frame differs."""
+
+    font = _font(20)
+    page = Image.new("RGB", (w, h * 4), "white")
+    d = ImageDraw.Draw(page)
+    for i, line in enumerate(_lines(rng, h * 4 // 28, 5)):
+        d.text((10, 10 + i * 28), line, fill="black", font=font)
+    step = (page.height - h) / max(1, frames - 1)
+    images = [page.crop((0, int(i * step), w, int(i * step) + h)) for i in range(frames)]
+    return _save(images[0], "GIF", save_all=True, append_images=images[1:], duration=40, loop=0)
+
+
+def mostly_static_gif(rng: np.random.Generator, w: int, h: int, *, frames: int, scenes: int) -> bytes:
+    """A few captioned scenes each held for many frames, keyframing should keep about one frame per scene."""
+
+    font = _font(28)
+    images = []
+    for caption in _lines(rng, scenes, 4):
+        base = Image.new("RGB", (w, h), tuple(int(c) for c in rng.integers(40, 200, 3)))
+        ImageDraw.Draw(base).text((20, h - 60), caption, fill="white", font=font)
+        images += [base] * (frames // scenes)
+    return _save(images[0], "GIF", save_all=True, append_images=images[1:], duration=40, loop=0)
+
+
+def make_corpus(*, seed: int = 0, only: list[str] | None = None) -> dict[str, tuple[bytes, str]]:
+    """``{name: (image bytes, content type)}``, the same bytes for the same seed."""
+
+    builders = {
+        "text_png_1280x720": lambda rng: (text_png(rng, 1280, 720, font_size=18), "image/png"),
+        "text_png_a4_1654x2339": lambda rng: (text_png(rng, 1654, 2339, font_size=28), "image/png"),
+        "photo_jpeg_1920x1080": lambda rng: (photo_jpeg(rng, 1920, 1080), "image/jpeg"),
+        "photo_jpeg_4000x3000": lambda rng: (photo_jpeg(rng, 4000, 3000), "image/jpeg"),
+        "gif_scroll_120f_480x270": lambda rng: (scrolling_gif(rng, 480, 270, frames=120), "image/gif"),
+        "gif_static_300f_640x360": lambda rng: (mostly_static_gif(rng, 640, 360, frames=300, scenes=5), "image/gif"),
+    }
+    unknown = set(only or ()) - set(builders)
+    if unknown:
+        raise SystemExit(f"unknown corpus items: {', '.join(sorted(unknown))} (have: {', '.join(builders)})")
+
+    # every item gets its own generator, so selecting a subset does not change the bytes of the others
+    return {
+        name: build(np.random.default_rng([seed, i]))
+        for i, (name, build) in enumerate(builders.items())
+        if not only or name in only
+    }
+
+
+def digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="*", help="corpus item names, default all")
+    parser.add_argument("--out", help="write the images and manifest.json into this directory")
+    args = parser.parse_args()
+
+    corpus = make_corpus(seed=args.seed, only=args.only)
+    manifest = {}
+    for name, (data, content_type) in corpus.items():
+        with Image.open(BytesIO(data)) as im:
+            size, frames = im.size, getattr(im, "n_frames", 1)
+        manifest[name] = {
+            "content_type": content_type,
+            "bytes": len(data),
+            "size": list(size),
+            "frames": frames,
+            "sha256": digest(data),
+        }
+        print(f"{name:26s} {len(data) / 1024:9.1f} KiB  {size[0]}x{size[1]}  {frames:4d} frame(s)  {digest(data)[:12]}")
+
+    if args.out:
+        out = Path(args.out)
+        out.mkdir(parents=True, exist_ok=True)
+        for name, (data, content_type) in corpus.items():
+            (out / f"{name}.{content_type.split('/')[1]}").write_bytes(data)
+        (out / "manifest.json").write_text(json.dumps({"seed": args.seed, "items": manifest}, indent=2) + "\n")
+        print(f"wrote {len(corpus)} images to {out}")
+
+
+if __name__ == "__main__":
+    main()
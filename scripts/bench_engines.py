@@ -0,0 +1,188 @@
+"""Per-engine benchmark: per-stage latency, images/sec and peak RSS on the synthetic corpus.
+
+    uv run python scripts/bench_engines.py                                  # decode, ocr and tags
+    uv run python scripts/bench_engines.py --engine decode decode_ocr decode_tags --repeat 20   # no models needed
+    uv run python scripts/bench_engines.py --json bench-results/engines.json
+    uv run python scripts/bench_compare.py old.json new.json
+
+Each engine runs in its own child process, so its peak RSS covers only that engine's model and work,
+and the model load is timed cold. The parent writes the corpus to a temp dir once and children read
+the files, so generating it never shows up in a child's RSS. Stage timings come from the same tracing
+spans the service exports to /metrics (decode, model_load, preprocess, forward, postprocess), summed
+per image.
+
+``decode`` decodes at full size, ``decode_ocr`` and ``decode_tags`` as small as each engine's decode
+settings allow; ``decoded_mb`` is the size of the RGB frames that come out.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from bench_common import peak_rss_mb, summarize, write_json
+from bench_corpus import digest, make_corpus
+
+ENGINES = ("decode", "decode_ocr", "decode_tags", "ocr", "tags")
+
+
+def _min_side(engine: str) -> int | None:
+    if engine in {"ocr", "decode_ocr"}:
+        from pppp.engine import paddle
+
+        return paddle.decode_min_side()
+    if engine in {"tags", "decode_tags"}:
+        from pppp.engine import rampp
+
+        return rampp.decode_min_side()
+    return None
+
+
+def _runner(engine: str):
+    """``run(image bytes, content type) -> decoded image or result`` for one engine, with its model loaded."""
+
+    from pppp import tracing
+    from pppp.utils.images import decode_image
+
+    min_side = _min_side(engine)
+
+    def decode(data: bytes, content_type: str):
+        with tracing.span("decode"):
+            return decode_image(data, content_type=content_type, min_side=min_side)
+
+    if engine.startswith("decode"):
+        return decode
+
+    if engine == "ocr":
+        from pppp.engine import paddle
+
+        paddle.get_ocr()
+        return lambda data, ct: paddle.ocr_image(decode(data, ct))
+
+    from pppp.engine import rampp
+
+    rampp.load_model()
+    return lambda data, ct: rampp.tag_image(decode(data, ct))
+
+
+def _frames(out) -> tuple[int, float | None]:
+    """Frames analyzed, and for a bare decode the MiB of RGB pixels it produced."""
+
+    if hasattr(out, "frames_analyzed"):
+        return out.frames_analyzed, None
+    return len(out.frames), sum(im.width * im.height * 3 for _index, im in out.frames) / 2**20
+
+
+def run_engine(engine: str, *, corpus: dict[str, tuple[bytes, str]], repeat: int) -> dict:
+    from pppp import tracing
+
+    start = time.perf_counter()
+    with tracing.capture() as load_spans:
+        run = _runner(engine)
+    results: dict = {
+        "load_s": time.perf_counter() - start,
+        "load_stages_s": {s.name: s.duration_s for s in load_spans},
+        "items": {},
+    }
+
+    for name, (data, content_type) in corpus.items():
+        run(data, content_type)  # warm, first-call allocations and lazy init stay out of the numbers
+
+        wall_ms: list[float] = []
+        stages_ms: dict[str, list[float]] = defaultdict(list)
+        frames, decoded_mb = 0, None
+        for _ in range(repeat):
+            with tracing.capture() as spans:
+                t0 = time.perf_counter()
+                out = run(data, content_type)
+                wall_ms.append((time.perf_counter() - t0) * 1000)
+            frames, decoded_mb = _frames(out)
+            del out
+            per_stage: dict[str, float] = defaultdict(float)
+            for s in spans:
+                per_stage[s.name] += s.duration_s * 1000
+            for stage, ms in per_stage.items():
+                stages_ms[stage].append(ms)
+
+        results["items"][name] = {
+            "sha256": digest(data),
+            "frames_analyzed": frames,
+            **({"decoded_mb": decoded_mb} if decoded_mb is not None else {}),
+            "images_per_s": 1000 * len(wall_ms) / sum(wall_ms),
+            "latency_ms": summarize(wall_ms),
+            "stages_ms": {stage: summarize(v) for stage, v in sorted(stages_ms.items())},
+        }
+        print(
+            f"  {engine:11s} {name:26s} p50 {results['items'][name]['latency_ms']['p50']:9.1f} ms"
+            f"  {results['items'][name]['images_per_s']:8.2f} img/s  {frames:3d} frame(s)"
+            + (f"  {decoded_mb:7.1f} MiB decoded" if decoded_mb is not None else ""),
+            file=sys.stderr,
+        )
+
+    results["peak_rss_mb"] = peak_rss_mb()
+    return results
+
+
+def write_corpus(folder: Path, *, seed: int, only: list[str] | None) -> dict[str, str]:
+    index = {}
+    for name, (data, content_type) in make_corpus(seed=seed, only=only).items():
+        (folder / name).write_bytes(data)
+        index[name] = content_type
+    (folder / "index.json").write_text(json.dumps(index))
+    return {name: digest((folder / name).read_bytes()) for name in index}
+
+
+def read_corpus(folder: Path) -> dict[str, tuple[bytes, str]]:
+    index = json.loads((folder / "index.json").read_text())
+    return {name: ((folder / name).read_bytes(), content_type) for name, content_type in index.items()}
+
+
+def _child(args: argparse.Namespace) -> None:
+    corpus = read_corpus(Path(args.corpus))
+    result = run_engine(args.child, corpus=corpus, repeat=args.repeat)
+    Path(args.child_out).write_text(json.dumps(result))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engine", nargs="*", choices=ENGINES, default=list(ENGINES))
+    parser.add_argument("--only", nargs="*", help="corpus item names, default all")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--child", choices=ENGINES, help=argparse.SUPPRESS)
+    parser.add_argument("--child-out", help=argparse.SUPPRESS)
+    parser.add_argument("--corpus", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args)
+        return
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="pppp-corpus-") as folder:
+        corpus = write_corpus(Path(folder), seed=args.seed, only=args.only)
+        for engine in args.engine:
+            print(f"{engine}:", file=sys.stderr)
+            with tempfile.NamedTemporaryFile(suffix=".json") as out:
+                cmd = [sys.executable, __file__, "--child", engine, "--child-out", out.name, "--corpus", folder]
+                cmd += ["--repeat", str(args.repeat)]
+                subprocess.run(cmd, check=True)
+                results[engine] = json.loads(Path(out.name).read_text())
+            print(
+                f"  {engine:11s} load {results[engine]['load_s']:.2f} s"
+                f"  peak rss {results[engine]['peak_rss_mb']:.0f} MiB"
+            )
+
+    if args.json:
+        write_json(args.json, kind="engines", results=results, corpus=corpus, repeat=args.repeat, seed=args.seed)
+
+
+if __name__ == "__main__":
+    main()
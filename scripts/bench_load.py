@@ -0,0 +1,178 @@
+"""HTTP load test: drive the service at a fixed concurrency and report p50/p95/p99 latency and throughput.
+
+    uv run python scripts/bench_load.py --serve                                   # start a local server
+    uv run python scripts/bench_load.py --url http://localhost:8080 --endpoint ocr tags
+    uv run python scripts/bench_load.py --serve --concurrency 16 --requests 400 --json bench-results/load.json
+
+``--serve`` runs ``uvicorn pppp.main:app`` in a subprocess with this environment, so PPPP_* settings
+(serving mode, workers, queue limits) apply to it. Each request posts a corpus image to
+``/<endpoint>/bytes``; unless ``--cache-hits`` is given, a few random bytes are appended after the image
+data so the content-addressed result cache misses and every request reaches an engine.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import os
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+
+import httpx
+from bench_common import summarize, write_json
+from bench_corpus import digest, make_corpus
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(*, startup_timeout_s: float) -> tuple[subprocess.Popen, str]:
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "pppp.main:app", "--port", str(port), "--log-level", "warning"],
+        env=os.environ.copy(),
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + startup_timeout_s
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"server exited with {proc.returncode} during startup")
+        try:
+            if httpx.get(f"{url}/health", timeout=1).status_code == 200:
+                return proc, url
+        except httpx.TransportError:
+            pass
+        time.sleep(0.5)
+    proc.terminate()
+    raise SystemExit(f"server did not become healthy within {startup_timeout_s:.0f}s")
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    *,
+    endpoint: str,
+    corpus: dict[str, tuple[bytes, str]],
+    concurrency: int,
+    requests: int,
+    bust_cache: bool,
+) -> dict:
+    items = itertools.cycle(corpus.items())
+    latencies: list[float] = []
+    server_ms: list[float] = []
+    statuses: Counter[int] = Counter()
+    errors: Counter[str] = Counter()
+    remaining = requests
+
+    async def worker() -> None:
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            _name, (data, content_type) = next(items)
+            body = data + os.urandom(8) if bust_cache else data
+            t0 = time.perf_counter()
+            try:
+                r = await client.post(f"/{endpoint}/bytes", content=body, headers={"content-type": content_type})
+            except httpx.HTTPError as e:
+                errors[type(e).__name__] += 1
+                continue
+            latencies.append((time.perf_counter() - t0) * 1000)
+            statuses[r.status_code] += 1
+            if r.status_code == 200:
+                timings = r.json().get("timings_ms", {})
+                if "total" in timings:
+                    server_ms.append(timings["total"])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    ok = statuses.get(200, 0)
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "elapsed_s": elapsed,
+        "throughput_rps": ok / elapsed,
+        "error_rate": (requests - ok) / requests,
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+        "transport_errors": dict(errors),
+        "latency_ms": summarize(latencies),
+        "server_total_ms": summarize(server_ms),
+    }
+
+
+async def main_async(args: argparse.Namespace, url: str) -> dict:
+    corpus = make_corpus(seed=args.seed, only=args.only)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = {}
+    async with httpx.AsyncClient(base_url=url, timeout=args.timeout, limits=limits) as client:
+        for endpoint in args.endpoint:
+            if args.warmup:
+                await run_load(
+                    client, endpoint=endpoint, corpus=corpus, concurrency=1, requests=args.warmup, bust_cache=True
+                )
+            res = await run_load(
+                client,
+                endpoint=endpoint,
+                corpus=corpus,
+                concurrency=args.concurrency,
+                requests=args.requests,
+                bust_cache=not args.cache_hits,
+            )
+            lat = res["latency_ms"]
+            print(
+                f"{endpoint:8s} c={args.concurrency:<3d} {res['throughput_rps']:7.2f} req/s"
+                f"  p50 {lat.get('p50', 0):8.1f}  p95 {lat.get('p95', 0):8.1f}  p99 {lat.get('p99', 0):8.1f} ms"
+                f"  errors {res['error_rate']:.1%} {res['statuses']}"
+            )
+            results[endpoint] = res
+    return {"results": results, "corpus": {name: digest(data) for name, (data, _ct) in corpus.items()}}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="base url of a running server")
+    target.add_argument("--serve", action="store_true", help="start a local server for the run")
+    parser.add_argument("--endpoint", nargs="*", choices=("ocr", "tags", "analyze"), default=["ocr", "tags"])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=4, help="sequential requests per endpoint before measuring")
+    parser.add_argument("--only", nargs="*", help="corpus item names, default all")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cache-hits", action="store_true", help="send identical bytes, letting the cache answer")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--startup-timeout", type=float, default=300.0)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    proc = None
+    url = args.url
+    if args.serve:
+        proc, url = start_server(startup_timeout_s=args.startup_timeout)
+    try:
+        out = asyncio.run(main_async(args, url))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    if args.json:
+        write_json(
+            args.json,
+            kind="load",
+            results=out["results"],
+            target=url if args.url else "local",
+            corpus=out["corpus"],
+            cache_hits=args.cache_hits,
+        )
+
+
+if __name__ == "__main__":
+    main()
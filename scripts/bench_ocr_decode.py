@@ -0,0 +1,129 @@
+"""Compare the old temp-file still-image OCR input path with in-memory decoding.
+
+    uv run python scripts/bench_ocr_decode.py                 # decode only, no model needed
+    uv run python scripts/bench_ocr_decode.py --with-ocr      # full ocr.ocr() on both inputs
+    uv run python scripts/bench_ocr_decode.py --json out.json
+
+The temp-file path is reproduced here as it was before: write the upload to a NamedTemporaryFile and
+let paddle read it back with cv2.imread. The in-memory path is what ocr_bytes does now.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from io import BytesIO
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+
+def make_corpus() -> dict[str, tuple[bytes, str]]:
+    rng = np.random.default_rng(0)
+
+    def text_png(w: int, h: int) -> bytes:
+        im = Image.new("RGB", (w, h), "white")
+        d = ImageDraw.Draw(im)
+        for y in range(10, h - 20, 24):
+            d.text((10, y), "the quick brown fox jumps over the lazy dog 0123456789", fill="black")
+        buf = BytesIO()
+        im.save(buf, "PNG")
+        return buf.getvalue()
+
+    def photo_jpeg(w: int, h: int) -> bytes:
+        arr = rng.integers(0, 255, (h // 8, w // 8, 3), dtype=np.uint8)
+        im = Image.fromarray(arr).resize((w, h), Image.Resampling.BICUBIC)
+        buf = BytesIO()
+        im.save(buf, "JPEG", quality=90)
+        return buf.getvalue()
+
+    def alpha_png(w: int, h: int) -> bytes:
+        im = Image.new("RGBA", (w, h), (0, 0, 0, 0))
+        ImageDraw.Draw(im).text((10, h // 2), "transparent background", fill=(0, 0, 0, 255))
+        buf = BytesIO()
+        im.save(buf, "PNG")
+        return buf.getvalue()
+
+    return {
+        "text_png_800x600": (text_png(800, 600), ".png"),
+        "alpha_png_800x200": (alpha_png(800, 200), ".png"),
+        "photo_jpeg_1920x1080": (photo_jpeg(1920, 1080), ".jpg"),
+        "photo_jpeg_4000x3000": (photo_jpeg(4000, 3000), ".jpg"),
+    }
+
+
+def tempfile_input(data: bytes, suffix: str, ocr=None):
+    import cv2
+
+    tmp_path = None
+    try:
+        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as f:
+            tmp_path = f.name
+            f.write(data)
+        if ocr is not None:
+            return ocr.ocr(tmp_path, cls=False)
+        return cv2.imread(tmp_path)
+    finally:
+        if tmp_path:
+            os.unlink(tmp_path)
+
+
+def memory_input(data: bytes, ocr=None):
+    from pppp.engine.paddle import _to_bgr
+    from pppp.utils.images import iter_image_frames
+
+    _frame_index, rgb = next(iter(iter_image_frames(data, content_type=None)))
+    bgr = _to_bgr(rgb)
+    if ocr is not None:
+        return ocr.ocr(bgr, cls=False)
+    return bgr
+
+
+def timeit(fn, repeat: int) -> dict[str, float]:
+    fn()  # warm
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        "mean_ms": statistics.fmean(samples),
+        "p50_ms": statistics.median(samples),
+        "min_ms": min(samples),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--with-ocr", action="store_true", help="run the full paddle pipeline, not just decode")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    ocr = None
+    if args.with_ocr:
+        from pppp.engine.paddle import get_ocr
+
+        ocr = get_ocr()
+
+    results = {}
+    for name, (data, suffix) in make_corpus().items():
+        results[name] = {
+            "bytes": len(data),
+            "tempfile": timeit(lambda data=data, suffix=suffix: tempfile_input(data, suffix, ocr), args.repeat),
+            "memory": timeit(lambda data=data: memory_input(data, ocr), args.repeat),
+        }
+        t, m = results[name]["tempfile"]["p50_ms"], results[name]["memory"]["p50_ms"]
+        print(f"{name:24s} tempfile p50 {t:8.1f} ms   memory p50 {m:8.1f} ms   ({t / m:4.2f}x)")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"mode": "ocr" if ocr else "decode", "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
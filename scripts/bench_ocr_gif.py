@@ -0,0 +1,137 @@
+"""Compare pipelined GIF OCR with the serial frame loop: wall clock, CPU utilization and identical output.
+
+    uv run python scripts/bench_ocr_gif.py                               # serial, then 2, 4 and 8 frames at once
+    uv run python scripts/bench_ocr_gif.py --parallelism 4 16 --all-frames --repeat 5
+    uv run python scripts/bench_ocr_gif.py --json bench-results/gif.json
+
+Each mode runs ``paddle.ocr_bytes`` on the animated items of the benchmark corpus in its own process,
+with PPPP_PADDLE_GIF_PARALLELISM and PPPP_PADDLE_PREDICTORS both set to the parallelism, so decoding
+is part of what is timed. ``--all-frames`` turns keyframe selection off, which is the worst case: every
+frame decoded and read.
+
+``cpu_cores`` is process CPU time over wall time, the average number of cores kept busy; ``utilization``
+divides that by the cores the machine has. ``same_text`` checks that the ordered dedup gives exactly the
+serial loop's text and lines, whatever order the frames finished in.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from bench_common import peak_rss_mb, summarize, write_json
+from bench_corpus import digest, make_corpus
+
+
+def gif_items(*, seed: int) -> dict[str, tuple[bytes, str]]:
+    return {name: item for name, item in make_corpus(seed=seed).items() if item[1] == "image/gif"}
+
+
+def output_digest(result) -> str:
+    lines = [(line["text"], line["frames"]) for line in result.lines]
+    return hashlib.sha256(json.dumps([result.text, lines]).encode()).hexdigest()
+
+
+def run_mode(items: dict[str, tuple[bytes, str]], *, repeat: int) -> dict:
+    from pppp.engine import paddle
+
+    start = time.perf_counter()
+    paddle.warmup()
+    load_s = time.perf_counter() - start
+
+    results = {}
+    for name, (data, content_type) in items.items():
+        wall_ms, cpu_cores = [], []
+        for _ in range(repeat):
+            cpu0, t0 = time.process_time(), time.perf_counter()
+            result = paddle.ocr_bytes(data, content_type=content_type)
+            wall, cpu = time.perf_counter() - t0, time.process_time() - cpu0
+            wall_ms.append(wall * 1000)
+            cpu_cores.append(cpu / wall)
+        results[name] = {
+            "latency_ms": summarize(wall_ms),
+            "cpu_cores": summarize(cpu_cores),
+            "utilization": max(cpu_cores) / (os.cpu_count() or 1),
+            "frames_total": result.frames_total,
+            "frames_analyzed": result.frames_analyzed,
+            "lines": len(result.lines),
+            "digest": output_digest(result),
+        }
+    return {"load_s": load_s, "peak_rss_mb": peak_rss_mb(), "images": results}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--parallelism", nargs="*", type=int, default=[2, 4, 8])
+    parser.add_argument("--all-frames", action="store_true", help="disable keyframe selection, read every frame")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--child-out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child_out:
+        Path(args.child_out).write_text(json.dumps(run_mode(gif_items(seed=args.seed), repeat=args.repeat)))
+        return
+
+    # the serial loop is always run, it is what the pipeline is measured against
+    runs = {}
+    for n in [1, *(p for p in args.parallelism if p != 1)]:
+        mode = "serial" if n == 1 else f"parallel_{n}"
+        env = {**os.environ, "PPPP_PADDLE_GIF_PARALLELISM": str(n), "PPPP_PADDLE_PREDICTORS": str(n)}
+        if args.all_frames:
+            env["PPPP_KEYFRAME_ENABLED"] = "false"
+        with tempfile.NamedTemporaryFile(suffix=".json") as out:
+            cmd = [sys.executable, __file__, "--child-out", out.name, "--seed", str(args.seed)]
+            cmd += ["--repeat", str(args.repeat)]
+            proc = subprocess.run(cmd, env=env, check=False)
+            if proc.returncode != 0:
+                print(f"{mode:12s} failed with exit code {proc.returncode}")
+                continue
+            runs[mode] = json.loads(Path(out.name).read_text())
+
+    if "serial" not in runs:
+        raise SystemExit("the serial baseline failed, nothing to compare against")
+
+    base = runs["serial"]["images"]
+    mismatched = []
+    print(
+        f"\n{'image':26s} {'mode':12s} {'frames':>7s} {'p50 ms':>9s} {'speedup':>8s} {'cores':>6s} {'util':>6s}  same"
+    )
+    for name in base:
+        for mode, run in runs.items():
+            r = run["images"][name]
+            r["speedup"] = base[name]["latency_ms"]["p50"] / r["latency_ms"]["p50"]
+            r["same_text"] = r["digest"] == base[name]["digest"]
+            if not r["same_text"]:
+                mismatched.append(f"{name} ({mode})")
+            print(
+                f"{name:26s} {mode:12s} {r['frames_analyzed']:7d} {r['latency_ms']['p50']:9.0f} {r['speedup']:7.2f}x"
+                f" {r['cpu_cores']['p50']:6.2f} {r['utilization']:6.1%}  {'yes' if r['same_text'] else 'NO'}"
+            )
+    print()
+    for mode, run in runs.items():
+        print(f"{mode:12s} load {run['load_s']:6.1f}s  peak rss {run['peak_rss_mb']:6.0f} MiB")
+
+    if args.json:
+        write_json(
+            args.json,
+            kind="ocr_gif",
+            results=runs,
+            repeat=args.repeat,
+            all_frames=args.all_frames,
+            corpus={name: digest(data) for name, (data, _ct) in gif_items(seed=args.seed).items()},
+        )
+    if mismatched:
+        sys.exit(f"output differs from the serial loop: {', '.join(mismatched)}")
+
+
+if __name__ == "__main__":
+    main()
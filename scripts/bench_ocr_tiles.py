@@ -0,0 +1,175 @@
+"""Compare tiled OCR with the single-pass path on very long and very large images: latency, recall, memory.
+
+    uv run python scripts/bench_ocr_tiles.py                              # single pass, tiled on 1 and 4 predictors
+    uv run python scripts/bench_ocr_tiles.py --predictors 1 2 4 8 --repeat 5
+    uv run python scripts/bench_ocr_tiles.py --only screenshot_1080x12000 --json bench-results/tiles.json
+
+The images are drawn here with known text, so recall is exact: the share of drawn lines that come back
+as an OCR line sharing at least ``--match`` of its character trigrams (Jaccard). A small screenshot that
+never tiles is included as a control, its numbers should not move.
+
+Every mode runs in its own process with the model loaded cold, so ``peak_rss_mb`` is comparable between
+them. ``ocr_peak_mb`` is how far above its starting RSS a single OCR call went (Linux only, through
+/proc/self/clear_refs), which is what tiling is meant to bring down.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+from bench_common import peak_rss_mb, summarize, write_json
+from bench_corpus import _font, _lines
+from PIL import Image, ImageDraw
+
+_CLEAR_REFS = Path("/proc/self/clear_refs")
+
+
+def page(rng: np.random.Generator, w: int, h: int, *, font_size: int, words: int) -> tuple[bytes, list[str]]:
+    im = Image.new("RGB", (w, h), "white")
+    d = ImageDraw.Draw(im)
+    font = _font(font_size)
+    step = int(font_size * 1.6)
+    lines = _lines(rng, (h - 2 * step) // step, words)
+    for i, line in enumerate(lines):
+        d.text((step, step + i * step), line, fill="black", font=font)
+    buf = BytesIO()
+    im.save(buf, "PNG")
+    return buf.getvalue(), lines
+
+
+def make_images(*, seed: int, only: list[str] | None) -> dict[str, tuple[bytes, list[str]]]:
+    builders = {
+        "control_1280x720": lambda rng: page(rng, 1280, 720, font_size=18, words=8),
+        "screenshot_1080x12000": lambda rng: page(rng, 1080, 12000, font_size=18, words=6),
+        "scan_a4_2480x3508": lambda rng: page(rng, 2480, 3508, font_size=30, words=10),
+        "banner_7000x600": lambda rng: page(rng, 7000, 600, font_size=20, words=40),
+    }
+    unknown = set(only or ()) - set(builders)
+    if unknown:
+        raise SystemExit(f"unknown images: {', '.join(sorted(unknown))} (have: {', '.join(builders)})")
+    return {
+        name: build(np.random.default_rng([seed, i]))
+        for i, (name, build) in enumerate(builders.items())
+        if not only or name in only
+    }
+
+
+def _status_kb(field: str) -> int:
+    for line in Path("/proc/self/status").read_text().splitlines():
+        if line.startswith(f"{field}:"):
+            return int(line.split()[1])
+    raise KeyError(field)
+
+
+def recall(truth: list[str], found: list[str], *, match: float) -> float:
+    from pppp.engine.dedup import TextIndex, shingles
+
+    index = TextIndex(threshold=match)
+    for text in found:
+        index.add(shingles(text))
+    hits = sum(1 for line in truth if index.seen(shingles(line)))
+    return hits / len(truth) if truth else 1.0
+
+
+def run_mode(images: dict[str, tuple[bytes, list[str]]], *, repeat: int, match: float) -> dict:
+    from pppp.engine import paddle
+    from pppp.utils.images import decode_image
+
+    start = time.perf_counter()
+    paddle.warmup()
+    load_s = time.perf_counter() - start
+
+    results = {}
+    for name, (data, truth) in images.items():
+        decoded = decode_image(data, content_type="image/png", min_side=paddle.decode_min_side())
+        wall_ms, ocr_peak_mb = [], 0.0
+        for _ in range(repeat):
+            if _CLEAR_REFS.exists():
+                _CLEAR_REFS.write_text("5")
+                before = _status_kb("VmRSS")
+            t0 = time.perf_counter()
+            result = paddle.ocr_image(decoded)
+            wall_ms.append((time.perf_counter() - t0) * 1000)
+            if _CLEAR_REFS.exists():
+                ocr_peak_mb = max(ocr_peak_mb, (_status_kb("VmHWM") - before) / 1024)
+        results[name] = {
+            "latency_ms": summarize(wall_ms),
+            "recall": recall(truth, [line["text"] for line in result.lines], match=match),
+            "lines": len(result.lines),
+            "truth_lines": len(truth),
+            "paths": result.paths,
+            "ocr_peak_mb": ocr_peak_mb if _CLEAR_REFS.exists() else None,
+        }
+    return {"load_s": load_s, "peak_rss_mb": peak_rss_mb(), "images": results}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--predictors", nargs="*", type=int, default=[1, 4], help="tiled runs, one per count")
+    parser.add_argument("--only", nargs="*", help="image names, default all")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--match", type=float, default=0.8, help="trigram Jaccard for a line to count as read")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--child-out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child_out:
+        images = make_images(seed=args.seed, only=args.only)
+        Path(args.child_out).write_text(json.dumps(run_mode(images, repeat=args.repeat, match=args.match)))
+        return
+
+    # the single pass is always run, it is what tiling is measured against
+    modes = {"single": {"PPPP_PADDLE_TILE_ENABLED": "false"}}
+    for n in args.predictors:
+        modes[f"tiled_p{n}"] = {"PPPP_PADDLE_TILE_ENABLED": "true", "PPPP_PADDLE_PREDICTORS": str(n)}
+
+    runs = {}
+    for mode, extra_env in modes.items():
+        with tempfile.NamedTemporaryFile(suffix=".json") as out:
+            cmd = [sys.executable, __file__, "--child-out", out.name, "--seed", str(args.seed)]
+            cmd += ["--repeat", str(args.repeat), "--match", str(args.match)]
+            if args.only:
+                cmd += ["--only", *args.only]
+            proc = subprocess.run(cmd, env={**os.environ, **extra_env}, check=False)
+            if proc.returncode != 0:
+                print(f"{mode:10s} failed with exit code {proc.returncode}")
+                continue
+            runs[mode] = json.loads(Path(out.name).read_text())
+
+    if "single" not in runs:
+        raise SystemExit("the single-pass baseline failed, nothing to compare against")
+
+    base = runs["single"]["images"]
+    print(f"\n{'image':24s} {'mode':10s} {'p50 ms':>9s} {'speedup':>8s} {'recall':>7s} {'lines':>7s} {'ocr MiB':>8s}")
+    for name in base:
+        for mode, run in runs.items():
+            r = run["images"][name]
+            r["speedup"] = base[name]["latency_ms"]["p50"] / r["latency_ms"]["p50"]
+            peak = f"{r['ocr_peak_mb']:8.0f}" if r["ocr_peak_mb"] is not None else f"{'-':>8s}"
+            print(
+                f"{name:24s} {mode:10s} {r['latency_ms']['p50']:9.0f} {r['speedup']:7.2f}x {r['recall']:7.3f}"
+                f" {r['lines']:3d}/{r['truth_lines']:<3d} {peak}"
+            )
+    print()
+    for mode, run in runs.items():
+        print(f"{mode:10s} load {run['load_s']:6.1f}s  peak rss {run['peak_rss_mb']:6.0f} MiB")
+    mean_recall = {mode: statistics.fmean(r["recall"] for r in run["images"].values()) for mode, run in runs.items()}
+    print("mean recall  " + "  ".join(f"{mode} {value:.3f}" for mode, value in mean_recall.items()))
+
+    if args.json:
+        write_json(args.json, kind="ocr_tiles", results=runs, repeat=args.repeat, match=args.match)
+
+
+if __name__ == "__main__":
+    main()
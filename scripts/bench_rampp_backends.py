@@ -0,0 +1,183 @@
+"""Compare RAM++ inference backends against eager fp32: throughput and how many of its tags they keep.
+
+    uv run python scripts/bench_rampp_backends.py --images ~/photos/sample     # a local folder of real images
+    uv run python scripts/bench_rampp_backends.py --backend eager int8 --threads 4
+    uv run python scripts/bench_rampp_backends.py --images ~/photos/sample --min-recall 0.95 --json out.json
+
+Without ``--images`` the synthetic benchmark corpus is used, which is fine for speed but says little
+about tag quality; point it at a few hundred representative images for the accuracy numbers.
+
+Each backend runs in its own process (PPPP_RAMPP_BACKEND set, model loaded cold). Its tags for every
+image are compared with eager's: recall is the share of eager's tags it still produces, precision the
+share of its tags eager also produced.
+
+Every backend also tags the first frames of all images in a single call, so the micro-batcher fills whole
+batches (``batch`` is the largest it may build, 1 for torchscript), and fails if any frame's tags differ
+from the ones it gets when sent alone.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from bench_common import peak_rss_mb, summarize, write_json
+from bench_corpus import make_corpus
+
+BACKENDS = ("eager", "int8", "bf16", "compile", "torchscript")
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".webp", ".gif", ".bmp", ".tif", ".tiff"}
+
+
+def load_images(folder: str | None, *, seed: int) -> dict[str, tuple[bytes, str | None]]:
+    if folder is None:
+        return dict(make_corpus(seed=seed).items())
+    paths = sorted(p for p in Path(folder).expanduser().rglob("*") if p.suffix.lower() in IMAGE_SUFFIXES)
+    if not paths:
+        raise SystemExit(f"no images in {folder}")
+    return {p.name: (p.read_bytes(), None) for p in paths}
+
+
+def run_backend(images: dict[str, tuple[bytes, str | None]], *, repeat: int) -> dict:
+    from pppp.engine import rampp
+    from pppp.settings import settings
+    from pppp.utils.images import decode_image
+
+    start = time.perf_counter()
+    rampp.warmup()
+    load_s = time.perf_counter() - start
+
+    tags: dict[str, list[str]] = {}
+    wall_ms: list[float] = []
+    for name, (data, content_type) in images.items():
+        decoded = decode_image(data, content_type=content_type)
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            result = rampp.tag_image(decoded)
+            wall_ms.append((time.perf_counter() - t0) * 1000)
+        tags[name] = result.tags
+
+    # every first frame in one call, so the batcher fills whole batches as it does under concurrent load;
+    # each frame's tags must be the ones it gets when sent alone
+    frames = [decode_image(data, content_type=ct).frames[0][1] for data, ct in images.values()]
+    alone = [rampp.frame_tags(next(rampp.iter_frame_features([(0, im)]))).tags for im in frames]
+    t0 = time.perf_counter()
+    batched = list(rampp.iter_frame_features(enumerate(frames)))
+    batch_s = time.perf_counter() - t0
+    batch_mismatches = [
+        name for name, frame, want in zip(images, batched, alone, strict=True) if rampp.frame_tags(frame).tags != want
+    ]
+
+    return {
+        "backend": settings.rampp_backend,
+        "effective_autocast": str(rampp._autocast) if rampp._autocast else None,
+        "load_s": load_s,
+        "images_per_s": 1000 * len(wall_ms) / sum(wall_ms),
+        "latency_ms": summarize(wall_ms),
+        "peak_rss_mb": peak_rss_mb(),
+        "max_batch_size": rampp.get_batcher().max_batch_size,
+        "batched_images_per_s": len(frames) / batch_s,
+        "batch_mismatches": batch_mismatches,
+        "tags": tags,
+    }
+
+
+def agreement(baseline: dict[str, list[str]], candidate: dict[str, list[str]]) -> dict[str, float]:
+    recall, precision, jaccard = [], [], []
+    for name, want in baseline.items():
+        a, b = set(want), set(candidate.get(name, []))
+        both = len(a & b)
+        recall.append(both / len(a) if a else 1.0)
+        precision.append(both / len(b) if b else 1.0)
+        jaccard.append(both / len(a | b) if a | b else 1.0)
+    return {
+        "recall": statistics.fmean(recall),
+        "precision": statistics.fmean(precision),
+        "jaccard": statistics.fmean(jaccard),
+        "worst_recall": min(recall),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", nargs="*", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--images", help="folder of images to tag, default the synthetic corpus")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=0, help="PPPP_RAMPP_NUM_THREADS for every backend")
+    parser.add_argument("--min-recall", type=float, help="exit 1 if a backend's mean recall is below this")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--child-out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child_out:
+        images = load_images(args.images, seed=args.seed)
+        Path(args.child_out).write_text(json.dumps(run_backend(images, repeat=args.repeat)))
+        return
+
+    # eager is always run, it is what everything else is measured against
+    backends = ["eager", *(b for b in args.backend if b != "eager")]
+    runs = {}
+    for backend in backends:
+        env = {**os.environ, "PPPP_RAMPP_BACKEND": backend, "PPPP_RAMPP_NUM_THREADS": str(args.threads)}
+        with tempfile.NamedTemporaryFile(suffix=".json") as out:
+            cmd = [sys.executable, __file__, "--child-out", out.name, "--seed", str(args.seed)]
+            cmd += ["--repeat", str(args.repeat)]
+            if args.images:
+                cmd += ["--images", args.images]
+            proc = subprocess.run(cmd, env=env, check=False)
+            if proc.returncode != 0:
+                print(f"{backend:12s} failed with exit code {proc.returncode}")
+                continue
+            runs[backend] = json.loads(Path(out.name).read_text())
+
+    if "eager" not in runs:
+        raise SystemExit("the eager baseline failed, nothing to compare against")
+
+    base = runs["eager"]
+    results = {}
+    failed = []
+    print(
+        f"\n{'backend':12s} {'img/s':>8s} {'speedup':>8s} {'batch':>5s} {'batch/s':>8s} {'recall':>7s} {'prec':>7s}"
+        f" {'worst':>7s} {'rss MiB':>8s}"
+    )
+    for backend, run in runs.items():
+        agree = agreement(base["tags"], run["tags"])
+        results[backend] = {
+            **{k: v for k, v in run.items() if k != "tags"},
+            "speedup": run["images_per_s"] / base["images_per_s"],
+            **agree,
+        }
+        r = results[backend]
+        print(
+            f"{backend:12s} {r['images_per_s']:8.2f} {r['speedup']:7.2f}x {r['max_batch_size']:5d}"
+            f" {r['batched_images_per_s']:8.2f} {r['recall']:7.3f} {r['precision']:7.3f}"
+            f" {r['worst_recall']:7.3f} {r['peak_rss_mb']:8.0f}"
+        )
+        if args.min_recall is not None and agree["recall"] < args.min_recall:
+            failed.append(backend)
+        if r["batch_mismatches"]:
+            failed.append(backend)
+            print(f"{'':12s} tags differ when batched: {', '.join(r['batch_mismatches'])}")
+
+    if args.json:
+        write_json(
+            args.json,
+            kind="rampp_backends",
+            results=results,
+            images=args.images or "synthetic",
+            image_count=len(base["tags"]),
+            threads=args.threads,
+        )
+    if failed:
+        sys.exit(f"recall below {args.min_recall} or tags differing when batched: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Cold start benchmark: how long ``import pppp.main`` and the first /health answer take, per engine set.
+
+    uv run python scripts/bench_startup.py                                   # both engines, paddle only, rampp only
+    uv run python scripts/bench_startup.py --engines paddle --repeat 10 --importtime
+    uv run python scripts/bench_startup.py --json bench-results/startup.json
+    uv run python scripts/bench_compare.py old.json new.json
+
+Every run is a fresh interpreter with PPPP_ENGINES_ENABLED set. ``process_s`` is the child's wall time
+from spawn to exit as the parent sees it; ``import_s`` the ``import pppp.main`` alone; ``health_s`` the
+lifespan startup plus one /health request. Startup warmup is off (PPPP_WARMUP_ON_START=false), so the
+numbers are what a pod pays before it can answer probes, not the model load that follows.
+
+Each run also checks which heavy libraries got imported, and sniffs one PNG to confirm that the
+signature fast path answers without loading Magika. ``--importtime`` prints the slowest modules of
+one extra run from ``python -X importtime``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from bench_common import peak_rss_mb, summarize, write_json
+
+ENGINE_SETS = ("paddle,rampp", "paddle", "rampp")
+HEAVY_MODULES = ("torch", "transformers", "ram", "paddle", "paddleocr", "magika", "onnxruntime")
+
+
+def child() -> dict:
+    start = time.perf_counter()
+    import pppp.main
+
+    import_s = time.perf_counter() - start
+
+    import asyncio
+
+    import httpx
+
+    async def first_health() -> float:
+        t0 = time.perf_counter()
+        async with pppp.main.lifespan(pppp.main.app):
+            transport = httpx.ASGITransport(app=pppp.main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                resp = await client.get("/health")
+                resp.raise_for_status()
+                return time.perf_counter() - t0
+
+    health_s = asyncio.run(first_health())
+    after_start = sorted(m for m in HEAVY_MODULES if m in sys.modules)
+
+    from PIL import Image
+
+    from pppp.api.image_io import detect_mime_type
+
+    buf = io.BytesIO()
+    Image.new("RGB", (8, 8)).save(buf, "PNG")
+    t0 = time.perf_counter()
+    detect_mime_type(buf.getvalue())
+    sniff_us = (time.perf_counter() - t0) * 1e6
+
+    return {
+        "import_s": import_s,
+        "health_s": health_s,
+        "sniff_us": sniff_us,
+        "magika_after_sniff": "magika" in sys.modules,
+        "heavy_modules": after_start,
+        "modules": len(sys.modules),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def run_once(engines: str, *, extra: list[str] | None = None) -> tuple[dict, float, str]:
+    env = {
+        **os.environ,
+        "PPPP_ENGINES_ENABLED": json.dumps(engines.split(",")),
+        "PPPP_WARMUP_ON_START": "false",
+    }
+    with tempfile.NamedTemporaryFile(suffix=".json") as out:
+        cmd = [sys.executable, *(extra or []), __file__, "--child-out", out.name]
+        start = time.perf_counter()
+        proc = subprocess.run(cmd, env=env, capture_output=True, text=True, check=False)
+        process_s = time.perf_counter() - start
+        if proc.returncode != 0:
+            raise SystemExit(f"startup with engines={engines} failed:\n{proc.stderr[-2000:]}")
+        return json.loads(Path(out.name).read_text()), process_s, proc.stderr
+
+
+def slowest_imports(stderr: str, *, top: int) -> list[tuple[float, str]]:
+    """(cumulative seconds, module) of the slowest imports in ``-X importtime`` output, nested ones included."""
+
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _self_us, cumulative_us, name = (part.strip() for part in line.removeprefix("import time:").split("|"))
+        if cumulative_us.isdigit():
+            rows.append((int(cumulative_us) / 1e6, name))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engines", nargs="*", choices=ENGINE_SETS, default=list(ENGINE_SETS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--importtime", action="store_true", help="print the slowest imports of each engine set")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--child-out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child_out:
+        Path(args.child_out).write_text(json.dumps(child()))
+        return
+
+    results = {}
+    print(f"{'engines':14s} {'process s':>10s} {'import s':>9s} {'health s':>9s} {'rss MiB':>8s}  heavy modules")
+    for engines in args.engines:
+        runs = [run_once(engines) for _ in range(args.repeat)]
+        last = runs[-1][0]
+        results[engines] = {
+            "process_s": summarize([process_s for _run, process_s, _stderr in runs]),
+            "import_s": summarize([run["import_s"] for run, _process_s, _stderr in runs]),
+            "health_s": summarize([run["health_s"] for run, _process_s, _stderr in runs]),
+            "sniff_us": summarize([run["sniff_us"] for run, _process_s, _stderr in runs]),
+            "peak_rss_mb": max(run["peak_rss_mb"] for run, _process_s, _stderr in runs),
+            "modules": last["modules"],
+            "heavy_modules": last["heavy_modules"],
+            "magika_after_sniff": last["magika_after_sniff"],
+        }
+        r = results[engines]
+        print(
+            f"{engines:14s} {r['process_s']['p50']:10.2f} {r['import_s']['p50']:9.2f} {r['health_s']['p50']:9.3f}"
+            f" {r['peak_rss_mb']:8.0f}  {', '.join(r['heavy_modules']) or '-'}"
+        )
+        if r["magika_after_sniff"]:
+            print(f"{'':14s} warning: sniffing a PNG loaded Magika, the signature fast path was missed")
+
+        if args.importtime:
+            _run, _process_s, stderr = run_once(engines, extra=["-X", "importtime"])
+            for seconds, name in slowest_imports(stderr, top=15):
+                print(f"{'':14s} {seconds:8.3f}s  {name}")
+
+    if args.json:
+        write_json(args.json, kind="startup", results=results, repeat=args.repeat)
+
+
+if __name__ == "__main__":
+    main()
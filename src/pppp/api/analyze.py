@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+# built-in
+from typing import Literal
+
+# external
+from fastapi import APIRouter, Body, HTTPException, Query
+
+# project
+from pppp.api.image_io import decode_image_b64, fetch_image
+from pppp.api.models import AnalyzeResponse, OcrB64Request, OcrUrlRequest
+from pppp.api.pipeline import run_analyze
+from pppp.settings import settings
+
+router = APIRouter(tags=["analyze"])
+
+EnginesQuery = Query(["ocr", "tags"], description="Engines to run on the image")
+
+
+@router.post("/analyze/bytes", response_model=AnalyzeResponse)
+async def analyze_bytes_endpoint(
+    *,
+    image: bytes = Body(..., description="Raw image bytes"),
+    engines: list[Literal["ocr", "tags"]] = EnginesQuery,
+    verbose: bool = False,
+    top_k: int = 50,
+) -> AnalyzeResponse:
+    if not image:
+        raise HTTPException(status_code=400, detail="empty body")
+    if len(image) > settings.max_image_bytes:
+        raise HTTPException(status_code=413, detail="image too large")
+
+    return await run_analyze(image, engines=set(engines), verbose=verbose, top_k=top_k)
+
+
+@router.post("/analyze/url", response_model=AnalyzeResponse)
+async def analyze_url_endpoint(
+    *,
+    payload: OcrUrlRequest,
+    engines: list[Literal["ocr", "tags"]] = EnginesQuery,
+    verbose: bool = False,
+    top_k: int = 50,
+) -> AnalyzeResponse:
+    fetch_timings: dict[str, int] = {}
+    image_bytes = await fetch_image(payload.image_url, timings=fetch_timings)
+    if not image_bytes:
+        raise HTTPException(status_code=400, detail="empty image_url")
+
+    return await run_analyze(
+        image_bytes,
+        engines=set(engines),
+        verbose=verbose,
+        top_k=top_k,
+        fetch_timings=fetch_timings,
+    )
+
+
+@router.post("/analyze/b64", response_model=AnalyzeResponse)
+async def analyze_b64_endpoint(
+    *,
+    payload: OcrB64Request,
+    engines: list[Literal["ocr", "tags"]] = EnginesQuery,
+    verbose: bool = False,
+    top_k: int = 50,
+) -> AnalyzeResponse:
+    image_bytes = decode_image_b64(payload.image_b64)
+
+    if not image_bytes:
+        raise HTTPException(status_code=400, detail="empty image_b64")
+    if len(image_bytes) > settings.max_image_bytes:
+        raise HTTPException(status_code=413, detail="image too large")
+
+    return await run_analyze(image_bytes, engines=set(engines), verbose=verbose, top_k=top_k)
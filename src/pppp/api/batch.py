@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+# built-in
+import asyncio
+import logging
+import time
+from typing import TYPE_CHECKING
+
+# external
+from fastapi import HTTPException
+
+# project
+from pppp.api.image_io import decode_image_b64, fetch_image
+from pppp.api.models import BatchItemError
+from pppp.engine.executor import EngineBusyError
+from pppp.settings import settings
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator, Awaitable, Callable
+
+    from fastapi import UploadFile
+
+    from pppp.api.models import BatchRequest
+
+    # loads one item's image, returning its bytes and any fetch timings
+    BatchSource = Callable[[], Awaitable[tuple[bytes, dict[str, int]]]]
+
+logger = logging.getLogger(__name__)
+
+
+def _check_size(image_bytes: bytes, *, empty_detail: str) -> bytes:
+    if not image_bytes:
+        raise HTTPException(status_code=400, detail=empty_detail)
+    if len(image_bytes) > settings.max_image_bytes:
+        raise HTTPException(status_code=413, detail="image too large")
+    return image_bytes
+
+
+def _check_count(count: int) -> None:
+    if count > settings.batch_max_items:
+        raise HTTPException(status_code=413, detail=f"batch has {count} items, limit is {settings.batch_max_items}")
+
+
+def request_sources(payload: BatchRequest) -> list[BatchSource]:
+    """Loaders for JSON batch items, with URL fetches bounded by ``batch_fetch_concurrency``."""
+
+    _check_count(len(payload.items))
+    fetch_sem = asyncio.Semaphore(max(1, settings.batch_fetch_concurrency))
+
+    def _source(image_url: str | None, image_b64: str | None) -> BatchSource:
+        async def _load() -> tuple[bytes, dict[str, int]]:
+            if image_url is not None:
+                timings: dict[str, int] = {}
+                async with fetch_sem:
+                    image_bytes = await fetch_image(image_url, timings=timings)
+                return _check_size(image_bytes, empty_detail="empty image_url"), timings
+            return _check_size(decode_image_b64(image_b64 or ""), empty_detail="empty image_b64"), {}
+
+        return _load
+
+    return [_source(item.image_url, item.image_b64) for item in payload.items]
+
+
+def upload_sources(files: list[UploadFile]) -> list[BatchSource]:
+    """Loaders for multipart file parts."""
+
+    _check_count(len(files))
+
+    def _source(upload: UploadFile) -> BatchSource:
+        async def _load() -> tuple[bytes, dict[str, int]]:
+            if upload.size is not None and upload.size > settings.max_image_bytes:
+                raise HTTPException(status_code=413, detail="image too large")
+            return _check_size(await upload.read(), empty_detail="empty file"), {}
+
+        return _load
+
+    return [_source(f) for f in files]
+
+
+async def iter_batch[R](
+    sources: list[BatchSource],
+    run: Callable[[bytes, dict[str, int]], Awaitable[R]],
+) -> AsyncIterator[tuple[int, R | None, BatchItemError | None]]:
+    """Load and process every item concurrently, yielding ``(index, result, error)`` as each one finishes.
+
+    Per-item failures become errors instead of raising.
+    """
+
+    run_sem = asyncio.Semaphore(max(1, settings.batch_concurrency))
+
+    async def _one(index: int, load: BatchSource) -> tuple[int, R | None, BatchItemError | None]:
+        try:
+            image_bytes, fetch_timings = await load()
+            async with run_sem:
+                return index, await run(image_bytes, fetch_timings), None
+        except HTTPException as e:
+            return index, None, BatchItemError(status_code=e.status_code, detail=str(e.detail))
+        except EngineBusyError as e:
+            return index, None, BatchItemError(status_code=e.status_code, detail=e.detail)
+        except Exception:
+            logger.exception("batch item %d failed", index)
+            return index, None, BatchItemError(status_code=500, detail="failed to process image")
+
+    tasks = [asyncio.ensure_future(_one(i, load)) for i, load in enumerate(sources)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # a client that hangs up mid-stream leaves the rest of the batch unwanted
+        for task in tasks:
+            task.cancel()
+
+
+async def run_batch[R](
+    sources: list[BatchSource],
+    run: Callable[[bytes, dict[str, int]], Awaitable[R]],
+) -> tuple[list[tuple[R | None, BatchItemError | None]], dict[str, int]]:
+    """Process every item and return the outcomes in request order."""
+
+    start = time.perf_counter()
+
+    outcomes: list[tuple[R | None, BatchItemError | None]] = [(None, None)] * len(sources)
+    async for index, result, error in iter_batch(sources, run):
+        outcomes[index] = (result, error)
+
+    return outcomes, {"total": int((time.perf_counter() - start) * 1000)}
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+# external
+from fastapi import APIRouter, Body, HTTPException
+
+# project
+from pppp.api.image_io import decode_image_b64, fetch_image
+from pppp.api.models import EmbedResponse, OcrB64Request, OcrUrlRequest
+from pppp.api.pipeline import run_embed
+from pppp.settings import settings
+
+router = APIRouter(tags=["embed"])
+
+
+@router.post("/embed/bytes", response_model=EmbedResponse)
+async def embed_bytes_endpoint(image: bytes = Body(..., description="Raw image bytes")) -> EmbedResponse:
+    if not image:
+        raise HTTPException(status_code=400, detail="empty body")
+    if len(image) > settings.max_image_bytes:
+        raise HTTPException(status_code=413, detail="image too large")
+
+    return await run_embed(image)
+
+
+@router.post("/embed/url", response_model=EmbedResponse)
+async def embed_url_endpoint(payload: OcrUrlRequest) -> EmbedResponse:
+    fetch_timings: dict[str, int] = {}
+    image_bytes = await fetch_image(payload.image_url, timings=fetch_timings)
+    if not image_bytes:
+        raise HTTPException(status_code=400, detail="empty image_url")
+
+    return await run_embed(image_bytes, fetch_timings=fetch_timings)
+
+
+@router.post("/embed/b64", response_model=EmbedResponse)
+async def embed_b64_endpoint(payload: OcrB64Request) -> EmbedResponse:
+    image_bytes = decode_image_b64(payload.image_b64)
+
+    if not image_bytes:
+        raise HTTPException(status_code=400, detail="empty image_b64")
+    if len(image_bytes) > settings.max_image_bytes:
+        raise HTTPException(status_code=413, detail="image too large")
+
+    return await run_embed(image_bytes)
@@ -1,27 +1,95 @@
 from __future__ import annotations
 
 # built-in
-import base64
+import binascii
+import functools
+import importlib.util
+import logging
 import re
+import time
+from threading import Lock
+from typing import TYPE_CHECKING, Any
 from urllib.parse import urlparse
 
 # external
 import httpx
 from fastapi import HTTPException
-from magika import Magika
 
 # project
+from pppp import tracing
 from pppp.settings import settings
+from pppp.utils.images import ImageTooLargeError, check_image_size
 
-_magika = Magika()
+if TYPE_CHECKING:
+    from urllib.parse import ParseResult
+
+    from magika import Magika
+
+logger = logging.getLogger(__name__)
+
+_lock = Lock()
+_client: httpx.AsyncClient | None = None
+
+_magika_lock = Lock()
+_magika: Magika | None = None
+
+# starting size of the body buffer when the response does not declare its length
+_UNDECLARED_BUFFER_BYTES = 256 * 1024
+
+# leading bytes of the formats we accept; anything else goes to Magika
+_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"II*\x00", "image/tiff"),
+    (b"MM\x00*", "image/tiff"),
+)
+# "BM" alone is too weak to trust, the DIB header that follows is one of these sizes
+_BMP_HEADER_SIZES = frozenset({12, 40, 52, 56, 64, 108, 124})
+
+
+def _get_magika() -> Magika:
+    """Get the Magika singleton, loading it (and onnxruntime) only once a file needs it."""
+
+    global _magika
+    if _magika is not None:
+        return _magika
+
+    with _magika_lock:
+        if _magika is None:
+            _magika = importlib.import_module("magika").Magika()
+        return _magika
+
+
+def _signature_mime_type(image_bytes: bytes) -> str | None:
+    for magic, ct in _SIGNATURES:
+        if image_bytes.startswith(magic):
+            return ct
+    if image_bytes[:4] == b"RIFF" and image_bytes[8:12] == b"WEBP":
+        return "image/webp"
+    dib_header_size = image_bytes[14:18]
+    # a cut-off size field would still read as a small number
+    if (
+        image_bytes[:2] == b"BM"
+        and len(dib_header_size) == 4
+        and int.from_bytes(dib_header_size, "little") in _BMP_HEADER_SIZES
+    ):
+        return "image/bmp"
+    return None
 
 
 def detect_mime_type(image_bytes: bytes) -> str:
-    try:
-        res = _magika.identify_bytes(image_bytes)
-        ct = (getattr(res.output, "mime_type", None) or "").strip().lower()
-    except Exception:
-        raise HTTPException(status_code=415, detail="unable to detect image mime type")
+    """Mime type from the file signature, or from Magika for anything the signatures do not cover."""
+
+    with tracing.span("sniff"):
+        ct = _signature_mime_type(image_bytes)
+        if ct is None:
+            try:
+                res = _get_magika().identify_bytes(image_bytes)
+                ct = (getattr(res.output, "mime_type", None) or "").strip().lower()
+            except Exception:
+                raise HTTPException(status_code=415, detail="unable to detect image mime type") from None
 
     if not ct or not isinstance(ct, str):
         raise HTTPException(status_code=415, detail="unable to detect image mime type")
@@ -42,77 +110,232 @@ def detect_mime_type(image_bytes: bytes) -> str:
     return ct
 
 
+def sniff_image(image_bytes: bytes) -> str:
+    """Detect the mime type, then refuse images whose header claims more pixels than we will decode."""
+
+    ct = detect_mime_type(image_bytes)
+    try:
+        check_image_size(image_bytes)
+    except ImageTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e)) from e
+    return ct
+
+
 def decode_image_b64(image_b64: str) -> bytes:
-    """Decode base64-encoded image data."""
+    """Decode base64-encoded image data.
+
+    Oversized payloads are refused from their length alone. binascii reads an ASCII str in place,
+    unlike ``base64.b64decode`` which first encodes the whole string to a second bytes copy.
+    """
+
+    if len(image_b64) * 3 // 4 - image_b64[-2:].count("=") > settings.max_image_bytes:
+        raise HTTPException(status_code=413, detail="image too large")
 
     try:
-        return base64.b64decode(image_b64, validate=True)
-    except Exception:
-        raise HTTPException(status_code=400, detail="invalid image_b64")
+        # strict mode rejects anything outside the alphabet and misplaced padding, like validate=True did
+        return binascii.a2b_base64(image_b64, strict_mode=True)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid image_b64") from None
+
+
+@functools.cache
+def _host_re() -> re.Pattern[str] | None:
+    try:
+        return re.compile(settings.image_url_host_regex, re.IGNORECASE)
+    except re.error:
+        return None
+
+
+def _validate_parsed(p: ParseResult, *, context: str) -> None:
+    scheme = (p.scheme or "").lower()
+    if scheme not in {"http", "https"}:
+        raise HTTPException(status_code=400, detail=f"{context} must be http(s)")
+    if not p.hostname:
+        raise HTTPException(status_code=400, detail=f"{context} is invalid")
+
+    hostname = p.hostname.lower().strip(".")
+    is_local = hostname in {"localhost", "127.0.0.1", "::1"}
 
+    if scheme == "http" and not is_local:
+        raise HTTPException(
+            status_code=400,
+            detail=f"{context} must use https (http allowed for localhost)",
+        )
 
-async def fetch_image(url: str) -> bytes:
-    """Fetch image bytes from a remote URL."""
+    host_re = _host_re()
+    if host_re is None:
+        raise HTTPException(
+            status_code=500,
+            detail="server misconfigured: invalid image_url_host_regex",
+        )
 
-    def _validate_parsed(p, *, context: str) -> None:
-        scheme = (p.scheme or "").lower()
-        if scheme not in {"http", "https"}:
-            raise HTTPException(status_code=400, detail=f"{context} must be http(s)")
-        if not p.hostname:
-            raise HTTPException(status_code=400, detail=f"{context} is invalid")
+    if not host_re.fullmatch(hostname):
+        raise HTTPException(status_code=400, detail=f"{context} host is not allowed")
 
-        hostname = p.hostname.lower().strip(".")
-        is_local = hostname in {"localhost", "127.0.0.1", "::1"}
 
-        if scheme == "http" and not is_local:
-            raise HTTPException(
-                status_code=400,
-                detail=f"{context} must use https (http allowed for localhost)",
-            )
+def validate_image_url(url: str) -> None:
+    """Reject an image_url that :func:`fetch_image` would refuse, without fetching it."""
 
-        try:
-            host_re = re.compile(settings.image_url_host_regex, re.IGNORECASE)
-        except re.error:
-            raise HTTPException(
-                status_code=500,
-                detail="server misconfigured: invalid image_url_host_regex",
-            )
+    _validate_parsed(urlparse(url), context="image_url")
 
-        if not host_re.fullmatch(hostname):
-            raise HTTPException(status_code=400, detail=f"{context} host is not allowed")
+
+def _make_client() -> httpx.AsyncClient:
+    http2 = settings.fetch_http2 and importlib.util.find_spec("h2") is not None
+    if settings.fetch_http2 and not http2:
+        logger.warning("fetch_http2 is set but the h2 package is not installed, falling back to HTTP/1.1")
+
+    return httpx.AsyncClient(
+        follow_redirects=True,
+        timeout=settings.fetch_timeout_s,
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=settings.fetch_max_connections,
+            max_keepalive_connections=settings.fetch_max_keepalive_connections,
+            keepalive_expiry=settings.fetch_keepalive_expiry_s,
+        ),
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get the shared fetch client, so connections to the image hosts are reused across requests."""
+
+    global _client
+    if _client is not None:
+        return _client
+
+    with _lock:
+        if _client is None:
+            _client = _make_client()
+        return _client
+
+
+async def close_http_client() -> None:
+    global _client
+    with _lock:
+        client, _client = _client, None
+    if client is not None:
+        await client.aclose()
+
+
+class _FetchTrace:
+    """Collects connection phase timings from httpcore's trace extension, summed over redirect hops.
+
+    Phases that did not happen (no new connection because one was reused from the pool) stay at 0.
+    """
+
+    def __init__(self) -> None:
+        self.ms = {"fetch_connect": 0.0, "fetch_tls": 0.0, "fetch_ttfb": 0.0}
+        self._started: dict[str, float] = {}
+
+    async def __call__(self, event_name: str, _info: dict[str, Any]) -> None:
+        name, _, stage = event_name.rpartition(".")
+        now = time.perf_counter()
+
+        # request headers going out to response headers coming back, per protocol prefix (http11/http2)
+        if name.endswith(".send_request_headers") and stage == "started":
+            self._started["ttfb"] = now
+        elif name.endswith(".receive_response_headers") and stage == "complete":
+            self._add("fetch_ttfb", "ttfb", now)
+        elif name == "connection.connect_tcp":
+            self._phase("fetch_connect", name, stage, now)
+        elif name == "connection.start_tls":
+            self._phase("fetch_tls", name, stage, now)
+
+    def _phase(self, key: str, name: str, stage: str, now: float) -> None:
+        if stage == "started":
+            self._started[name] = now
+        elif stage in {"complete", "failed"}:
+            self._add(key, name, now)
+
+    def _add(self, key: str, name: str, now: float) -> None:
+        started = self._started.pop(name, None)
+        if started is not None:
+            self.ms[key] += (now - started) * 1000
+
+
+async def fetch_image(url: str, *, timings: dict[str, int] | None = None) -> bytearray:
+    """Fetch image bytes from a remote URL.
+
+    The body is read into one buffer sized from Content-Length, which is handed on as is rather
+    than copied into ``bytes``.
+
+    If ``timings`` is given it is filled with the connect, TLS, time-to-first-byte and body transfer
+    times in ms (``fetch_*``) plus the whole fetch as ``fetch``.
+    """
 
     parsed = urlparse(url)
     _validate_parsed(parsed, context="image_url")
 
+    with tracing.span("fetch", host=parsed.hostname or ""):
+        return await _fetch(url, timings=timings)
+
+
+async def _read_body(resp: httpx.Response, *, capacity: int) -> bytearray:
+    """Copy the body through a memoryview into a buffer of ``capacity`` bytes, trimmed to the body.
+
+    The body is never held twice, as a list of chunks and then joined, and never exceeds
+    max_image_bytes.
+    """
+
+    buf = bytearray(capacity)
+    view = memoryview(buf)
+    size = 0
     try:
-        async with httpx.AsyncClient(
-            follow_redirects=True,
-            timeout=settings.fetch_timeout_s,
-        ) as client, client.stream("GET", url) as resp:
+        async for chunk in resp.aiter_bytes():
+            end = size + len(chunk)
+            if end > settings.max_image_bytes:
+                raise HTTPException(status_code=413, detail="image_url image too large")
+            if end <= len(buf):
+                view[size:end] = chunk
+            else:
+                # no or a compressed Content-Length: append from here on. A bytearray grows by realloc, in place
+                # when the allocator can, otherwise a growth step briefly holds the old and the new buffer
+                view.release()
+                del buf[size:]
+                buf += chunk
+            size = end
+    finally:
+        view.release()
+
+    # in place, the buffer is only ever longer than the body
+    del buf[size:]
+    return buf
+
+
+async def _fetch(url: str, *, timings: dict[str, int] | None) -> bytearray:
+    start = time.perf_counter()
+    trace = _FetchTrace()
+
+    try:
+        async with get_http_client().stream("GET", url, extensions={"trace": trace}) as resp:
             _validate_parsed(urlparse(str(resp.url)), context="image_url (final)")
 
             if resp.status_code < 200 or resp.status_code >= 300:
                 raise HTTPException(status_code=400, detail=f"image_url returned {resp.status_code}")
 
-            size = 0
-            chunks: list[bytes] = []
+            declared = resp.headers.get("content-length", "")
+            if declared.isdigit() and int(declared) > settings.max_image_bytes:
+                # no point reading a body we are going to refuse
+                raise HTTPException(status_code=413, detail="image_url image too large")
+
+            transfer_start = time.perf_counter()
+            capacity = int(declared) if declared.isdigit() else _UNDECLARED_BUFFER_BYTES
             try:
-                async for chunk in resp.aiter_bytes():
-                    if not chunk:
-                        continue
-                    size += len(chunk)
-                    if size > settings.max_image_bytes:
-                        raise HTTPException(status_code=413, detail="image_url image too large")
-                    chunks.append(chunk)
+                data = await _read_body(resp, capacity=capacity)
             except HTTPException:
                 raise
             except Exception:
                 raise HTTPException(status_code=400, detail="failed to read image_url response")
 
-            data = b"".join(chunks)
             if not data:
                 raise HTTPException(status_code=400, detail="image_url returned empty body")
 
+            if timings is not None:
+                end = time.perf_counter()
+                timings.update({key: int(ms) for key, ms in trace.ms.items()})
+                timings["fetch_transfer"] = int((end - transfer_start) * 1000)
+                timings["fetch"] = int((end - start) * 1000)
+
             return data
     except HTTPException:
         raise
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+# built-in
+import functools
+import re
+from typing import TYPE_CHECKING, Literal
+from urllib.parse import urlparse
+
+# external
+from fastapi import APIRouter, Body, HTTPException, Query
+
+# project
+from pppp.api.image_io import decode_image_b64, validate_image_url
+from pppp.api.models import JobRequest, JobResponse
+from pppp.engine.registry import EngineDisabledError, engine_enabled
+from pppp.jobs.runner import JobQueueFullError, get_job_runner, job_response
+from pppp.settings import settings
+
+if TYPE_CHECKING:
+    from pppp.engine.registry import EngineName
+
+router = APIRouter(tags=["jobs"])
+
+KindQuery = Query(..., description="Which synchronous endpoint the job stands in for")
+PriorityQuery = Query(0, ge=-100, le=100, description="Higher runs first, equal priorities in arrival order")
+EnginesQuery = Query(["ocr", "tags"], description="Engines for an analyze job")
+
+_ENGINES: dict[str, EngineName] = {"ocr": "paddle", "tags": "rampp"}
+
+
+@functools.cache
+def _callback_host_re() -> re.Pattern[str] | None:
+    try:
+        return re.compile(settings.job_callback_host_regex, re.IGNORECASE)
+    except re.error:
+        return None
+
+
+def _check_callback_url(url: str) -> None:
+    p = urlparse(url)
+    if p.scheme not in {"http", "https"} or not p.hostname:
+        raise HTTPException(status_code=400, detail="callback_url must be an http(s) url")
+    host_re = _callback_host_re()
+    if host_re is None:
+        raise HTTPException(status_code=500, detail="server misconfigured: invalid job_callback_host_regex")
+    if not host_re.fullmatch(p.hostname.lower()):
+        raise HTTPException(status_code=400, detail="callback_url host is not allowed")
+
+
+async def _submit(
+    kind: Literal["ocr", "tags", "analyze"],
+    *,
+    params: dict,
+    priority: int,
+    callback_url: str | None,
+    image_bytes: bytes | None = None,
+    image_url: str | None = None,
+) -> JobResponse:
+    # refused now, like the synchronous endpoint would, rather than failing the job once it runs
+    for name in [kind] if kind != "analyze" else params["engines"]:
+        engine = _ENGINES[name]
+        if not engine_enabled(engine):
+            raise HTTPException(status_code=501, detail=str(EngineDisabledError(engine)))
+    if callback_url is not None:
+        _check_callback_url(callback_url)
+
+    try:
+        job = await get_job_runner().submit(
+            kind,
+            params=params,
+            priority=priority,
+            image_bytes=image_bytes,
+            image_url=image_url,
+            callback_url=callback_url,
+        )
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after_s)}) from e
+
+    return job_response(job)
+
+
+@router.post("/jobs", response_model=JobResponse, status_code=202)
+async def submit_job_endpoint(payload: JobRequest) -> JobResponse:
+    image_bytes = None
+    if payload.image_b64 is not None:
+        image_bytes = decode_image_b64(payload.image_b64)
+        if not image_bytes:
+            raise HTTPException(status_code=400, detail="empty image_b64")
+        if len(image_bytes) > settings.max_image_bytes:
+            raise HTTPException(status_code=413, detail="image too large")
+    else:
+        validate_image_url(payload.image_url or "")
+
+    return await _submit(
+        payload.kind,
+        params={"verbose": payload.verbose, "top_k": payload.top_k, "engines": payload.engines},
+        priority=payload.priority,
+        callback_url=payload.callback_url,
+        image_bytes=image_bytes,
+        image_url=payload.image_url,
+    )
+
+
+@router.post("/jobs/bytes", response_model=JobResponse, status_code=202)
+async def submit_job_bytes_endpoint(
+    *,
+    image: bytes = Body(..., description="Raw image bytes"),
+    kind: Literal["ocr", "tags", "analyze"] = KindQuery,
+    priority: int = PriorityQuery,
+    callback_url: str | None = None,
+    engines: list[Literal["ocr", "tags"]] = EnginesQuery,
+    verbose: bool = False,
+    top_k: int = 50,
+) -> JobResponse:
+    if not image:
+        raise HTTPException(status_code=400, detail="empty body")
+    if len(image) > settings.max_image_bytes:
+        raise HTTPException(status_code=413, detail="image too large")
+
+    return await _submit(
+        kind,
+        params={"verbose": verbose, "top_k": top_k, "engines": engines},
+        priority=priority,
+        callback_url=callback_url,
+        image_bytes=image,
+    )
+
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job_endpoint(job_id: str) -> JobResponse:
+    job = await get_job_runner().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="no such job, or its result has expired")
+    return job_response(job)
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
-from pydantic import BaseModel, Field
+from typing import Any, Literal
+
+from pydantic import BaseModel, Field, model_validator
 
 
 class OcrUrlRequest(BaseModel):
@@ -11,15 +13,143 @@ class OcrB64Request(BaseModel):
     image_b64: str = Field(..., description="Base64-encoded image bytes (no data: URL prefix)")
 
 
+class FramesInfo(BaseModel):
+    total: int = Field(..., description="Frames in the image")
+    analyzed: int = Field(..., description="Frames the engine actually ran on")
+    skipped: int = Field(..., description="Frames dropped as visually redundant or over budget")
+
+
 class OcrResponse(BaseModel):
     text: str
     engine: str
     confidence: float | None = None
     timings_ms: dict[str, int] | None = None
     lines: list[dict] | None = None
+    frames: FramesInfo | None = None
+    ocr_paths: dict[str, int] | None = Field(
+        None,
+        description="Frames per OCR path: full, tiled for large or long frames, or no_text, roi and roi_cls for "
+        "the detection-first path",
+    )
+    near_duplicate: bool = Field(False, description="Reused the result of a resized or re-encoded copy of the image")
 
 
 class TagsResponse(BaseModel):
-    tags: list[str]
+    tags: list[str] = Field(..., description="Tags ranked by score, best first")
+    engine: str
+    timings_ms: dict[str, int] | None = None
+    frames: FramesInfo | None = None
+    scores: list[float] | None = Field(None, description="Score of each tag, in the same order")
+    embedding: list[float] | None = Field(None, description="Unit-norm image embedding, as from /embed")
+    near_duplicate: bool = Field(False, description="Reused the result of a resized or re-encoded copy of the image")
+
+
+class EmbedResponse(BaseModel):
+    embedding: list[float] = Field(..., description="Unit-norm image embedding, averaged over analyzed frames")
+    dim: int
     engine: str
     timings_ms: dict[str, int] | None = None
+    frames: FramesInfo | None = None
+    near_duplicate: bool = Field(False, description="Reused the result of a resized or re-encoded copy of the image")
+
+
+class AnalyzeResponse(BaseModel):
+    ocr: OcrResponse | None = None
+    tags: TagsResponse | None = None
+    timings_ms: dict[str, int] | None = None
+
+
+class BatchItem(BaseModel):
+    image_url: str | None = Field(None, description="Remote image URL (https; host must match allowlist)")
+    image_b64: str | None = Field(None, description="Base64-encoded image bytes (no data: URL prefix)")
+
+    @model_validator(mode="after")
+    def _exactly_one_source(self) -> BatchItem:
+        if (self.image_url is None) == (self.image_b64 is None):
+            raise ValueError("exactly one of image_url or image_b64 is required")
+        return self
+
+
+class BatchRequest(BaseModel):
+    items: list[BatchItem] = Field(..., min_length=1)
+
+
+class BatchItemError(BaseModel):
+    status_code: int
+    detail: str
+
+
+class OcrBatchItem(BaseModel):
+    index: int
+    result: OcrResponse | None = None
+    error: BatchItemError | None = None
+
+
+class OcrBatchResponse(BaseModel):
+    items: list[OcrBatchItem]
+    timings_ms: dict[str, int] | None = None
+
+
+class TagsBatchItem(BaseModel):
+    index: int
+    result: TagsResponse | None = None
+    error: BatchItemError | None = None
+
+
+class TagsBatchResponse(BaseModel):
+    items: list[TagsBatchItem]
+    timings_ms: dict[str, int] | None = None
+
+
+class OcrFrameRecord(BaseModel):
+    type: Literal["frame"] = "frame"
+    frame: int
+    text: str
+    confidence: float | None = None
+    lines: list[dict] | None = None
+
+
+class TagsFrameRecord(BaseModel):
+    type: Literal["frame"] = "frame"
+    frame: int
+    tags: list[str]
+    scores: list[float] | None = None
+
+
+class OcrSummaryRecord(BaseModel):
+    type: Literal["summary"] = "summary"
+    result: OcrResponse
+
+
+class TagsSummaryRecord(BaseModel):
+    type: Literal["summary"] = "summary"
+    result: TagsResponse
+
+
+class StreamErrorRecord(BaseModel):
+    type: Literal["error"] = "error"
+    status_code: int
+    detail: str
+
+
+class JobRequest(BatchItem):
+    kind: Literal["ocr", "tags", "analyze"] = Field(..., description="Which synchronous endpoint the job stands in for")
+    priority: int = Field(0, ge=-100, le=100, description="Higher runs first, equal priorities in arrival order")
+    callback_url: str | None = Field(None, description="POSTed the finished job (host must match allowlist)")
+    verbose: bool = False
+    top_k: int = 50
+    engines: list[Literal["ocr", "tags"]] = Field(["ocr", "tags"], description="Engines for an analyze job")
+
+
+class JobResponse(BaseModel):
+    id: str
+    kind: Literal["ocr", "tags", "analyze"]
+    status: Literal["pending", "running", "succeeded", "failed"]
+    priority: int
+    created_at: float
+    started_at: float | None = None
+    finished_at: float | None = None
+    attempts: int = 0
+    # the response the synchronous endpoint would have returned
+    result: dict[str, Any] | None = None
+    error: BatchItemError | None = None
@@ -1,68 +1,101 @@
 from __future__ import annotations
 
 # built-in
-import time
+from typing import TYPE_CHECKING
 
 # external
-from fastapi import APIRouter, Body, HTTPException
+from fastapi import APIRouter, Body, File, HTTPException, UploadFile
+from fastapi.responses import StreamingResponse
 
 # project
-from pppp.api.image_io import decode_image_b64, detect_mime_type, fetch_image
-from pppp.api.models import OcrB64Request, OcrResponse, OcrUrlRequest
-from pppp.engine.paddle import ocr_bytes
+from pppp.api.batch import iter_batch, request_sources, run_batch, upload_sources
+from pppp.api.image_io import decode_image_b64, fetch_image
+from pppp.api.models import (
+    BatchRequest,
+    OcrB64Request,
+    OcrBatchItem,
+    OcrBatchResponse,
+    OcrResponse,
+    OcrUrlRequest,
+)
+from pppp.api.pipeline import run_ocr, stream_ocr
+from pppp.api.streaming import ndjson_response
 from pppp.settings import settings
 
+if TYPE_CHECKING:
+    from pppp.api.batch import BatchSource
+
 router = APIRouter(tags=["ocr"])
 
+FilesUpload = File(..., description="Image files")
+
+
+async def _ocr(
+    image_bytes: bytes,
+    *,
+    verbose: bool,
+    stream: bool,
+    fetch_timings: dict[str, int] | None = None,
+) -> OcrResponse | StreamingResponse:
+    if stream:
+        return await ndjson_response(stream_ocr(image_bytes, verbose=verbose, fetch_timings=fetch_timings))
+    return await run_ocr(image_bytes, verbose=verbose, fetch_timings=fetch_timings)
+
+
+async def _ocr_batch(
+    sources: list[BatchSource], *, verbose: bool, stream: bool
+) -> OcrBatchResponse | StreamingResponse:
+    if stream:
+        return await ndjson_response(
+            OcrBatchItem(index=i, result=result, error=error)
+            async for i, result, error in iter_batch(sources, lambda b, t: run_ocr(b, verbose=verbose, fetch_timings=t))
+        )
+
+    outcomes, timings = await run_batch(sources, lambda b, t: run_ocr(b, verbose=verbose, fetch_timings=t))
+
+    return OcrBatchResponse(
+        items=[OcrBatchItem(index=i, result=result, error=error) for i, (result, error) in enumerate(outcomes)],
+        timings_ms=timings,
+    )
+
 
 @router.post("/ocr/bytes", response_model=OcrResponse)
 async def ocr_bytes_endpoint(
+    *,
     image: bytes = Body(..., description="Raw image bytes"),
     verbose: bool = False,
-) -> OcrResponse:
+    stream: bool = False,
+) -> OcrResponse | StreamingResponse:
     if not image:
         raise HTTPException(status_code=400, detail="empty body")
     if len(image) > settings.max_image_bytes:
         raise HTTPException(status_code=413, detail="image too large")
 
-    ct = detect_mime_type(image)
-
-    start = time.perf_counter()
-    result = ocr_bytes(image, content_type=ct)
-    elapsed_ms_total = int((time.perf_counter() - start) * 1000)
-
-    return OcrResponse(
-        text=result.text,
-        engine="paddleocr",
-        confidence=result.confidence,
-        timings_ms={"ocr": result.elapsed_ms, "total": elapsed_ms_total},
-        lines=(result.lines if verbose else None),
-    )
+    return await _ocr(image, verbose=verbose, stream=stream)
 
 
 @router.post("/ocr/url", response_model=OcrResponse)
-async def ocr_url_endpoint(payload: OcrUrlRequest, verbose: bool = False) -> OcrResponse:
-    image_bytes = await fetch_image(payload.image_url)
+async def ocr_url_endpoint(
+    *,
+    payload: OcrUrlRequest,
+    verbose: bool = False,
+    stream: bool = False,
+) -> OcrResponse | StreamingResponse:
+    fetch_timings: dict[str, int] = {}
+    image_bytes = await fetch_image(payload.image_url, timings=fetch_timings)
     if not image_bytes:
         raise HTTPException(status_code=400, detail="empty image_url")
 
-    ct = detect_mime_type(image_bytes)
-
-    start = time.perf_counter()
-    result = ocr_bytes(image_bytes, content_type=ct)
-    elapsed_ms_total = int((time.perf_counter() - start) * 1000)
-
-    return OcrResponse(
-        text=result.text,
-        engine="paddleocr",
-        confidence=result.confidence,
-        timings_ms={"ocr": result.elapsed_ms, "total": elapsed_ms_total},
-        lines=(result.lines if verbose else None),
-    )
+    return await _ocr(image_bytes, verbose=verbose, stream=stream, fetch_timings=fetch_timings)
 
 
 @router.post("/ocr/b64", response_model=OcrResponse)
-async def ocr_b64_endpoint(payload: OcrB64Request, verbose: bool = False) -> OcrResponse:
+async def ocr_b64_endpoint(
+    *,
+    payload: OcrB64Request,
+    verbose: bool = False,
+    stream: bool = False,
+) -> OcrResponse | StreamingResponse:
     image_bytes = decode_image_b64(payload.image_b64)
 
     if not image_bytes:
@@ -70,16 +103,24 @@ async def ocr_b64_endpoint(payload: OcrB64Request, verbose: bool = False) -> Ocr
     if len(image_bytes) > settings.max_image_bytes:
         raise HTTPException(status_code=413, detail="image too large")
 
-    ct = detect_mime_type(image_bytes)
+    return await _ocr(image_bytes, verbose=verbose, stream=stream)
 
-    start = time.perf_counter()
-    result = ocr_bytes(image_bytes, content_type=ct)
-    elapsed_ms_total = int((time.perf_counter() - start) * 1000)
 
-    return OcrResponse(
-        text=result.text,
-        engine="paddleocr",
-        confidence=result.confidence,
-        timings_ms={"ocr": result.elapsed_ms, "total": elapsed_ms_total},
-        lines=(result.lines if verbose else None),
-    )
+@router.post("/ocr/batch", response_model=OcrBatchResponse)
+async def ocr_batch_endpoint(
+    *,
+    payload: BatchRequest,
+    verbose: bool = False,
+    stream: bool = False,
+) -> OcrBatchResponse | StreamingResponse:
+    return await _ocr_batch(request_sources(payload), verbose=verbose, stream=stream)
+
+
+@router.post("/ocr/batch/files", response_model=OcrBatchResponse)
+async def ocr_batch_files_endpoint(
+    *,
+    files: list[UploadFile] = FilesUpload,
+    verbose: bool = False,
+    stream: bool = False,
+) -> OcrBatchResponse | StreamingResponse:
+    return await _ocr_batch(upload_sources(files), verbose=verbose, stream=stream)
@@ -0,0 +1,467 @@
+from __future__ import annotations
+
+# built-in
+import asyncio
+import time
+from typing import TYPE_CHECKING, Any
+
+# external
+from fastapi import HTTPException
+
+# project
+from pppp import metrics, tracing
+from pppp.api.image_io import sniff_image
+from pppp.api.models import (
+    AnalyzeResponse,
+    EmbedResponse,
+    FramesInfo,
+    OcrFrameRecord,
+    OcrResponse,
+    OcrSummaryRecord,
+    TagsFrameRecord,
+    TagsResponse,
+    TagsSummaryRecord,
+)
+from pppp.cache.results import Computed, get_result_cache, result_key
+from pppp.cache.similar import get_near_duplicate_index
+from pppp.engine.executor import get_executor
+from pppp.engine.registry import EngineDisabledError, load_engine
+from pppp.settings import settings
+from pppp.utils.images import decode_image, perceptual_hash
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator, Awaitable
+    from types import ModuleType
+
+    from pppp.engine import paddle, rampp
+    from pppp.engine.registry import EngineName
+    from pppp.utils.images import DecodedImage
+
+
+async def _engine(name: EngineName) -> ModuleType:
+    """The engine module, imported off the event loop the first time it is needed."""
+
+    try:
+        return await asyncio.to_thread(load_engine, name)
+    except EngineDisabledError as e:
+        raise HTTPException(status_code=501, detail=str(e)) from e
+
+
+class SharedDecode:
+    """Decode an image at most once, on first use, however many engines ask for it."""
+
+    def __init__(self, image_bytes: bytes, *, content_type: str | None, min_side: int | None = None) -> None:
+        self.image_bytes = image_bytes
+        self.content_type = content_type
+        self.min_side = min_side
+        self.decode_ms: int | None = None
+        self._task: asyncio.Task[DecodedImage] | None = None
+        self._phash_task: asyncio.Task[int | None] | None = None
+
+    async def _decode(self) -> DecodedImage:
+        start = time.perf_counter()
+        with tracing.span("decode"):
+            decoded = await asyncio.to_thread(
+                decode_image, self.image_bytes, content_type=self.content_type, min_side=self.min_side
+            )
+        self.decode_ms = int((time.perf_counter() - start) * 1000)
+        return decoded
+
+    async def get(self) -> DecodedImage:
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._decode())
+        return await asyncio.shield(self._task)
+
+    async def _hash(self) -> int | None:
+        decoded = await self.get()
+        if decoded.animated:
+            # two animations can share a first frame and nothing else
+            return None
+        _frame_index, rgb = decoded.frames[0]
+        return await asyncio.to_thread(perceptual_hash, rgb)
+
+    async def phash(self) -> int | None:
+        """Perceptual hash of a still image, computed once; None for animations."""
+
+        if self._phash_task is None:
+            self._phash_task = asyncio.ensure_future(self._hash())
+        return await asyncio.shield(self._phash_task)
+
+
+async def _find_near_duplicate[T](
+    engine: str,
+    params: dict[str, Any],
+    decoder: SharedDecode,
+    *,
+    result_type: type[T],
+) -> T | None:
+    """The cached result of an image that looks the same as this one, if the index knows one."""
+
+    index = get_near_duplicate_index()
+    if index is None or engine not in settings.near_dup_engines:
+        return None
+    phash = await decoder.phash()
+    if phash is None:
+        return None
+    found = await index.find(engine, params, phash)
+    if found is None:
+        return None
+    key, _distance = found
+    # the index outlives results that have since left the cache
+    return await get_result_cache().lookup(key, result_type=result_type)
+
+
+async def _index_near_duplicate(engine: str, params: dict[str, Any], decoder: SharedDecode, key: str) -> None:
+    index = get_near_duplicate_index()
+    if index is None or engine not in settings.near_dup_engines:
+        return
+    phash = await decoder.phash()
+    if phash is not None:
+        await index.add(engine, params, phash, key)
+
+
+async def _shared_min_side(engines: set[str]) -> int | None:
+    # one decode serves every engine, so it is only as small as the most demanding one allows
+    wanted = []
+    if "ocr" in engines:
+        wanted.append((await _engine("paddle")).decode_min_side())
+    if "tags" in engines:
+        wanted.append((await _engine("rampp")).decode_min_side())
+    if not wanted or None in wanted:
+        return None
+    return max(wanted)
+
+
+def _frames_info(total: int, analyzed: int) -> FramesInfo:
+    return FramesInfo(total=total, analyzed=analyzed, skipped=total - analyzed)
+
+
+def _observe(
+    engine: str,
+    result: paddle.OcrResult | rampp.ImageFeatures,
+    *,
+    hit: bool,
+    start: float,
+    near_duplicate: bool = False,
+) -> None:
+    metrics.CACHE_REQUESTS.inc(engine=engine, result="hit" if hit else "near_duplicate" if near_duplicate else "miss")
+    if not hit and not near_duplicate:
+        metrics.FRAMES_ANALYZED.observe(result.frames_analyzed, engine=engine)
+        metrics.FRAMES_SKIPPED.inc(result.frames_total - result.frames_analyzed, engine=engine)
+    metrics.REQUEST_SECONDS.observe(time.perf_counter() - start, engine=engine)
+
+
+def _ocr_response(
+    result: paddle.OcrResult,
+    *,
+    verbose: bool,
+    timings: dict[str, int],
+    near_duplicate: bool = False,
+) -> OcrResponse:
+    return OcrResponse(
+        text=result.text,
+        engine="paddleocr",
+        confidence=result.confidence,
+        timings_ms=timings,
+        lines=(result.lines if verbose else None),
+        frames=_frames_info(result.frames_total, result.frames_analyzed),
+        ocr_paths=result.paths or None,
+        near_duplicate=near_duplicate,
+    )
+
+
+def _tags_response(
+    result: rampp.TagsResult,
+    *,
+    timings: dict[str, int],
+    embedding: list[float] | None = None,
+    scores: bool = False,
+    near_duplicate: bool = False,
+) -> TagsResponse:
+    return TagsResponse(
+        tags=result.tags,
+        engine=result.engine,
+        timings_ms=timings,
+        frames=_frames_info(result.frames_total, result.frames_analyzed),
+        scores=(result.scores if scores else None),
+        embedding=embedding,
+        near_duplicate=near_duplicate,
+    )
+
+
+def _check_threshold(threshold: float | None) -> None:
+    # cached features only keep the tags scoring above the floor
+    if threshold is not None and threshold < settings.rampp_score_floor:
+        raise HTTPException(
+            status_code=400,
+            detail=f"threshold must be at least rampp_score_floor ({settings.rampp_score_floor})",
+        )
+
+
+async def run_ocr(
+    image_bytes: bytes,
+    *,
+    verbose: bool = False,
+    decoder: SharedDecode | None = None,
+    fetch_timings: dict[str, int] | None = None,
+) -> OcrResponse:
+    """Sniff, decode, then OCR the image on the paddle pool unless it, or a near duplicate, is cached."""
+
+    start = time.perf_counter()
+    paddle = await _engine("paddle")
+    if decoder is None:
+        content_type = await asyncio.to_thread(sniff_image, image_bytes)
+        decoder = SharedDecode(image_bytes, content_type=content_type, min_side=paddle.decode_min_side())
+    timings = dict(fetch_timings or {})
+    params = paddle.cache_params()
+    # hashing the whole image is too slow for the event loop
+    key = await asyncio.to_thread(result_key, "paddle", image_bytes, params)
+
+    async def _compute() -> Computed[paddle.OcrResult]:
+        decoded = await decoder.get()
+        decode_ms = decoder.decode_ms or 0
+        reused = await _find_near_duplicate("paddle", params, decoder, result_type=paddle.OcrResult)
+        if reused is not None:
+            return Computed(reused, near_duplicate=True, timings={"decode": decode_ms})
+
+        submission = await get_executor().run("paddle", paddle.ocr_image, decoded)
+        await _index_near_duplicate("paddle", params, decoder, key)
+        return Computed(
+            submission.result,
+            timings={"decode": decode_ms, "queue": submission.queue_ms, "ocr": submission.result.elapsed_ms},
+        )
+
+    computed, hit = await get_result_cache().get_or_compute(key, _compute, result_type=paddle.OcrResult)
+    result = computed.result
+    _observe("paddle", result, hit=hit, start=start, near_duplicate=computed.near_duplicate)
+    timings.update(computed.timings)
+    timings["cache_hit"] = int(hit)
+    timings["total"] = int((time.perf_counter() - start) * 1000)
+
+    return _ocr_response(result, verbose=verbose, timings=timings, near_duplicate=computed.near_duplicate)
+
+
+async def _rampp_features(
+    image_bytes: bytes,
+    *,
+    decoder: SharedDecode,
+    timings: dict[str, int],
+    start: float,
+) -> tuple[rampp.ImageFeatures, bool]:
+    """Embedding and tag scores of the image from the rampp pool, unless it, or a near duplicate, is cached.
+
+    Returns the features and whether they were reused from a near duplicate.
+    """
+
+    rampp = await _engine("rampp")
+    params = rampp.cache_params()
+    key = await asyncio.to_thread(result_key, "rampp", image_bytes, params)
+
+    async def _compute() -> Computed[rampp.ImageFeatures]:
+        decoded = await decoder.get()
+        decode_ms = decoder.decode_ms or 0
+        reused = await _find_near_duplicate("rampp", params, decoder, result_type=rampp.ImageFeatures)
+        if reused is not None:
+            return Computed(reused, near_duplicate=True, timings={"decode": decode_ms})
+
+        submission = await get_executor().run("rampp", rampp.image_features, decoded)
+        await _index_near_duplicate("rampp", params, decoder, key)
+        return Computed(
+            submission.result,
+            timings={"decode": decode_ms, "queue": submission.queue_ms, "tagging": submission.result.elapsed_ms},
+        )
+
+    computed, hit = await get_result_cache().get_or_compute(key, _compute, result_type=rampp.ImageFeatures)
+    features = computed.result
+    _observe("rampp", features, hit=hit, start=start, near_duplicate=computed.near_duplicate)
+    timings.update(computed.timings)
+    timings["cache_hit"] = int(hit)
+    return features, computed.near_duplicate
+
+
+async def run_tags(
+    image_bytes: bytes,
+    *,
+    top_k: int = 50,
+    threshold: float | None = None,
+    scores: bool = False,
+    embedding: bool = False,
+    decoder: SharedDecode | None = None,
+    fetch_timings: dict[str, int] | None = None,
+) -> TagsResponse:
+    """Tag the image from its RAM++ features, ranked by score.
+
+    ``top_k`` and ``threshold`` only filter the cached features, so changing them never reruns the model.
+    """
+
+    start = time.perf_counter()
+    _check_threshold(threshold)
+    rampp = await _engine("rampp")
+    if decoder is None:
+        content_type = await asyncio.to_thread(sniff_image, image_bytes)
+        decoder = SharedDecode(image_bytes, content_type=content_type, min_side=rampp.decode_min_side())
+    timings = dict(fetch_timings or {})
+
+    features, near_duplicate = await _rampp_features(image_bytes, decoder=decoder, timings=timings, start=start)
+    result = rampp.tags_from_features(features, top_k=top_k, threshold=threshold)
+    timings["total"] = int((time.perf_counter() - start) * 1000)
+
+    return _tags_response(
+        result,
+        timings=timings,
+        embedding=(rampp.image_embedding(features) if embedding else None),
+        scores=scores,
+        near_duplicate=near_duplicate,
+    )
+
+
+async def run_embed(image_bytes: bytes, *, fetch_timings: dict[str, int] | None = None) -> EmbedResponse:
+    """The image's RAM++ embedding, from the same cached features that tags come from."""
+
+    start = time.perf_counter()
+    rampp = await _engine("rampp")
+    content_type = await asyncio.to_thread(sniff_image, image_bytes)
+    decoder = SharedDecode(image_bytes, content_type=content_type, min_side=rampp.decode_min_side())
+    timings = dict(fetch_timings or {})
+
+    features, near_duplicate = await _rampp_features(image_bytes, decoder=decoder, timings=timings, start=start)
+    embedding = rampp.image_embedding(features)
+    timings["total"] = int((time.perf_counter() - start) * 1000)
+
+    return EmbedResponse(
+        embedding=embedding,
+        dim=len(embedding),
+        engine=features.engine,
+        timings_ms=timings,
+        frames=_frames_info(features.frames_total, features.frames_analyzed),
+        near_duplicate=near_duplicate,
+    )
+
+
+async def stream_ocr(
+    image_bytes: bytes,
+    *,
+    verbose: bool = False,
+    fetch_timings: dict[str, int] | None = None,
+) -> AsyncIterator[OcrFrameRecord | OcrSummaryRecord]:
+    """Like :func:`run_ocr`, but yield each deduplicated frame as it is read, then the summary.
+
+    A cached result goes straight to the summary. Decoding happens frame by frame on the paddle
+    pool, so there is no separate decode timing.
+    """
+
+    start = time.perf_counter()
+    paddle = await _engine("paddle")
+    cache = get_result_cache()
+    key = await asyncio.to_thread(result_key, "paddle", image_bytes, paddle.cache_params())
+
+    result = await cache.lookup(key, result_type=paddle.OcrResult)
+    hit = result is not None
+    if result is None:
+        frames = get_executor().iterate(
+            "paddle",
+            paddle.stream_ocr,
+            image_bytes,
+            content_type=await asyncio.to_thread(sniff_image, image_bytes),
+        )
+        async for item in frames:
+            if isinstance(item, paddle.OcrResult):
+                result = item
+                continue
+            yield OcrFrameRecord(
+                frame=item.frame,
+                text=item.text,
+                confidence=item.confidence,
+                lines=(item.lines if verbose else None),
+            )
+        await cache.store(key, result)
+
+    _observe("paddle", result, hit=hit, start=start)
+    timings = dict(fetch_timings or {})
+    if not hit:
+        timings["ocr"] = result.elapsed_ms
+    timings["cache_hit"] = int(hit)
+    timings["total"] = int((time.perf_counter() - start) * 1000)
+    yield OcrSummaryRecord(result=_ocr_response(result, verbose=verbose, timings=timings))
+
+
+async def stream_tags(
+    image_bytes: bytes,
+    *,
+    top_k: int = 50,
+    threshold: float | None = None,
+    scores: bool = False,
+    embedding: bool = False,
+    fetch_timings: dict[str, int] | None = None,
+) -> AsyncIterator[TagsFrameRecord | TagsSummaryRecord]:
+    """Like :func:`run_tags`, but yield each frame's tags as its batch comes back, then the summary."""
+
+    start = time.perf_counter()
+    _check_threshold(threshold)
+    rampp = await _engine("rampp")
+    cache = get_result_cache()
+    key = await asyncio.to_thread(result_key, "rampp", image_bytes, rampp.cache_params())
+
+    features = await cache.lookup(key, result_type=rampp.ImageFeatures)
+    hit = features is not None
+    if features is None:
+        frames = get_executor().iterate(
+            "rampp",
+            rampp.stream_features,
+            image_bytes,
+            content_type=await asyncio.to_thread(sniff_image, image_bytes),
+        )
+        async for item in frames:
+            if isinstance(item, rampp.ImageFeatures):
+                features = item
+                continue
+            tags = rampp.frame_tags(item, threshold=threshold)
+            yield TagsFrameRecord(frame=tags.frame, tags=tags.tags, scores=(tags.scores if scores else None))
+        await cache.store(key, features)
+
+    _observe("rampp", features, hit=hit, start=start)
+    timings = dict(fetch_timings or {})
+    if not hit:
+        timings["tagging"] = features.elapsed_ms
+    timings["cache_hit"] = int(hit)
+    timings["total"] = int((time.perf_counter() - start) * 1000)
+    result = rampp.tags_from_features(features, top_k=top_k, threshold=threshold)
+    yield TagsSummaryRecord(
+        result=_tags_response(
+            result,
+            timings=timings,
+            embedding=(rampp.image_embedding(features) if embedding else None),
+            scores=scores,
+        )
+    )
+
+
+async def run_analyze(
+    image_bytes: bytes,
+    *,
+    engines: set[str],
+    verbose: bool = False,
+    top_k: int = 50,
+    fetch_timings: dict[str, int] | None = None,
+) -> AnalyzeResponse:
+    """Sniff and decode once, then run the selected engines concurrently on the shared frames."""
+
+    start = time.perf_counter()
+    min_side = await _shared_min_side(engines)
+    content_type = await asyncio.to_thread(sniff_image, image_bytes)
+    decoder = SharedDecode(image_bytes, content_type=content_type, min_side=min_side)
+    sniff_ms = int((time.perf_counter() - start) * 1000)
+
+    runs: dict[str, Awaitable[OcrResponse | TagsResponse]] = {}
+    if "ocr" in engines:
+        runs["ocr"] = run_ocr(image_bytes, verbose=verbose, decoder=decoder)
+    if "tags" in engines:
+        runs["tags"] = run_tags(image_bytes, top_k=top_k, decoder=decoder)
+    results = dict(zip(runs, await asyncio.gather(*runs.values()), strict=True))
+
+    timings = {**(fetch_timings or {}), "sniff": sniff_ms}
+    if decoder.decode_ms is not None:
+        timings["decode"] = decoder.decode_ms
+    timings["total"] = int((time.perf_counter() - start) * 1000)
+
+    return AnalyzeResponse(ocr=results.get("ocr"), tags=results.get("tags"), timings_ms=timings)
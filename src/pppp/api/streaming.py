@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+# built-in
+import logging
+from typing import TYPE_CHECKING
+
+# external
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+# project
+from pppp.api.models import StreamErrorRecord
+from pppp.engine.executor import EngineBusyError
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator
+
+    from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+
+def _line(record: BaseModel) -> bytes:
+    return record.model_dump_json().encode() + b"\n"
+
+
+async def ndjson_response(records: AsyncIterator[BaseModel]) -> StreamingResponse:
+    """Stream ``records`` as newline-delimited JSON.
+
+    The response only starts once the first record is ready, so anything that fails before then
+    (bad input, a full queue) still gets a proper status code. Failures after that can only be
+    reported in-band, as a final ``error`` record.
+    """
+
+    first = await anext(records)
+
+    async def _body() -> AsyncIterator[bytes]:
+        yield _line(first)
+        try:
+            async for record in records:
+                yield _line(record)
+        except HTTPException as e:
+            yield _line(StreamErrorRecord(status_code=e.status_code, detail=str(e.detail)))
+        except EngineBusyError as e:
+            yield _line(StreamErrorRecord(status_code=e.status_code, detail=e.detail))
+        except Exception:
+            logger.exception("stream failed")
+            yield _line(StreamErrorRecord(status_code=500, detail="failed to process image"))
+
+    return StreamingResponse(_body(), media_type="application/x-ndjson")
@@ -1,64 +1,130 @@
 from __future__ import annotations
 
-# built-in
-import time
+# built-in
+from typing import TYPE_CHECKING, Any
 
 # external
-from fastapi import APIRouter, Body, HTTPException
+from fastapi import APIRouter, Body, File, HTTPException, Query, UploadFile
+from fastapi.responses import StreamingResponse
 
 # project
-from pppp.api.image_io import decode_image_b64, detect_mime_type, fetch_image
-from pppp.api.models import OcrB64Request, OcrUrlRequest, TagsResponse
-from pppp.engine.rampp import tag_bytes
-from pppp.settings import settings
+from pppp.api.batch import iter_batch, request_sources, run_batch, upload_sources
+from pppp.api.image_io import decode_image_b64, fetch_image
+from pppp.api.models import (
+    BatchRequest,
+    OcrB64Request,
+    OcrUrlRequest,
+    TagsBatchItem,
+    TagsBatchResponse,
+    TagsResponse,
+)
+from pppp.api.pipeline import run_tags, stream_tags
+from pppp.api.streaming import ndjson_response
+from pppp.settings import settings
+
+if TYPE_CHECKING:
+    from pppp.api.batch import BatchSource
 
 router = APIRouter(tags=["tags"])
 
-
-@router.post("/tags/bytes", response_model=TagsResponse)
-async def tags_bytes_endpoint(
-    image: bytes = Body(..., description="Raw image bytes"),
-    top_k: int = 50,
-) -> TagsResponse:
+FilesUpload = File(..., description="Image files")
+
+ThresholdQuery = Query(
+    None,
+    ge=0.0,
+    le=1.0,
+    description="Keep tags scoring above this, instead of each tag's own threshold; not below rampp_score_floor",
+)
+ScoresQuery = Query(False, description="Return the score of each tag")
+EmbeddingQuery = Query(False, description="Also return the image embedding, as from /embed")
+
+
+def _options(*, top_k: int, threshold: float | None, scores: bool, embedding: bool) -> dict[str, Any]:
+    return {"top_k": top_k, "threshold": threshold, "scores": scores, "embedding": embedding}
+
+
+async def _tags(
+    image_bytes: bytes,
+    *,
+    options: dict[str, Any],
+    stream: bool,
+    fetch_timings: dict[str, int] | None = None,
+) -> TagsResponse | StreamingResponse:
+    if stream:
+        return await ndjson_response(stream_tags(image_bytes, **options, fetch_timings=fetch_timings))
+    return await run_tags(image_bytes, **options, fetch_timings=fetch_timings)
+
+
+async def _tags_batch(
+    sources: list[BatchSource], *, options: dict[str, Any], stream: bool
+) -> TagsBatchResponse | StreamingResponse:
+    if stream:
+        return await ndjson_response(
+            TagsBatchItem(index=i, result=result, error=error)
+            async for i, result, error in iter_batch(sources, lambda b, t: run_tags(b, **options, fetch_timings=t))
+        )
+
+    outcomes, timings = await run_batch(sources, lambda b, t: run_tags(b, **options, fetch_timings=t))
+
+    return TagsBatchResponse(
+        items=[TagsBatchItem(index=i, result=result, error=error) for i, (result, error) in enumerate(outcomes)],
+        timings_ms=timings,
+    )
+
+
+@router.post("/tags/bytes", response_model=TagsResponse)
+async def tags_bytes_endpoint(
+    *,
+    image: bytes = Body(..., description="Raw image bytes"),
+    top_k: int = 50,
+    threshold: float | None = ThresholdQuery,
+    scores: bool = ScoresQuery,
+    embedding: bool = EmbeddingQuery,
+    stream: bool = False,
+) -> TagsResponse | StreamingResponse:
     if not image:
         raise HTTPException(status_code=400, detail="empty body")
     if len(image) > settings.max_image_bytes:
         raise HTTPException(status_code=413, detail="image too large")
 
-    ct = detect_mime_type(image)
-
-    start = time.perf_counter()
-    result = tag_bytes(image, content_type=ct, top_k=top_k)
-    elapsed_ms_total = int((time.perf_counter() - start) * 1000)
-
-    return TagsResponse(
-        tags=result.tags,
-        engine=result.engine,
-        timings_ms={"tagging": result.elapsed_ms, "total": elapsed_ms_total},
-    )
-
-
-@router.post("/tags/url", response_model=TagsResponse)
-async def tags_url_endpoint(payload: OcrUrlRequest, top_k: int = 50) -> TagsResponse:
-    image_bytes = await fetch_image(payload.image_url)
+    return await _tags(
+        image, options=_options(top_k=top_k, threshold=threshold, scores=scores, embedding=embedding), stream=stream
+    )
+
+
+@router.post("/tags/url", response_model=TagsResponse)
+async def tags_url_endpoint(
+    *,
+    payload: OcrUrlRequest,
+    top_k: int = 50,
+    threshold: float | None = ThresholdQuery,
+    scores: bool = ScoresQuery,
+    embedding: bool = EmbeddingQuery,
+    stream: bool = False,
+) -> TagsResponse | StreamingResponse:
+    fetch_timings: dict[str, int] = {}
+    image_bytes = await fetch_image(payload.image_url, timings=fetch_timings)
     if not image_bytes:
         raise HTTPException(status_code=400, detail="empty image_url")
 
-    ct = detect_mime_type(image_bytes)
-
-    start = time.perf_counter()
-    result = tag_bytes(image_bytes, content_type=ct, top_k=top_k)
-    elapsed_ms_total = int((time.perf_counter() - start) * 1000)
-
-    return TagsResponse(
-        tags=result.tags,
-        engine=result.engine,
-        timings_ms={"tagging": result.elapsed_ms, "total": elapsed_ms_total},
-    )
-
-
-@router.post("/tags/b64", response_model=TagsResponse)
-async def tags_b64_endpoint(payload: OcrB64Request, top_k: int = 50) -> TagsResponse:
+    return await _tags(
+        image_bytes,
+        options=_options(top_k=top_k, threshold=threshold, scores=scores, embedding=embedding),
+        stream=stream,
+        fetch_timings=fetch_timings,
+    )
+
+
+@router.post("/tags/b64", response_model=TagsResponse)
+async def tags_b64_endpoint(
+    *,
+    payload: OcrB64Request,
+    top_k: int = 50,
+    threshold: float | None = ThresholdQuery,
+    scores: bool = ScoresQuery,
+    embedding: bool = EmbeddingQuery,
+    stream: bool = False,
+) -> TagsResponse | StreamingResponse:
     image_bytes = decode_image_b64(payload.image_b64)
 
     if not image_bytes:
@@ -66,14 +132,42 @@ async def tags_b64_endpoint(payload: OcrB64Request, top_k: int = 50) -> TagsResp
     if len(image_bytes) > settings.max_image_bytes:
         raise HTTPException(status_code=413, detail="image too large")
 
-    ct = detect_mime_type(image_bytes)
-
-    start = time.perf_counter()
-    result = tag_bytes(image_bytes, content_type=ct, top_k=top_k)
-    elapsed_ms_total = int((time.perf_counter() - start) * 1000)
-
-    return TagsResponse(
-        tags=result.tags,
-        engine=result.engine,
-        timings_ms={"tagging": result.elapsed_ms, "total": elapsed_ms_total},
-    )
+    return await _tags(
+        image_bytes,
+        options=_options(top_k=top_k, threshold=threshold, scores=scores, embedding=embedding),
+        stream=stream,
+    )
+
+
+@router.post("/tags/batch", response_model=TagsBatchResponse)
+async def tags_batch_endpoint(
+    *,
+    payload: BatchRequest,
+    top_k: int = 50,
+    threshold: float | None = ThresholdQuery,
+    scores: bool = ScoresQuery,
+    embedding: bool = EmbeddingQuery,
+    stream: bool = False,
+) -> TagsBatchResponse | StreamingResponse:
+    return await _tags_batch(
+        request_sources(payload),
+        options=_options(top_k=top_k, threshold=threshold, scores=scores, embedding=embedding),
+        stream=stream,
+    )
+
+
+@router.post("/tags/batch/files", response_model=TagsBatchResponse)
+async def tags_batch_files_endpoint(
+    *,
+    files: list[UploadFile] = FilesUpload,
+    top_k: int = 50,
+    threshold: float | None = ThresholdQuery,
+    scores: bool = ScoresQuery,
+    embedding: bool = EmbeddingQuery,
+    stream: bool = False,
+) -> TagsBatchResponse | StreamingResponse:
+    return await _tags_batch(
+        upload_sources(files),
+        options=_options(top_k=top_k, threshold=threshold, scores=scores, embedding=embedding),
+        stream=stream,
+    )
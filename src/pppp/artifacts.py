@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+# built-in
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+from threading import Lock
+from urllib.parse import urlparse
+
+# external
+import httpx
+
+# project
+from pppp.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# sha256 of every cached file, relative to the cache dir, recorded when it was first downloaded
+_MANIFEST = "manifest.json"
+# size, mtime and sha256 of every file last hashed and found to match; an unchanged file is not hashed again
+_VERIFIED = "verified.json"
+_manifest_lock = Lock()
+# what this process verified, for when the cache is read-only and _VERIFIED cannot be written
+_verified_here: dict[str, list] = {}
+
+_CHUNK = 1024 * 1024
+
+# what PaddleOCR looks for in a model directory before deciding to download it
+_PADDLE_MODEL_FILES = ("inference.pdmodel", "inference.pdiparams")
+
+
+class ArtifactError(RuntimeError):
+    """A model artifact is missing from the cache in offline mode, or does not match its checksum."""
+
+
+def cache_dir() -> Path:
+    return Path(settings.model_cache_dir).expanduser()
+
+
+def configure_hub_environment() -> None:
+    """Point the Hugging Face hub (RAM++'s tokenizer) at the model cache, and keep it offline when we are.
+
+    Has to run before transformers is imported, the hub reads these variables once at import.
+    """
+
+    os.environ.setdefault("HF_HOME", str(cache_dir() / "huggingface"))
+    if settings.model_offline:
+        os.environ["HF_HUB_OFFLINE"] = "1"
+        os.environ["TRANSFORMERS_OFFLINE"] = "1"
+
+
+def sha256_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        while chunk := f.read(_CHUNK):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def read_manifest() -> dict[str, str]:
+    try:
+        return json.loads((cache_dir() / _MANIFEST).read_text())
+    except FileNotFoundError:
+        return {}
+
+
+def _write_manifest(manifest: dict[str, str]) -> None:
+    root = cache_dir()
+    root.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=root, prefix=f".{_MANIFEST}.")
+    with os.fdopen(fd, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    Path(tmp).replace(root / _MANIFEST)
+
+
+def _read_verified() -> dict[str, list]:
+    try:
+        verified = json.loads((cache_dir() / _VERIFIED).read_text())
+    except (FileNotFoundError, ValueError):
+        verified = {}
+    return {**verified, **_verified_here}
+
+
+def _write_verified(verified: dict[str, list]) -> None:
+    _verified_here.update(verified)
+    root = cache_dir()
+    try:
+        fd, tmp = tempfile.mkstemp(dir=root, prefix=f".{_VERIFIED}.")
+        with os.fdopen(fd, "w") as f:
+            json.dump(verified, f, indent=2, sort_keys=True)
+        Path(tmp).replace(root / _VERIFIED)
+    except OSError:
+        # a read-only cache (baked into the image) keeps what `pppp-models fetch` wrote at build time
+        logger.debug("cannot write %s, verified checksums are not remembered", root / _VERIFIED)
+
+
+def _stamp(f: Path) -> list[int]:
+    st = f.stat()
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _files(path: Path) -> list[Path]:
+    if path.is_dir():
+        return sorted(p for p in path.rglob("*") if p.is_file())
+    return [path] if path.is_file() else []
+
+
+def record(path: Path) -> None:
+    """Add the checksum of every file under ``path`` the manifest does not know yet."""
+
+    root = cache_dir()
+    with _manifest_lock:
+        manifest = read_manifest()
+        added = {}
+        for f in _files(path):
+            key = f.relative_to(root).as_posix()
+            if key not in manifest:
+                added[key] = sha256_file(f)
+        if added:
+            # a worker process recording at the same moment can drop these entries, which only means
+            # the files get recorded on a later load instead
+            _write_manifest({**read_manifest(), **added})
+            # just hashed, so the next load need not hash them again
+            _write_verified({**_read_verified(), **{key: [*_stamp(root / key), h] for key, h in added.items()}})
+
+
+def verify(path: Path, *, expected: str | None = None) -> None:
+    """Check every file under ``path`` against its recorded checksum, or a single file against ``expected``.
+
+    A file already found to match is only hashed again once its size or mtime changed.
+    """
+
+    root = cache_dir()
+    with _manifest_lock:
+        manifest = read_manifest()
+        verified = _read_verified()
+        changed = False
+        for f in _files(path):
+            key = f.relative_to(root).as_posix() if f.is_relative_to(root) else str(f)
+            want = expected or manifest.get(key)
+            if want is None:
+                continue
+            stamp = _stamp(f)
+            if verified.get(key) == [*stamp, want]:
+                continue
+            got = sha256_file(f)
+            if got != want:
+                raise ArtifactError(f"{f} has sha256 {got}, expected {want}; delete it and fetch it again")
+            verified[key] = [*stamp, want]
+            changed = True
+        if changed:
+            _write_verified(verified)
+
+
+def verify_cache() -> None:
+    """Check every file of the manifest that is in the cache, e.g. once before engine workers start."""
+
+    verify(cache_dir())
+
+
+def _download(url: str, dest: Path, *, sha256: str | None) -> None:
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    logger.info("downloading %s to %s", url, dest)
+
+    fd, tmp = tempfile.mkstemp(dir=dest.parent, prefix=f".{dest.name}.")
+    h = hashlib.sha256()
+    try:
+        with (
+            os.fdopen(fd, "wb") as f,
+            httpx.stream("GET", url, follow_redirects=True, timeout=settings.fetch_timeout_s) as r,
+        ):
+            r.raise_for_status()
+            for chunk in r.iter_bytes(_CHUNK):
+                h.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+    if sha256 and h.hexdigest() != sha256:
+        Path(tmp).unlink()
+        raise ArtifactError(f"{url} has sha256 {h.hexdigest()}, expected {sha256}")
+    # only a complete, verified file ever appears under the final name
+    Path(tmp).replace(dest)
+    record(dest)
+
+
+def rampp_checkpoint() -> str:
+    """Local path of the RAM++ checkpoint, downloaded into the cache first unless we are offline."""
+
+    source = settings.rampp_checkpoint
+    url = urlparse(source)
+    if url.scheme not in {"http", "https"}:
+        # already a file on disk
+        return source
+
+    path = cache_dir() / "rampp" / Path(url.path).name
+    if not path.is_file():
+        if settings.model_offline:
+            raise ArtifactError(f"{path} is not in the model cache and model_offline is set, run `pppp-models fetch`")
+        _download(source, path, sha256=settings.rampp_checkpoint_sha256 or None)
+    elif settings.model_verify_checksums:
+        verify(path, expected=settings.rampp_checkpoint_sha256 or None)
+
+    return str(path)
+
+
+def paddle_root() -> Path:
+    return cache_dir() / "paddle" / settings.paddle_lang
+
+
+def paddle_model_dirs() -> dict[str, str]:
+    """``det_model_dir``/``rec_model_dir``/``cls_model_dir`` arguments for PaddleOCR inside the cache.
+
+    PaddleOCR downloads a missing model into the directory it is given, so online the first load fills
+    the cache; offline, every directory must already hold its model.
+    """
+
+    root = paddle_root()
+    dirs = {"det_model_dir": root / "det", "rec_model_dir": root / "rec"}
+    if settings.paddle_use_angle_cls:
+        dirs["cls_model_dir"] = root / "cls"
+
+    for d in dirs.values():
+        present = all((d / name).is_file() for name in _PADDLE_MODEL_FILES)
+        if not present and settings.model_offline:
+            raise ArtifactError(f"{d} is not in the model cache and model_offline is set, run `pppp-models fetch`")
+        if present and settings.model_verify_checksums:
+            verify(d)
+
+    return {arg: str(d) for arg, d in dirs.items()}
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+# built-in
+import contextlib
+import os
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+
+
+class CacheBackend(ABC):
+    """Byte-valued key/value store with a TTL."""
+
+    # backends that touch the filesystem are called off the event loop
+    blocking: bool = False
+
+    @abstractmethod
+    def get(self, key: str) -> bytes | None: ...
+
+    @abstractmethod
+    def set(self, key: str, value: bytes) -> None: ...
+
+    def stats(self) -> dict[str, int]:
+        return {}
+
+
+class MemoryCache(CacheBackend):
+    """In-process LRU bounded by total value size, with per-entry expiry."""
+
+    def __init__(self, *, max_bytes: int, ttl_s: float) -> None:
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._size = 0
+        self._lock = Lock()
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl_s, value)
+            self._size += len(value)
+            while self._size > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+
+    def _drop(self, key: str) -> None:
+        _expires_at, value = self._entries.pop(key)
+        self._size -= len(value)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._size}
+
+
+class DiskCache(CacheBackend):
+    """One file per key under ``root``, safe to share between worker processes.
+
+    Writes go through a temp file and ``os.replace`` so readers never see partial entries.
+    Expiry is by mtime; the total size is trimmed oldest-first every ``sweep_every`` writes.
+    """
+
+    blocking = True
+
+    def __init__(self, root: str | os.PathLike[str], *, max_bytes: int, ttl_s: float, sweep_every: int = 64) -> None:
+        self.root = Path(root).expanduser()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self.sweep_every = sweep_every
+        self._writes = 0
+        self._lock = Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def get(self, key: str) -> bytes | None:
+        path = self._path(key)
+        try:
+            if path.stat().st_mtime + self.ttl_s < time.time():
+                path.unlink(missing_ok=True)
+                return None
+            return path.read_bytes()
+        except OSError:
+            return None
+
+    def set(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(value)
+            Path(tmp).replace(path)
+        except OSError:
+            with contextlib.suppress(OSError):
+                Path(tmp).unlink()
+            return
+
+        with self._lock:
+            self._writes += 1
+            sweep = self._writes % self.sweep_every == 0
+        if sweep:
+            self.sweep()
+
+    def sweep(self) -> None:
+        """Remove expired entries, then the oldest ones until the cache fits in ``max_bytes``."""
+
+        now = time.time()
+        entries: list[tuple[float, int, Path]] = []
+        for path in self.root.glob("*/*"):
+            if path.name.startswith(".tmp-"):
+                continue
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            if st.st_mtime + self.ttl_s < now:
+                path.unlink(missing_ok=True)
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+
+        total = sum(size for _mtime, size, _path in entries)
+        for _mtime, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+# built-in
+import asyncio
+import dataclasses
+import hashlib
+import json
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import TYPE_CHECKING, Any
+
+# project
+from pppp.cache.backends import DiskCache, MemoryCache
+from pppp.settings import settings
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+
+    from pppp.cache.backends import CacheBackend
+
+_lock = Lock()
+_cache: ResultCache | None = None
+
+
+def result_key(engine: str, image_bytes: bytes, params: dict[str, Any]) -> str:
+    """Content address for an engine result: image digest plus every setting that changes the output."""
+
+    h = hashlib.sha256()
+    h.update(engine.encode())
+    h.update(b"\0")
+    h.update(json.dumps(params, sort_keys=True, separators=(",", ":")).encode())
+    h.update(b"\0")
+    h.update(image_bytes)
+    return h.hexdigest()
+
+
+@dataclass(frozen=True)
+class Computed[T]:
+    """A result with what was learned computing it, handed to every caller coalesced onto that computation."""
+
+    result: T
+    # reused from a near-duplicate image instead of running the model
+    near_duplicate: bool = False
+    # stage timings of the computation (decode, queue, the model)
+    timings: dict[str, int] = field(default_factory=dict)
+
+
+class ResultCache:
+    """Engine result cache that coalesces concurrent misses for the same key.
+
+    The first caller for a key starts the computation as its own task; everyone else that asks for
+    the key meanwhile awaits that same task, so the model runs once per image no matter how many
+    copies arrive together.
+    """
+
+    def __init__(self, backend: CacheBackend | None) -> None:
+        self.backend = backend
+        self._inflight: dict[str, asyncio.Task[Any]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def _get(self, key: str) -> bytes | None:
+        if self.backend is None:
+            return None
+        if self.backend.blocking:
+            return await asyncio.to_thread(self.backend.get, key)
+        return self.backend.get(key)
+
+    async def _set(self, key: str, value: bytes) -> None:
+        if self.backend is None:
+            return
+        if self.backend.blocking:
+            await asyncio.to_thread(self.backend.set, key, value)
+        else:
+            self.backend.set(key, value)
+
+    async def lookup[T](self, key: str, *, result_type: type[T]) -> T | None:
+        """Return the stored result for ``key``, or None; for callers that compute and :meth:`store` themselves."""
+
+        raw = await self._get(key)
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return result_type(**json.loads(raw))
+
+    async def store(self, key: str, result: object) -> None:
+        await self._set(key, json.dumps(dataclasses.asdict(result)).encode())
+
+    async def get_or_compute[T](
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Computed[T]]],
+        *,
+        result_type: type[T],
+    ) -> tuple[Computed[T], bool]:
+        """Return ``(computed, hit)``; ``hit`` is False only for the caller whose compute actually ran.
+
+        Callers that joined a computation in flight get the same :class:`Computed` as the one that started
+        it; a result read back from the backend carries no timings.
+        """
+
+        raw = await self._get(key)
+        if raw is not None:
+            self.hits += 1
+            return Computed(result_type(**json.loads(raw))), True
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.hits += 1
+            return await asyncio.shield(task), True
+
+        async def _compute_and_store() -> Computed[T]:
+            try:
+                computed = await compute()
+                await self.store(key, computed.result)
+                return computed
+            finally:
+                self._inflight.pop(key, None)
+
+        self.misses += 1
+        task = asyncio.ensure_future(_compute_and_store())
+        self._inflight[key] = task
+        return await asyncio.shield(task), False
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "backend": type(self.backend).__name__ if self.backend is not None else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "inflight": len(self._inflight),
+            **(self.backend.stats() if self.backend is not None else {}),
+        }
+
+
+def _make_backend() -> CacheBackend | None:
+    if settings.cache_backend == "memory":
+        return MemoryCache(max_bytes=settings.cache_max_bytes, ttl_s=settings.cache_ttl_s)
+    if settings.cache_backend == "disk":
+        return DiskCache(settings.cache_dir, max_bytes=settings.cache_max_bytes, ttl_s=settings.cache_ttl_s)
+    return None
+
+
+def get_result_cache() -> ResultCache:
+    """Get the result cache singleton for the configured backend."""
+
+    global _cache
+    if _cache is not None:
+        return _cache
+
+    with _lock:
+        if _cache is None:
+            _cache = ResultCache(_make_backend())
+        return _cache
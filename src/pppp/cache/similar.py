@@ -0,0 +1,282 @@
+from __future__ import annotations
+
+# built-in
+import asyncio
+import hashlib
+import json
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+from typing import TYPE_CHECKING, Any
+
+# project
+from pppp.settings import settings
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+_lock = Lock()
+_index: NearDuplicateIndex | None = None
+
+_HASH_BITS = 64
+# the sqlite index trims itself back to max_entries every this many adds
+_TRIM_EVERY = 256
+
+
+def _bands(max_distance: int) -> list[tuple[int, int]]:
+    """(shift, mask) of ``max_distance + 1`` disjoint slices of the hash.
+
+    Two hashes at most ``max_distance`` bits apart differ in at most that many slices, so at least one
+    slice is identical and an exact lookup per slice finds every candidate.
+    """
+
+    count = min(max_distance + 1, _HASH_BITS)
+    bands = []
+    shift = 0
+    for i in range(count):
+        width = _HASH_BITS // count + (1 if i < _HASH_BITS % count else 0)
+        bands.append((shift, (1 << width) - 1))
+        shift += width
+    return bands
+
+
+class SimilarIndex(ABC):
+    """Perceptual hashes of processed images, each pointing at the result cache key of its result.
+
+    Entries are grouped by ``scope`` (engine and output-affecting settings), a lookup only matches
+    within its own scope.
+    """
+
+    # backends that touch the filesystem are called off the event loop
+    blocking: bool = False
+
+    def __init__(self, *, max_distance: int, max_entries: int) -> None:
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self._bands = _bands(max_distance)
+
+    def _chunks(self, phash: int) -> list[int]:
+        return [(phash >> shift) & mask for shift, mask in self._bands]
+
+    @abstractmethod
+    def add(self, scope: str, phash: int, key: str) -> None: ...
+
+    @abstractmethod
+    def nearest(self, scope: str, phash: int) -> tuple[str, int] | None:
+        """The key of the closest entry within ``max_distance`` bits, and that distance."""
+
+    def stats(self) -> dict[str, int]:
+        return {}
+
+
+class MemorySimilarIndex(SimilarIndex):
+    """In-process index, dropping the oldest entries past ``max_entries``."""
+
+    def __init__(self, *, max_distance: int, max_entries: int) -> None:
+        super().__init__(max_distance=max_distance, max_entries=max_entries)
+        self._entries: OrderedDict[int, tuple[str, int, str]] = OrderedDict()
+        # (scope, band, chunk) -> ids, a dict for ordered O(1) removal
+        self._buckets: dict[tuple[str, int, int], dict[int, None]] = {}
+        self._next_id = 0
+        self._lock = Lock()
+
+    def add(self, scope: str, phash: int, key: str) -> None:
+        with self._lock:
+            entry = self._next_id
+            self._next_id += 1
+            self._entries[entry] = (scope, phash, key)
+            for band, chunk in enumerate(self._chunks(phash)):
+                self._buckets.setdefault((scope, band, chunk), {})[entry] = None
+
+            while len(self._entries) > self.max_entries:
+                old, (old_scope, old_hash, _old_key) = self._entries.popitem(last=False)
+                for band, chunk in enumerate(self._chunks(old_hash)):
+                    bucket = self._buckets[old_scope, band, chunk]
+                    del bucket[old]
+                    if not bucket:
+                        del self._buckets[old_scope, band, chunk]
+
+    def nearest(self, scope: str, phash: int) -> tuple[str, int] | None:
+        best = None
+        with self._lock:
+            for band, chunk in enumerate(self._chunks(phash)):
+                for entry in self._buckets.get((scope, band, chunk), ()):
+                    _scope, other, key = self._entries[entry]
+                    distance = (phash ^ other).bit_count()
+                    if distance <= self.max_distance and (best is None or distance < best[1]):
+                        best = (key, distance)
+        return best
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "buckets": len(self._buckets)}
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    scope TEXT NOT NULL,
+    hash INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS bands (
+    scope TEXT NOT NULL,
+    band INTEGER NOT NULL,
+    chunk INTEGER NOT NULL,
+    id INTEGER NOT NULL,
+    PRIMARY KEY (scope, band, chunk, id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS bands_id ON bands (id);
+"""
+
+
+def _signed(phash: int) -> int:
+    # sqlite integers are signed 64-bit
+    return phash - (1 << _HASH_BITS) if phash >> (_HASH_BITS - 1) else phash
+
+
+class SqliteSimilarIndex(SimilarIndex):
+    """Index in one SQLite file, for millions of entries and sharing between worker processes.
+
+    Every slice of every hash is a row of a covering index, so a lookup is one index probe per slice
+    whatever the size of the table. The slicing depends on ``max_distance``, so it is part of the scope
+    stored in the file: processes slicing differently share it without matching each other's rows.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str, *, max_distance: int, max_entries: int) -> None:
+        super().__init__(max_distance=max_distance, max_entries=max_entries)
+        db_path = Path(path).expanduser()
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False, timeout=30.0)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._layout = f"{len(self._bands)}:"
+        self._adds = 0
+        self._lock = Lock()
+
+    def add(self, scope: str, phash: int, key: str) -> None:
+        scope = self._layout + scope
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                cur = self._db.execute(
+                    "INSERT INTO entries (scope, hash, key, created_at) VALUES (?, ?, ?, ?)",
+                    (scope, _signed(phash), key, time.time()),
+                )
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO bands (scope, band, chunk, id) VALUES (?, ?, ?, ?)",
+                    [(scope, band, chunk, cur.lastrowid) for band, chunk in enumerate(self._chunks(phash))],
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+            self._adds += 1
+            if self._adds % _TRIM_EVERY == 0:
+                self._trim()
+
+    def _trim(self) -> None:
+        # ids only grow, so everything at or below the cutoff is older than the newest max_entries
+        (newest,) = self._db.execute("SELECT MAX(id) FROM entries").fetchone()
+        cutoff = (newest or 0) - self.max_entries
+        if cutoff > 0:
+            self._db.execute("DELETE FROM entries WHERE id <= ?", (cutoff,))
+            self._db.execute("DELETE FROM bands WHERE id <= ?", (cutoff,))
+
+    def nearest(self, scope: str, phash: int) -> tuple[str, int] | None:
+        scope = self._layout + scope
+        rows: set[tuple[int, str]] = set()
+        with self._lock:
+            for band, chunk in enumerate(self._chunks(phash)):
+                rows.update(
+                    self._db.execute(
+                        "SELECT e.hash, e.key FROM bands b JOIN entries e ON e.id = b.id"
+                        " WHERE b.scope = ? AND b.band = ? AND b.chunk = ?",
+                        (scope, band, chunk),
+                    ).fetchall()
+                )
+
+        best = None
+        for other, key in rows:
+            distance = (phash ^ (other & ((1 << _HASH_BITS) - 1))).bit_count()
+            if distance <= self.max_distance and (best is None or distance < best[1]):
+                best = (key, distance)
+        return best
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            (count,) = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()
+        return {"entries": count}
+
+
+def scope_key(engine: str, params: dict[str, Any]) -> str:
+    """Short digest of an engine and every setting that changes its output."""
+
+    blob = json.dumps([engine, params], sort_keys=True, separators=(",", ":")).encode()
+    return hashlib.sha256(blob).hexdigest()[:16]
+
+
+class NearDuplicateIndex:
+    """Async front for a :class:`SimilarIndex`, counting how often it finds a match."""
+
+    def __init__(self, backend: SimilarIndex) -> None:
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    async def _call[**P, T](self, fn: Callable[P, T], *args: P.args, **kwargs: P.kwargs) -> T:
+        if self.backend.blocking:
+            return await asyncio.to_thread(fn, *args, **kwargs)
+        return fn(*args, **kwargs)
+
+    async def find(self, engine: str, params: dict[str, Any], phash: int) -> tuple[str, int] | None:
+        found = await self._call(self.backend.nearest, scope_key(engine, params), phash)
+        if found is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return found
+
+    async def add(self, engine: str, params: dict[str, Any], phash: int, key: str) -> None:
+        await self._call(self.backend.add, scope_key(engine, params), phash, key)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "backend": type(self.backend).__name__,
+            "max_distance": self.backend.max_distance,
+            "hits": self.hits,
+            "misses": self.misses,
+            **self.backend.stats(),
+        }
+
+
+def _make_backend() -> SimilarIndex:
+    if settings.near_dup_backend == "sqlite":
+        return SqliteSimilarIndex(
+            settings.near_dup_db_path,
+            max_distance=settings.near_dup_max_distance,
+            max_entries=settings.near_dup_max_entries,
+        )
+    return MemorySimilarIndex(max_distance=settings.near_dup_max_distance, max_entries=settings.near_dup_max_entries)
+
+
+def get_near_duplicate_index() -> NearDuplicateIndex | None:
+    """Get the near-duplicate index singleton, None when no engine reuses near duplicates."""
+
+    global _index
+    if not settings.near_dup_engines:
+        return None
+    if _index is not None:
+        return _index
+
+    with _lock:
+        if _index is None:
+            _index = NearDuplicateIndex(_make_backend())
+        return _index
@@ -0,0 +1,5 @@
+# project
+from pppp.artifacts import configure_hub_environment
+
+# before any engine module imports transformers
+configure_hub_environment()
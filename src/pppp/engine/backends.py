@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+# built-in
+import contextlib
+import logging
+from pathlib import Path
+from typing import TYPE_CHECKING, Literal
+
+# external
+import torch
+from torch import nn
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+logger = logging.getLogger(__name__)
+
+type Backend = Literal["eager", "int8", "bf16", "compile", "torchscript"]
+
+
+def cpu_supports_bf16() -> bool:
+    """Does this CPU have native bf16 math (AVX512-BF16 or AMX)? Without it bf16 is emulated and slower."""
+
+    try:
+        flags = Path("/proc/cpuinfo").read_text()
+    except OSError:
+        return False
+    return "avx512_bf16" in flags or "amx_bf16" in flags
+
+
+def _bf16_ok(device: torch.device) -> bool:
+    if device.type == "cuda":
+        return torch.cuda.is_bf16_supported()
+    return cpu_supports_bf16()
+
+
+def optimize(
+    model: nn.Module,
+    *,
+    backend: Backend,
+    device: torch.device,
+    example: torch.Tensor,
+) -> tuple[nn.Module, torch.dtype | None]:
+    """Apply an inference backend to an eval-mode model on ``device``.
+
+    Returns the model to run and the autocast dtype to run it under, if any. Backends that do not fit
+    the device fall back to eager with a warning rather than failing startup.
+    """
+
+    autocast = None
+
+    if backend == "int8":
+        if device.type == "cpu":
+            # weights of every linear layer become int8, activations are quantized on the fly per batch
+            model = torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+        else:
+            logger.warning("int8 dynamic quantization only runs on cpu, using eager on %s", device)
+
+    elif backend == "bf16":
+        if _bf16_ok(device):
+            autocast = torch.bfloat16
+        else:
+            logger.warning("%s has no native bf16 support, using eager fp32", device)
+
+    elif backend in {"compile", "torchscript"} and not hasattr(model, "visual_encoder"):
+        logger.warning("model has no visual_encoder to optimize, using eager")
+
+    elif backend == "compile":
+        # the image encoder is where the time goes; the tagging head mixes in numpy and python string work.
+        # compilation happens on the first forward pass, which the startup warmup takes care of
+        model.visual_encoder = torch.compile(model.visual_encoder, dynamic=True)
+
+    elif backend == "torchscript":
+        # the graph only takes the batch size of the example, see max_batch_size
+        with torch.no_grad():
+            traced = torch.jit.trace(model.visual_encoder, example.to(device))
+        model.visual_encoder = torch.jit.optimize_for_inference(torch.jit.freeze(traced))
+
+    return model, autocast
+
+
+def max_batch_size(backend: Backend, configured: int) -> int:
+    """Largest batch the model may be given under ``backend``.
+
+    Tracing turns the batch size Swin's window reshapes compute into a constant, so a traced encoder
+    fails or mixes images up on any batch but its example's, which is a single image.
+    """
+
+    return 1 if backend == "torchscript" else configured
+
+
+@contextlib.contextmanager
+def inference(device: torch.device, autocast: torch.dtype | None) -> Iterator[None]:
+    """No autograd bookkeeping at all, under autocast when the backend asks for it."""
+
+    with torch.inference_mode():
+        if autocast is None:
+            yield
+            return
+        with torch.autocast(device_type=device.type, dtype=autocast):
+            yield
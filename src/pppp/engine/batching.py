@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+# built-in
+import queue
+import time
+from collections import Counter
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from threading import Lock, Thread
+from typing import TYPE_CHECKING, Any
+
+# project
+from pppp import metrics
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Sequence
+
+
+@dataclass
+class _Pending[I, O]:
+    item: I
+    future: Future[O] = field(default_factory=Future)
+    queued_at: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class BatchStats:
+    batches: int = 0
+    items: int = 0
+    sizes: Counter[int] = field(default_factory=Counter)
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": (self.items / self.batches) if self.batches else 0.0,
+            "batch_sizes": dict(sorted(self.sizes.items())),
+        }
+
+
+def _fail(batch: list[_Pending[Any, Any]], error: BaseException) -> None:
+    for p in batch:
+        p.future.set_exception(error)
+
+
+class MicroBatcher[I, O]:
+    """Collect items from concurrent callers and run them through ``run_batch`` together.
+
+    A single background thread owns the model call. It takes the first queued item, then keeps
+    collecting until ``max_batch_size`` items are in hand or ``max_wait_ms`` has passed, and fans
+    the outputs back out to the callers blocked in :meth:`submit`.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        run_batch: Callable[[list[I]], Sequence[O]],
+        *,
+        max_batch_size: int,
+        max_wait_ms: float,
+    ) -> None:
+        self.name = name
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_s = max(0.0, max_wait_ms) / 1000
+        self._run_batch = run_batch
+        self._queue: queue.SimpleQueue[_Pending[I, O]] = queue.SimpleQueue()
+        self._stats = BatchStats()
+        self._stats_lock = Lock()
+        self._thread = Thread(target=self._loop, name=f"pppp-{name}-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, items: Sequence[I]) -> list[O]:
+        """Queue ``items`` for batching and block until all of their outputs are ready."""
+
+        pending = [_Pending(item) for item in items]
+        for p in pending:
+            self._queue.put(p)
+        return [p.future.result() for p in pending]
+
+    def stats(self) -> dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_s * 1000,
+                **self._stats.snapshot(),
+            }
+
+    def _collect(self) -> list[_Pending[I, O]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_s
+
+        while len(batch) < self.max_batch_size:
+            # drain whatever is already queued before paying for any waiting
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _loop(self) -> None:
+        while True:
+            batch = self._collect()
+            batch = [p for p in batch if p.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            started = time.monotonic()
+            metrics.BATCH_SIZE.observe(len(batch), engine=self.name)
+            for p in batch:
+                metrics.BATCH_WAIT_SECONDS.observe(started - p.queued_at, engine=self.name)
+
+            try:
+                outputs = self._run_batch([p.item for p in batch])
+            except BaseException as e:
+                _fail(batch, e)
+                continue
+            if len(outputs) != len(batch):
+                _fail(batch, RuntimeError(f"{self.name} batch returned {len(outputs)} outputs for {len(batch)} inputs"))
+                continue
+
+            for p, out in zip(batch, outputs, strict=True):
+                p.future.set_result(out)
+
+            with self._stats_lock:
+                self._stats.batches += 1
+                self._stats.items += len(batch)
+                self._stats.sizes[len(batch)] += 1
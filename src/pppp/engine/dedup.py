@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+# built-in
+from collections import Counter, defaultdict
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+# characters per shingle; short enough that a misread letter only spoils a few of them
+_SHINGLE = 3
+# boxes of the same line in two frames overlap at least this much (intersection over union)
+_MIN_BOX_IOU = 0.5
+# a line read in two tiles: at least this much of the smaller box lies inside the larger one
+_MIN_TILE_OVERLAP = 0.5
+
+type Rect = tuple[float, float, float, float]
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.split()).lower()
+
+
+def shingles(text: str) -> frozenset[str]:
+    """The set of character n-grams of normalized ``text``, the whole text when it is shorter."""
+
+    norm = normalize(text)
+    if len(norm) <= _SHINGLE:
+        return frozenset([norm]) if norm else frozenset()
+    return frozenset(norm[i : i + _SHINGLE] for i in range(len(norm) - _SHINGLE + 1))
+
+
+class TextIndex:
+    """Every text added so far, as shingle sets behind an inverted index.
+
+    A lookup only touches the earlier texts that share a shingle with the new one, and counts the
+    shared shingles straight from the postings, so its cost does not grow with text length squared or
+    with how far back the match is.
+    """
+
+    def __init__(self, *, threshold: float) -> None:
+        self.threshold = threshold
+        self._sizes: list[int] = []
+        self._postings: defaultdict[str, list[int]] = defaultdict(list)
+
+    def __len__(self) -> int:
+        return len(self._sizes)
+
+    def add(self, grams: frozenset[str]) -> int:
+        """Index a shingle set, returning its id."""
+
+        entry = len(self._sizes)
+        self._sizes.append(len(grams))
+        for gram in grams:
+            self._postings[gram].append(entry)
+        return entry
+
+    def similar(self, grams: frozenset[str]) -> list[tuple[int, float]]:
+        """Ids of indexed texts with a Jaccard similarity of at least ``threshold``, most similar first."""
+
+        shared: Counter[int] = Counter()
+        for gram in grams:
+            shared.update(self._postings.get(gram, ()))
+
+        matches = []
+        for entry, inter in shared.items():
+            sim = inter / (len(grams) + self._sizes[entry] - inter)
+            if sim >= self.threshold:
+                matches.append((entry, sim))
+        matches.sort(key=lambda m: m[1], reverse=True)
+        return matches
+
+    def seen(self, grams: frozenset[str]) -> bool:
+        return bool(grams) and bool(self.similar(grams))
+
+
+def _rect(box: Sequence[Sequence[float]]) -> Rect:
+    xs = [float(p[0]) for p in box]
+    ys = [float(p[1]) for p in box]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def _area(r: Rect) -> float:
+    return (r[2] - r[0]) * (r[3] - r[1])
+
+
+def _intersection(a: Rect, b: Rect) -> Rect | None:
+    r = (max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3]))
+    return r if r[2] > r[0] and r[3] > r[1] else None
+
+
+def _iou(a: Rect, b: Rect) -> float:
+    shared = _intersection(a, b)
+    if shared is None:
+        return 0.0
+    inter = _area(shared)
+    union = _area(a) + _area(b) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def _overlap_of_smaller(a: Rect, b: Rect) -> float:
+    shared = _intersection(a, b)
+    smaller = min(_area(a), _area(b))
+    return _area(shared) / smaller if shared is not None and smaller > 0 else 0.0
+
+
+def merge_tiles(tiles: list[tuple[Rect, list[dict[str, Any]]]]) -> list[dict[str, Any]]:
+    """Lines of overlapping tiles, boxes already in image coordinates, with each line read twice kept once.
+
+    Two lines from different tiles are one when most of the smaller box lies inside the other. The larger
+    box wins, the smaller one is usually the part of the line a tile edge cut off; equal boxes keep the
+    more confident reading. Only lines inside the area two tiles share are compared.
+    """
+
+    rects = [[_rect(line["box"]) if line.get("box") is not None else None for line in lines] for _r, lines in tiles]
+    keep = [[True] * len(lines) for _r, lines in tiles]
+
+    def _rank(t: int, i: int) -> tuple[float, float]:
+        rect = rects[t][i]
+        return (_area(rect) if rect is not None else 0.0, tiles[t][1][i].get("confidence") or 0.0)
+
+    for a, (a_tile, _a_lines) in enumerate(tiles):
+        for b in range(a + 1, len(tiles)):
+            shared = _intersection(a_tile, tiles[b][0])
+            if shared is None:
+                continue
+            a_near = [i for i, r in enumerate(rects[a]) if r is not None and _intersection(r, shared) is not None]
+            b_near = [j for j, r in enumerate(rects[b]) if r is not None and _intersection(r, shared) is not None]
+            for i in a_near:
+                for j in b_near:
+                    if not (keep[a][i] and keep[b][j]):
+                        continue
+                    if _overlap_of_smaller(rects[a][i], rects[b][j]) >= _MIN_TILE_OVERLAP:
+                        if _rank(a, i) >= _rank(b, j):
+                            keep[b][j] = False
+                        else:
+                            keep[a][i] = False
+
+    return [line for t, (_r, lines) in enumerate(tiles) for i, line in enumerate(lines) if keep[t][i]]
+
+
+class LineMerger:
+    """OCR lines of many frames, merged into one entry per text at one position.
+
+    A line joins an earlier one when their texts are near duplicates and their boxes overlap; the
+    merged line lists every frame it was read in and keeps the most confident reading.
+    """
+
+    def __init__(self, *, threshold: float) -> None:
+        self._index = TextIndex(threshold=threshold)
+        self._lines: list[dict[str, Any]] = []
+        self._rects: list[Rect | None] = []
+
+    def add(self, frame: int, lines: list[dict[str, Any]]) -> None:
+        for line in lines:
+            grams = shingles(line["text"])
+            rect = _rect(line["box"]) if line.get("box") is not None else None
+            merged = None
+            if grams:
+                for entry, _sim in self._index.similar(grams):
+                    other = self._rects[entry]
+                    if rect is None or other is None or _iou(rect, other) >= _MIN_BOX_IOU:
+                        merged = self._lines[entry]
+                        break
+
+            if merged is None:
+                self._index.add(grams)
+                self._rects.append(rect)
+                self._lines.append({**line, "frames": [frame]})
+                continue
+
+            if frame not in merged["frames"]:
+                merged["frames"].append(frame)
+            if (line.get("confidence") or 0.0) > (merged.get("confidence") or 0.0):
+                merged.update(line, frames=merged["frames"])
+
+    def lines(self) -> list[dict[str, Any]]:
+        return self._lines
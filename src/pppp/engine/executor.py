@@ -0,0 +1,447 @@
+from __future__ import annotations
+
+# built-in
+import asyncio
+import contextvars
+import functools
+import importlib
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from threading import Event, Lock
+from typing import TYPE_CHECKING, Any
+
+# project
+from pppp import artifacts, metrics, tracing
+from pppp.engine.registry import engine_enabled
+from pppp.engine.shm import SharedFrames, release
+from pppp.settings import settings
+from pppp.utils.images import DecodedImage
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator, Callable, Iterator
+    from concurrent.futures import Executor, Future
+    from multiprocessing.shared_memory import SharedMemory
+    from multiprocessing.synchronize import Barrier
+
+_lock = Lock()
+_executor: InferenceExecutor | None = None
+
+# in an engine worker process, when its model finished loading, and the spans of loading it
+_worker_ready_at = 0.0
+_worker_init_spans: list[tracing.SpanRecord] = []
+# shared by the workers of a pool, see ProcessEnginePool.start
+_worker_started: Barrier | None = None
+
+
+class EngineBusyError(Exception):
+    """Raised when an engine pool cannot accept or start more work."""
+
+    status_code = 503
+
+    def __init__(self, engine: str, detail: str, *, retry_after_s: int) -> None:
+        super().__init__(detail)
+        self.engine = engine
+        self.detail = detail
+        self.retry_after_s = retry_after_s
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        # so the error survives the trip back from a worker process
+        return functools.partial(type(self), retry_after_s=self.retry_after_s), (self.engine, self.detail)
+
+
+class QueueFullError(EngineBusyError):
+    """The engine's admission queue is full."""
+
+    status_code = 429
+
+
+class QueueTimeoutError(EngineBusyError):
+    """The job waited in the queue for longer than the configured timeout."""
+
+    status_code = 503
+
+
+def _queue_timeout(engine: str) -> QueueTimeoutError:
+    return QueueTimeoutError(
+        engine,
+        f"{engine} queue wait exceeded {settings.inference_queue_timeout_s}s",
+        retry_after_s=settings.inference_retry_after_s,
+    )
+
+
+@dataclass(frozen=True)
+class Submission[T]:
+    result: T
+    queue_ms: int
+
+
+class EnginePool:
+    """A bounded worker pool for one inference engine.
+
+    At most ``concurrency`` jobs run at once and at most ``max_queue`` more may wait;
+    anything beyond that is rejected up front instead of piling up on the event loop.
+    """
+
+    def __init__(self, name: str, *, concurrency: int, max_queue: int) -> None:
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.max_queue = max(0, max_queue)
+        self._pool = self._make_pool()
+        self._lock = Lock()
+        self._pending = 0
+        self._running = 0
+
+    def _make_pool(self) -> Executor:
+        return ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix=f"pppp-{self.name}")
+
+    @property
+    def pending(self) -> int:
+        """Jobs admitted and not yet finished (queued + running)."""
+
+        return self._pending
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    def _admit(self) -> None:
+        with self._lock:
+            if self._pending >= self.concurrency + self.max_queue:
+                metrics.ENGINE_REJECTED.inc(engine=self.name, reason="queue_full")
+                raise QueueFullError(
+                    self.name,
+                    f"{self.name} queue is full",
+                    retry_after_s=settings.inference_retry_after_s,
+                )
+            self._pending += 1
+
+    def _release(self, _fut: Future | None) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    async def submit[**P, T](self, fn: Callable[P, T], /, *args: P.args, **kwargs: P.kwargs) -> Submission[T]:
+        """Run ``fn`` on the pool and return its result along with the time spent queued."""
+
+        self._admit()
+
+        enqueued = time.perf_counter()
+        queue_ms = 0
+        ctx = contextvars.copy_context()
+
+        def _run() -> T:
+            nonlocal queue_ms
+            waited = time.perf_counter() - enqueued
+            queue_ms = int(waited * 1000)
+            if waited > settings.inference_queue_timeout_s:
+                raise _queue_timeout(self.name)
+
+            with self._lock:
+                self._running += 1
+            try:
+                return ctx.run(fn, *args, **kwargs)
+            finally:
+                with self._lock:
+                    self._running -= 1
+
+        try:
+            fut = self._pool.submit(_run)
+        except BaseException:
+            self._release(None)
+            raise
+        fut.add_done_callback(self._release)
+
+        try:
+            result = await asyncio.wrap_future(fut)
+        except QueueTimeoutError:
+            metrics.ENGINE_REJECTED.inc(engine=self.name, reason="queue_timeout")
+            raise
+        tracing.record("queue", queue_ms / 1000, engine=self.name)
+        return Submission(result=result, queue_ms=queue_ms)
+
+    async def iterate[**P, T](
+        self,
+        fn: Callable[P, Iterator[T]],
+        /,
+        *args: P.args,
+        **kwargs: P.kwargs,
+    ) -> AsyncIterator[T]:
+        """Drain the generator ``fn`` on the pool, yielding its items on the event loop as they come.
+
+        The job holds its pool slot until the generator is exhausted. If the consumer stops early the
+        generator is closed before it produces another item.
+        """
+
+        loop = asyncio.get_running_loop()
+        items: asyncio.Queue[T] = asyncio.Queue()
+        closed = Event()
+
+        def _drain() -> None:
+            gen = fn(*args, **kwargs)
+            try:
+                for item in gen:
+                    if closed.is_set():
+                        break
+                    loop.call_soon_threadsafe(items.put_nowait, item)
+            finally:
+                gen.close()
+
+        job = asyncio.ensure_future(self.submit(_drain))
+        # an abandoned job's error has nobody left to report to
+        job.add_done_callback(lambda t: t.cancelled() or t.exception())
+        try:
+            while True:
+                get = asyncio.ensure_future(items.get())
+                done, _pending = await asyncio.wait({get, job}, return_when=asyncio.FIRST_COMPLETED)
+                if get in done:
+                    yield get.result()
+                    continue
+
+                # items are queued before the job completes, so whatever is left is already here
+                get.cancel()
+                while not items.empty():
+                    yield items.get_nowait()
+                job.result()
+                return
+        finally:
+            closed.set()
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _drain_to_list[**P, T](fn: Callable[P, Iterator[T]], /, *args: P.args, **kwargs: P.kwargs) -> list[T]:
+    return list(fn(*args, **kwargs))
+
+
+def _init_worker(loader: str, started: Barrier) -> None:
+    global _worker_ready_at, _worker_started
+
+    # the front end verified the model cache once before any worker started, see _process_pools
+    settings.model_verify_checksums = False
+    module, _, func = loader.partition(":")
+    with tracing.capture() as spans:
+        getattr(importlib.import_module(module), func)()
+    _worker_init_spans.extend(spans)
+    _worker_ready_at = time.monotonic()
+    _worker_started = started
+
+
+def _run_in_worker[T](
+    engine: str,
+    fn: Callable[..., T],
+    enqueued: float,
+    args: tuple[Any, ...],
+    kwargs: dict[str, Any],
+) -> tuple[T, int, list[tracing.SpanRecord]]:
+    now = time.monotonic()
+    waited = now - enqueued
+    # time spent waiting for this worker's model to load does not make the job stale
+    if now - max(enqueued, _worker_ready_at) > settings.inference_queue_timeout_s:
+        raise _queue_timeout(engine)
+
+    # the worker's metrics are never scraped, its spans go back to the front end with the result
+    with tracing.capture() as spans:
+        args = tuple(a.load() if isinstance(a, SharedFrames) else a for a in args)
+        result = fn(*args, **kwargs)
+    spans[:0] = _worker_init_spans
+    _worker_init_spans.clear()
+    return result, int(waited * 1000), spans
+
+
+def _wait_for_siblings() -> int:
+    # a worker blocks here until every worker of the pool is, so each one takes exactly one of these
+    assert _worker_started is not None
+    _worker_started.wait()
+    return os.getpid()
+
+
+class ProcessEnginePool(EnginePool):
+    """An engine pool whose jobs run in worker processes, each holding its own copy of the model.
+
+    ``loader`` (``"module:function"``) is called when a worker starts to load the model, so that
+    happens once per worker rather than per job, and a worker only imports its own engine. Decoded
+    images are handed over through shared memory; other arguments are pickled.
+    """
+
+    def __init__(self, name: str, *, workers: int, max_queue: int, loader: str) -> None:
+        self._loader = loader
+        super().__init__(name, concurrency=workers, max_queue=max_queue)
+
+    def _make_pool(self) -> Executor:
+        # fork would copy the front end's threads and locks into the worker
+        context = multiprocessing.get_context("spawn")
+        return ProcessPoolExecutor(
+            max_workers=self.concurrency,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self._loader, context.Barrier(self.concurrency)),
+        )
+
+    @property
+    def running(self) -> int:
+        # the front end cannot see when a worker picks a job up
+        return min(self._pending, self.concurrency)
+
+    async def submit[**P, T](self, fn: Callable[P, T], /, *args: P.args, **kwargs: P.kwargs) -> Submission[T]:
+        self._admit()
+
+        blocks: list[SharedMemory] = []
+
+        def _share(arg: object) -> object:
+            if not isinstance(arg, DecodedImage):
+                return arg
+            handle, shm = SharedFrames.pack(arg)
+            blocks.append(shm)
+            return handle
+
+        def _done(fut: Future | None) -> None:
+            for shm in blocks:
+                release(shm)
+            self._release(fut)
+
+        try:
+            shared_args = tuple(_share(a) for a in args)
+            fut = self._pool.submit(_run_in_worker, self.name, fn, time.monotonic(), shared_args, kwargs)
+        except BaseException:
+            _done(None)
+            raise
+        # blocks stay alive until the worker is done with them, even if the caller gives up first
+        fut.add_done_callback(_done)
+
+        try:
+            result, queue_ms, spans = await asyncio.wrap_future(fut)
+        except QueueTimeoutError:
+            metrics.ENGINE_REJECTED.inc(engine=self.name, reason="queue_timeout")
+            raise
+        tracing.record("queue", queue_ms / 1000, engine=self.name)
+        tracing.replay(spans)
+        return Submission(result=result, queue_ms=queue_ms)
+
+    async def iterate[**P, T](
+        self,
+        fn: Callable[P, Iterator[T]],
+        /,
+        *args: P.args,
+        **kwargs: P.kwargs,
+    ) -> AsyncIterator[T]:
+        """Run the generator ``fn`` to the end in a worker, then yield its items.
+
+        A generator cannot be driven across the process boundary, so items arrive all at once.
+        """
+
+        submission = await self.submit(_drain_to_list, fn, *args, **kwargs)
+        for item in submission.result:
+            yield item
+
+    async def start(self) -> None:
+        """Spawn every worker now, so their models load before the first request instead of during it."""
+
+        # each submission spawns a worker while none is idle, and none of them is done before all are
+        # loaded; a worker whose model fails to load breaks the pool, which fails these too
+        futures = [asyncio.wrap_future(self._pool.submit(_wait_for_siblings)) for _ in range(self.concurrency)]
+        await asyncio.gather(*futures)
+
+
+def _loader(engine: str, load: str, warm: str) -> str:
+    # workers of an engine warmed at startup also run its dummy forward pass before taking jobs
+    return warm if settings.warmup_on_start and engine in settings.warmup_engines else load
+
+
+class InferenceExecutor:
+    """Per-engine pools that keep blocking model calls off the event loop."""
+
+    def __init__(self) -> None:
+        self.pools = self._process_pools() if settings.serving_mode == "process" else self._thread_pools()
+
+    @staticmethod
+    def _thread_pools() -> dict[str, EnginePool]:
+        # a disabled engine gets no pool, so no threads or worker processes either
+        pools: dict[str, EnginePool] = {}
+        if engine_enabled("paddle"):
+            pools["paddle"] = EnginePool(
+                "paddle",
+                concurrency=settings.paddle_concurrency,
+                max_queue=settings.paddle_max_queue,
+            )
+        if engine_enabled("rampp"):
+            pools["rampp"] = EnginePool(
+                "rampp",
+                concurrency=settings.rampp_concurrency,
+                max_queue=settings.rampp_max_queue,
+            )
+        return pools
+
+    @staticmethod
+    def _process_pools() -> dict[str, EnginePool]:
+        # once here rather than in every worker; files the workers download are checked as they arrive
+        if settings.model_verify_checksums:
+            artifacts.verify_cache()
+        pools: dict[str, EnginePool] = {}
+        if engine_enabled("paddle"):
+            pools["paddle"] = ProcessEnginePool(
+                "paddle",
+                workers=settings.paddle_workers,
+                max_queue=settings.paddle_max_queue,
+                loader=_loader("paddle", "pppp.engine.paddle:get_ocr", "pppp.engine.paddle:warmup"),
+            )
+        if engine_enabled("rampp"):
+            pools["rampp"] = ProcessEnginePool(
+                "rampp",
+                workers=settings.rampp_workers,
+                max_queue=settings.rampp_max_queue,
+                loader=_loader("rampp", "pppp.engine.rampp:load_model", "pppp.engine.rampp:warmup"),
+            )
+        return pools
+
+    async def run[**P, T](self, engine: str, fn: Callable[P, T], /, *args: P.args, **kwargs: P.kwargs) -> Submission[T]:
+        return await self.pools[engine].submit(fn, *args, **kwargs)
+
+    async def iterate[**P, T](
+        self,
+        engine: str,
+        fn: Callable[P, Iterator[T]],
+        /,
+        *args: P.args,
+        **kwargs: P.kwargs,
+    ) -> AsyncIterator[T]:
+        async for item in self.pools[engine].iterate(fn, *args, **kwargs):
+            yield item
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        return {
+            name: {
+                "concurrency": pool.concurrency,
+                "max_queue": pool.max_queue,
+                "pending": pool.pending,
+                "running": pool.running,
+            }
+            for name, pool in self.pools.items()
+        }
+
+    def shutdown(self) -> None:
+        for pool in self.pools.values():
+            pool.shutdown()
+
+
+def get_executor() -> InferenceExecutor:
+    """Get the inference executor singleton."""
+
+    global _executor
+    if _executor is not None:
+        return _executor
+
+    with _lock:
+        if _executor is None:
+            _executor = InferenceExecutor()
+        return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown()
+            _executor = None
@@ -1,69 +1,216 @@
 from __future__ import annotations
 
 # built-in
-import difflib
-import os
-import tempfile
+import contextlib
+import contextvars
+import dataclasses
+import math
+import queue
 import time
-from dataclasses import dataclass
-from threading import Lock
-from typing import Any
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from threading import Event, Lock, Thread
+from typing import TYPE_CHECKING, Any
 
 import numpy as np
 
 # external
 from paddleocr import PaddleOCR
+from PIL import Image, ImageDraw
 
 # project
+from pppp import artifacts, tracing
+from pppp.engine.dedup import LineMerger, TextIndex, merge_tiles, shingles
 from pppp.settings import settings
-from pppp.utils.images import is_gif, iter_image_frames
+from pppp.utils.images import DecodedImage, LazyFrames, keyframe_params
 
-_lock = Lock()
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Iterator, Sequence
+    from concurrent.futures import Future
 
+_lock = Lock()
 
 _ocr: PaddleOCR | None = None
+_predictors: PredictorPool | None = None
+_fanout: ThreadPoolExecutor | None = None
+_frame_pool: ThreadPoolExecutor | None = None
 
+# bytes of BGR rows converted at a time
+_BGR_STRIP_BYTES = 256 * 1024
 
-def get_ocr():
-    """Get the OCR engine singleton, downloading on first init."""
+# line crops at least this much taller than wide are read as vertical text, turned like paddle does
+_VERTICAL_RATIO = 1.5
+# boxes whose top edges are within this many pixels count as one line when ordering them
+_SAME_LINE_PX = 10
+# how often a blocked frame producer checks whether its consumer went away
+_PRODUCER_POLL_S = 0.1
+# what paddle's own pipeline drops recognized lines below, for a PaddleOCR that does not say
+_DEFAULT_DROP_SCORE = 0.5
 
-    global _ocr
-    if _ocr is not None:
-        return _ocr
+type FrameRead = tuple[str, float | None, list[dict[str, Any]], str]
 
-    with _lock:
-        if _ocr is not None:
-            return _ocr
 
-        _ocr = PaddleOCR(
+def _new_ocr() -> PaddleOCR:
+    with tracing.span("model_load", engine="paddle"):
+        ocr = PaddleOCR(
             lang=settings.paddle_lang,
             use_gpu=settings.paddle_use_gpu,
             use_angle_cls=settings.paddle_use_angle_cls,
             enable_mkldnn=settings.paddle_enable_mkldnn,
+            **artifacts.paddle_model_dirs(),
         )
+    # paddle downloads missing models while constructing, remember the checksums of anything new
+    artifacts.record(artifacts.paddle_root())
+    return ocr
+
+
+def get_ocr():
+    """Get the OCR engine singleton, downloading on first init."""
+
+    global _ocr
+    if _ocr is not None:
         return _ocr
 
+    with _lock:
+        if _ocr is None:
+            _ocr = _new_ocr()
+        return _ocr
 
-def _suffix_for_content_type(content_type: str | None) -> str:
-    """Get a suitable file suffix for the given content type."""
 
-    if not content_type:
-        return ".img"
+class PredictorPool:
+    """Interchangeable PaddleOCR instances, each used by one thread at a time.
 
-    ct = content_type.split(";", 1)[0].strip().lower()
-    if ct == "image/png":
-        return ".png"
-    if ct in {"image/jpeg", "image/jpg"}:
-        return ".jpg"
-    if ct == "image/gif":
-        return ".gif"
-    if ct == "image/webp":
-        return ".webp"
-    if ct == "image/tiff":
-        return ".tiff"
-    if ct == "image/bmp":
-        return ".bmp"
-    return ".img"
+    The paddle predictors are not thread-safe, but separate instances run in parallel. Instances are
+    created on demand up to ``size``, the first one is the :func:`get_ocr` singleton.
+    """
+
+    def __init__(self, size: int) -> None:
+        self.size = max(1, size)
+        # first in first out, so every instance gets used and stays warm
+        self._idle: queue.Queue[PaddleOCR] = queue.Queue()
+        self._created = 0
+        self._lock = Lock()
+
+    def _grow(self) -> bool:
+        with self._lock:
+            if self._created >= self.size:
+                return False
+            self._created += 1
+            first = self._created == 1
+
+        try:
+            ocr = get_ocr()
+            if not first:
+                # one at a time, after the singleton has fetched any missing model
+                with _lock:
+                    ocr = _new_ocr()
+        except BaseException:
+            with self._lock:
+                self._created -= 1
+            raise
+        self._idle.put(ocr)
+        return True
+
+    def fill(self) -> None:
+        """Create every instance now rather than on the first busy moment."""
+
+        while self._grow():
+            pass
+
+    @contextlib.contextmanager
+    def checkout(self) -> Iterator[PaddleOCR]:
+        """An idle instance for the duration of the block, waiting for one when all are busy."""
+
+        try:
+            ocr = self._idle.get_nowait()
+        except queue.Empty:
+            self._grow()
+            ocr = self._idle.get()
+        try:
+            yield ocr
+        finally:
+            self._idle.put(ocr)
+
+
+def get_predictors() -> PredictorPool:
+    """Get the predictor pool singleton."""
+
+    global _predictors
+    if _predictors is not None:
+        return _predictors
+
+    with _lock:
+        if _predictors is None:
+            _predictors = PredictorPool(settings.paddle_predictors)
+        return _predictors
+
+
+def _parallel_map[T, R](fn: Callable[[T], R], items: Sequence[T]) -> list[R]:
+    """``fn`` over ``items`` in order, as many at once as there are predictors to run them on."""
+
+    global _fanout
+    if settings.paddle_predictors <= 1 or len(items) <= 1:
+        return [fn(item) for item in items]
+
+    if _fanout is None:
+        with _lock:
+            if _fanout is None:
+                _fanout = ThreadPoolExecutor(max_workers=settings.paddle_predictors, thread_name_prefix="pppp-paddle")
+    # each call in its own copy of the context, so its spans land in the request's trace
+    futures = [_fanout.submit(contextvars.copy_context().run, fn, item) for item in items]
+    return [f.result() for f in futures]
+
+
+def warmup() -> None:
+    """Load the model and run a dummy image through detection and recognition.
+
+    Paddle sets up its predictors and allocators on the first call, which would otherwise land on the
+    first request.
+    """
+
+    predictors = get_predictors()
+    predictors.fill()
+    im = Image.new("RGB", (160, 40), "white")
+    ImageDraw.Draw(im).text((8, 12), "warmup 0123", fill="black")
+    # the default bitmap font is tiny, scale it up so detection finds a line for recognition to read
+    im = im.resize((640, 160), Image.Resampling.NEAREST)
+
+    with tracing.span("warmup", engine="paddle"):
+        # checkouts go round the idle instances in turn, this warms each one once
+        for _ in range(predictors.size):
+            with predictors.checkout() as ocr:
+                _read(ocr, im)
+
+
+def decode_min_side() -> int | None:
+    """How small images may be decoded for OCR, ``None`` for full size."""
+
+    return settings.paddle_decode_min_side or None
+
+
+def cache_params() -> dict[str, Any]:
+    """Settings that change OCR output, for keying cached results."""
+
+    return {
+        "decode_min_side": decode_min_side(),
+        "lang": settings.paddle_lang,
+        "use_angle_cls": settings.paddle_use_angle_cls,
+        "min_line_confidence": settings.paddle_min_line_confidence,
+        "keyframes": keyframe_params(),
+        "gif_dedup_threshold": settings.paddle_gif_dedup_threshold,
+        "roi": (settings.paddle_roi_det_max_side, settings.paddle_roi_level_tolerance_deg)
+        if settings.paddle_roi_enabled
+        else None,
+        "tiles": (
+            settings.paddle_tile_min_long_side,
+            settings.paddle_tile_min_aspect,
+            settings.paddle_tile_size,
+            settings.paddle_tile_overlap,
+        )
+        if settings.paddle_tile_enabled
+        else None,
+    }
 
 
 @dataclass(frozen=True)
@@ -72,28 +219,34 @@ class OcrResult:
     confidence: float | None
     lines: list[dict[str, Any]]
     elapsed_ms: int
+    frames_total: int = 1
+    frames_analyzed: int = 1
+    # frames per OCR path taken: "full", for the region path "no_text", "roi" and "roi_cls", or "tiled"
+    paths: dict[str, int] = field(default_factory=dict)
 
 
-def _normalize_text_for_compare(text: str) -> str:
-    return " ".join(text.split()).strip().lower()
+@dataclass(frozen=True)
+class FrameOcr:
+    frame: int
+    text: str
+    confidence: float | None
+    lines: list[dict[str, Any]]
 
 
-def _token_jaccard(a: str, b: str) -> float:
-    a_tokens = {t for t in a.split(" ") if t}
-    b_tokens = {t for t in b.split(" ") if t}
-    if not a_tokens and not b_tokens:
-        return 1.0
-    if not a_tokens or not b_tokens:
-        return 0.0
-    inter = len(a_tokens & b_tokens)
-    union = len(a_tokens | b_tokens)
-    return inter / union if union else 0.0
+def _to_bgr(rgb: Image.Image) -> np.ndarray:
+    """Paddle wants the same BGR ndarray cv2.imread would have produced.
 
+    Pillow packs the channels in BGR order itself, a strip of rows at a time straight into the array.
+    A single ``tobytes`` would join its chunks into a second full-size copy on the way.
+    """
 
-def _text_similarity(a: str, b: str) -> float:
-    if a == b:
-        return 1.0
-    return max(difflib.SequenceMatcher(None, a, b).ratio(), _token_jaccard(a, b))
+    bgr = np.empty((rgb.height, rgb.width, 3), dtype=np.uint8)
+    rows = max(1, _BGR_STRIP_BYTES // (rgb.width * 3))
+    for top in range(0, rgb.height, rows):
+        bottom = min(top + rows, rgb.height)
+        strip = rgb.crop((0, top, rgb.width, bottom)).tobytes("raw", "BGR")
+        bgr[top:bottom] = np.frombuffer(strip, dtype=np.uint8).reshape(bottom - top, rgb.width, 3)
+    return bgr
 
 
 def _parse_paddleocr_raw(
@@ -106,8 +259,6 @@ def _parse_paddleocr_raw(
     items = raw[0] if raw and isinstance(raw[0], list) else raw
 
     lines: list[dict[str, Any]] = []
-    texts: list[str] = []
-    scores: list[float] = []
 
     for item in items or []:
         if not item or len(item) < 2:
@@ -125,93 +276,399 @@ def _parse_paddleocr_raw(
             if line_score < min_line_confidence:
                 continue
 
-        if min_line_confidence is not None and line_score is None:
-            pass
-
-        texts.append(line_text)
-        if line_score is not None:
-            scores.append(line_score)
         lines.append({"text": line_text, "confidence": line_score, "box": box})
 
-    text = "\n".join(t for t in texts if t)
-    confidence = (sum(scores) / len(scores)) if scores else None
+    text, confidence = _join_lines(lines)
     return text, confidence, lines
 
 
-def ocr_bytes(image_bytes: bytes, *, content_type: str | None) -> OcrResult:
-    """Run OCR on the given image bytes."""
+def _join_lines(lines: list[dict[str, Any]]) -> tuple[str, float | None]:
+    """Text of the lines one per line, and their mean confidence."""
 
-    ocr = get_ocr()
-    start = time.perf_counter()
+    scores = [line["confidence"] for line in lines if line["confidence"] is not None]
+    text = "\n".join(line["text"] for line in lines if line["text"])
+    return text, (sum(scores) / len(scores)) if scores else None
 
-    # On gifs we do frame by frame processing to get all text
-    if is_gif(image_bytes, content_type=content_type):
-        texts: list[str] = []
-        confidences: list[float] = []
-        lines_all: list[dict[str, Any]] = []
 
-        last_added_norm = ""
-        saw_any_frame = False
+def _roi_supported(ocr: PaddleOCR) -> bool:
+    return hasattr(ocr, "text_detector") and hasattr(ocr, "text_recognizer")
 
-        for frame_index, rgb in iter_image_frames(image_bytes, content_type=content_type):
-            saw_any_frame = True
 
-            np_bgr = np.asarray(rgb)[:, :, ::-1].copy()
+def _for_detection(rgb: Image.Image) -> tuple[Image.Image, float]:
+    # paddle's detector shrinks its input to 960px on the long side anyway, do it before the BGR copy
+    limit = settings.paddle_roi_det_max_side
+    if max(rgb.size) <= limit:
+        return rgb, 1.0
+    scale = limit / max(rgb.size)
+    size = (max(1, round(rgb.width * scale)), max(1, round(rgb.height * scale)))
+    return rgb.resize(size, Image.Resampling.BILINEAR, reducing_gap=2.0), scale
 
-            raw = ocr.ocr(np_bgr, cls=settings.paddle_use_angle_cls)
-            frame_text, frame_conf, frame_lines = _parse_paddleocr_raw(
-                raw,
-                min_line_confidence=settings.paddle_min_line_confidence,
-            )
 
-            frame_norm = _normalize_text_for_compare(frame_text)
-            if not frame_norm:
-                continue
+def _to_full_resolution(
+    dt_boxes: Iterable[Sequence[Sequence[float]]], scale: float, size: tuple[int, int]
+) -> list[list[list[float]]]:
+    """Boxes detected on a copy downscaled by ``scale``, in the coordinates of the full frame of ``size``."""
 
-            # fuzzy dedup
-            if last_added_norm:
-                sim = _text_similarity(frame_norm, last_added_norm)
-                thresh = 0.97 if min(len(frame_norm), len(last_added_norm)) < 15 else 0.90
-                if sim >= thresh:
-                    continue
+    width, height = size
+    return [[[min(float(x) / scale, width), min(float(y) / scale, height)] for x, y in box] for box in dt_boxes]
 
-            if frame_norm:
-                texts.append(frame_text)
-                last_added_norm = frame_norm
-                if frame_conf is not None:
-                    confidences.append(frame_conf)
-                for line in frame_lines:
-                    lines_all.append({**line, "frame": frame_index})
 
-        elapsed_ms = int((time.perf_counter() - start) * 1000)
-        if not saw_any_frame:
-            return OcrResult(text="", confidence=None, lines=[], elapsed_ms=elapsed_ms)
+def _reading_order[T](items: list[T], *, box: Callable[[T], Sequence[Sequence[float]]]) -> list[T]:
+    """Reading order, top to bottom then left to right, the way paddle orders its own results."""
 
-        text = "\n".join(t for t in texts if t)
-        confidence = (sum(confidences) / len(confidences)) if confidences else None
-        return OcrResult(text=text, confidence=confidence, lines=lines_all, elapsed_ms=elapsed_ms)
+    items = sorted(items, key=lambda it: (box(it)[0][1], box(it)[0][0]))
+    for i in range(len(items) - 1):
+        for j in range(i, -1, -1):
+            a, b = box(items[j])[0], box(items[j + 1])[0]
+            if abs(b[1] - a[1]) < _SAME_LINE_PX and b[0] < a[0]:
+                items[j], items[j + 1] = items[j + 1], items[j]
+            else:
+                break
+    return items
 
-    suffix = _suffix_for_content_type(content_type)
 
-    tmp_path = None
-    try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as f:
-            tmp_path = f.name
-            f.write(image_bytes)
+def _is_level(box: list[list[float]]) -> bool:
+    (x0, y0), (x1, y1) = box[0], box[1]
+    return abs(math.degrees(math.atan2(y1 - y0, x1 - x0))) <= settings.paddle_roi_level_tolerance_deg
+
+
+def _crop_line(rgb: Image.Image, box: list[list[float]]) -> Image.Image:
+    """Cut one detected line out of the full resolution frame, straightened if the box is tilted."""
+
+    xs, ys = [p[0] for p in box], [p[1] for p in box]
+    if _is_level(box):
+        crop = rgb.crop((math.floor(min(xs)), math.floor(min(ys)), math.ceil(max(xs)), math.ceil(max(ys))))
+    else:
+        tl, tr, br, bl = box
+        width = max(1, round(max(math.dist(tl, tr), math.dist(bl, br))))
+        height = max(1, round(max(math.dist(tl, bl), math.dist(tr, br))))
+        # QUAD takes the source corners as upper left, lower left, lower right, upper right
+        quad = (*tl, *bl, *br, *tr)
+        crop = rgb.transform((width, height), Image.Transform.QUAD, quad, Image.Resampling.BICUBIC)
+
+    if crop.height >= crop.width * _VERTICAL_RATIO:
+        crop = crop.transpose(Image.Transpose.ROTATE_90)
+    return crop
+
 
-        raw = ocr.ocr(tmp_path, cls=settings.paddle_use_angle_cls)
+def _ocr_roi(ocr: PaddleOCR, rgb: Image.Image) -> FrameRead:
+    """Detect on a downscaled frame, then recognize only the detected lines, cropped at full resolution."""
 
+    with tracing.span("preprocess", engine="paddle"):
+        small, scale = _for_detection(rgb)
+        small_bgr = _to_bgr(small)
+
+    with tracing.span("detect", engine="paddle"):
+        dt_boxes, _elapse = ocr.text_detector(small_bgr)
+
+    if dt_boxes is None or len(dt_boxes) == 0:
+        return "", None, [], "no_text"
+
+    with tracing.span("preprocess", engine="paddle"):
+        boxes = _reading_order(_to_full_resolution(dt_boxes, scale, rgb.size), box=lambda b: b)
+        crops = [_to_bgr(_crop_line(rgb, box)) for box in boxes]
+        # the classifier only exists to turn lines around; level boxes are read as they are
+        classify = settings.paddle_use_angle_cls and not all(_is_level(box) for box in boxes)
+
+    with tracing.span("forward", engine="paddle"):
+        if classify:
+            crops, _angles, _elapse = ocr.text_classifier(crops)
+        rec_res, _elapse = ocr.text_recognizer(crops)
+
+    with tracing.span("postprocess", engine="paddle"):
+        # shaped like ocr.ocr() output for one image, without the lines ocr.ocr() drops below drop_score
+        drop_score = getattr(ocr, "drop_score", _DEFAULT_DROP_SCORE)
+        raw = [[[box, (text, score)] for box, (text, score) in zip(boxes, rec_res, strict=True) if score >= drop_score]]
+        text, confidence, lines = _parse_paddleocr_raw(raw, min_line_confidence=settings.paddle_min_line_confidence)
+    return text, confidence, lines, "roi_cls" if classify else "roi"
+
+
+def _read(ocr: PaddleOCR, rgb: Image.Image) -> FrameRead:
+    """OCR one image in a single pass, returning its text, confidence, lines and which path read it."""
+
+    if settings.paddle_roi_enabled and _roi_supported(ocr):
+        return _ocr_roi(ocr, rgb)
+
+    with tracing.span("preprocess", engine="paddle"):
+        bgr = _to_bgr(rgb)
+
+    with tracing.span("forward", engine="paddle"):
+        raw = ocr.ocr(bgr, cls=settings.paddle_use_angle_cls)
+
+    with tracing.span("postprocess", engine="paddle"):
         text, confidence, lines = _parse_paddleocr_raw(
             raw,
             min_line_confidence=settings.paddle_min_line_confidence,
         )
-        elapsed_ms = int((time.perf_counter() - start) * 1000)
+    return text, confidence, lines, "full"
+
+
+def _needs_tiles(rgb: Image.Image) -> bool:
+    long_side, short_side = max(rgb.size), min(rgb.size)
+    return (
+        settings.paddle_tile_enabled
+        and long_side > settings.paddle_tile_size
+        and (long_side > settings.paddle_tile_min_long_side or long_side > short_side * settings.paddle_tile_min_aspect)
+    )
+
+
+def _tile_starts(length: int, size: int, overlap: int) -> list[int]:
+    """Offsets of tiles of ``size`` covering ``length``, evenly spread and overlapping at least ``overlap``."""
+
+    if length <= size:
+        return [0]
+    count = math.ceil((length - overlap) / (size - overlap))
+    step = (length - size) / (count - 1)
+    return [round(i * step) for i in range(count)]
 
-        return OcrResult(text=text, confidence=confidence, lines=lines, elapsed_ms=elapsed_ms)
 
+def _tile_rects(width: int, height: int) -> list[tuple[int, int, int, int]]:
+    size, overlap = settings.paddle_tile_size, settings.paddle_tile_overlap
+    return [
+        (left, top, min(left + size, width), min(top + size, height))
+        for top in _tile_starts(height, size, overlap)
+        for left in _tile_starts(width, size, overlap)
+    ]
+
+
+def _ocr_tiled(rgb: Image.Image) -> FrameRead:
+    """OCR overlapping tiles at full resolution, on as many predictors at once as there are.
+
+    Whole, detection would shrink the image until small text is unreadable. Boxes come back in the
+    frame's coordinates, a line read in two tiles once.
+    """
+
+    rects = _tile_rects(rgb.width, rgb.height)
+
+    def _read_tile(rect: tuple[int, int, int, int]) -> list[dict[str, Any]]:
+        left, top, _right, _bottom = rect
+        with get_predictors().checkout() as ocr:
+            _text, _confidence, lines, _path = _read(ocr, rgb.crop(rect))
+        return [{**line, "box": [[float(x) + left, float(y) + top] for x, y in line["box"]]} for line in lines]
+
+    with tracing.span("tiles", engine="paddle", tiles=len(rects)):
+        tile_lines = _parallel_map(_read_tile, rects)
+
+    with tracing.span("postprocess", engine="paddle"):
+        merged = merge_tiles([(tuple(map(float, rect)), lines) for rect, lines in zip(rects, tile_lines, strict=True)])
+        lines = _reading_order(merged, box=lambda line: line["box"])
+        text, confidence = _join_lines(lines)
+    return text, confidence, lines, "tiled"
+
+
+def _ocr_frame(rgb: Image.Image) -> FrameRead:
+    """OCR one frame, tiled when it is too large or too long to read in one pass."""
+
+    if _needs_tiles(rgb):
+        return _ocr_tiled(rgb)
+    with get_predictors().checkout() as ocr:
+        return _read(ocr, rgb)
+
+
+def _run_ahead[T](items: Iterable[T], *, depth: int) -> Iterator[T]:
+    """Iterate ``items`` on a producer thread, at most ``depth`` items ahead of the consumer.
+
+    Lazily decoded frames then decode while earlier ones are read. Errors come out where the item would
+    have; closing the iterator stops the producer.
+    """
+
+    buffer: queue.Queue[tuple[str, Any]] = queue.Queue(maxsize=max(1, depth))
+    stop = Event()
+
+    def _put(entry: tuple[str, Any]) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(entry, timeout=_PRODUCER_POLL_S)
+            except queue.Full:
+                continue
+            return True
+        return False
+
+    def _produce() -> None:
+        try:
+            for item in items:
+                if not _put(("item", item)):
+                    return
+        except Exception as e:
+            # handed to the consumer, which raises it
+            _put(("error", e))
+            return
+        _put(("done", None))
+
+    producer = Thread(target=contextvars.copy_context().run, args=(_produce,), name="pppp-paddle-frames", daemon=True)
+    producer.start()
+    try:
+        while True:
+            kind, value = buffer.get()
+            if kind == "done":
+                return
+            if kind == "error":
+                raise value
+            yield value
     finally:
-        if tmp_path:
+        stop.set()
+        producer.join()
+
+
+def _get_frame_pool() -> ThreadPoolExecutor:
+    global _frame_pool
+    if _frame_pool is not None:
+        return _frame_pool
+
+    with _lock:
+        if _frame_pool is None:
+            _frame_pool = ThreadPoolExecutor(
+                max_workers=settings.paddle_gif_parallelism,
+                thread_name_prefix="pppp-paddle-frame",
+            )
+        return _frame_pool
+
+
+def _read_frames(frames: Iterable[tuple[int, Image.Image]]) -> Iterator[tuple[int, FrameRead]]:
+    """OCR frames, yielding their reads in frame order.
+
+    With ``paddle_gif_parallelism`` above one, a producer thread decodes ahead and that many frames are
+    read at once, each on its own predictor; the next few are queued so no worker waits on the one whose
+    result is due.
+    """
+
+    workers = settings.paddle_gif_parallelism
+    if workers <= 1:
+        for frame_index, rgb in frames:
+            yield frame_index, _ocr_frame(rgb)
+        return
+
+    pool = _get_frame_pool()
+    source = _run_ahead(frames, depth=workers)
+    inflight: deque[tuple[int, Future[FrameRead]]] = deque()
+    decode_error: Exception | None = None
+    try:
+        while True:
             try:
-                os.unlink(tmp_path)
-            except OSError:
-                pass
+                frame_index, rgb = next(source)
+            except StopIteration:
+                break
+            except Exception as e:
+                # raised after the reads of the frames before it, where the serial loop would raise it
+                decode_error = e
+                break
+            inflight.append((frame_index, pool.submit(contextvars.copy_context().run, _ocr_frame, rgb)))
+            if len(inflight) >= 2 * workers:
+                done_index, future = inflight.popleft()
+                yield done_index, future.result()
+        while inflight:
+            done_index, future = inflight.popleft()
+            yield done_index, future.result()
+        if decode_error is not None:
+            raise decode_error
+    finally:
+        source.close()
+        for _frame_index, future in inflight:
+            future.cancel()
+
+
+def iter_ocr_frames(
+    frames: Iterable[tuple[int, Image.Image]],
+    *,
+    paths: Counter[str] | None = None,
+) -> Iterator[FrameOcr]:
+    """OCR animation frames, yielding each one in order as soon as it and every frame before it are read.
+
+    Frames without text, or whose text is a near repeat of any frame yielded before, are dropped; frames
+    read in parallel are deduplicated in frame order all the same, so the output does not depend on
+    ``paddle_gif_parallelism``. Every frame read, dropped or not, is counted in ``paths`` by the OCR path
+    it took.
+    """
+
+    seen = TextIndex(threshold=settings.paddle_gif_dedup_threshold)
+
+    for frame_index, (frame_text, frame_conf, frame_lines, path) in _read_frames(frames):
+        if paths is not None:
+            paths[path] += 1
+
+        grams = shingles(frame_text)
+        if not grams or seen.seen(grams):
+            continue
+
+        seen.add(grams)
+        yield FrameOcr(frame=frame_index, text=frame_text, confidence=frame_conf, lines=frame_lines)
+
+
+def _combine_frames(
+    frames: list[FrameOcr],
+    *,
+    start: float,
+    frames_total: int,
+    frames_analyzed: int,
+    paths: Counter[str],
+) -> OcrResult:
+    confidences = [f.confidence for f in frames if f.confidence is not None]
+    # a caption that stays put while the rest changes is one line read in several frames
+    merger = LineMerger(threshold=settings.paddle_gif_dedup_threshold)
+    for f in frames:
+        merger.add(f.frame, f.lines)
+    return OcrResult(
+        text="\n".join(f.text for f in frames if f.text),
+        confidence=(sum(confidences) / len(confidences)) if confidences else None,
+        lines=merger.lines(),
+        elapsed_ms=int((time.perf_counter() - start) * 1000),
+        frames_total=frames_total,
+        frames_analyzed=frames_analyzed,
+        paths=dict(paths),
+    )
+
+
+def ocr_image(image: DecodedImage) -> OcrResult:
+    """Run OCR on already decoded frames."""
+
+    start = time.perf_counter()
+
+    # On gifs we do frame by frame processing to get all text
+    if image.animated:
+        paths: Counter[str] = Counter()
+        return _combine_frames(
+            list(iter_ocr_frames(image.frames, paths=paths)),
+            start=start,
+            frames_total=image.frames_total,
+            frames_analyzed=len(image.frames),
+            paths=paths,
+        )
+
+    _frame_index, rgb = image.frames[0]
+    text, confidence, lines, path = _ocr_frame(rgb)
+    elapsed_ms = int((time.perf_counter() - start) * 1000)
+
+    return OcrResult(text=text, confidence=confidence, lines=lines, elapsed_ms=elapsed_ms, paths={path: 1})
+
+
+def stream_ocr(image_bytes: bytes, *, content_type: str | None) -> Iterator[FrameOcr | OcrResult]:
+    """Run OCR frame by frame, yielding every frame kept by the dedup and then the combined result.
+
+    Frames are decoded only as they are read, so a long gif never holds more than one at full size.
+    """
+
+    start = time.perf_counter()
+    frames = LazyFrames(image_bytes, content_type=content_type, min_side=decode_min_side())
+
+    if not frames.animated:
+        # a still is a single frame, the result is all there is to stream
+        yield ocr_image(DecodedImage(frames=list(frames), frames_total=1, animated=False))
+        return
+
+    kept: list[FrameOcr] = []
+    paths: Counter[str] = Counter()
+    for frame in iter_ocr_frames(frames, paths=paths):
+        kept.append(frame)
+        yield frame
+
+    yield _combine_frames(kept, start=start, frames_total=frames.total, frames_analyzed=frames.decoded, paths=paths)
+
+
+def ocr_bytes(image_bytes: bytes, *, content_type: str | None) -> OcrResult:
+    """Run OCR on the given image bytes."""
+
+    start = time.perf_counter()
+    # stills are decoded in memory too, no temp file for paddle to re-read. animations go frame by frame
+    # as in stream_ocr, so decoding overlaps with reading when frames are read in parallel
+    *_kept, result = stream_ocr(image_bytes, content_type=content_type)
+    return dataclasses.replace(result, elapsed_ms=int((time.perf_counter() - start) * 1000))
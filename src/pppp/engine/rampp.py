@@ -1,10 +1,12 @@
 from __future__ import annotations
 
+import dataclasses
 import time
 
 # built-in
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from threading import Lock
+from typing import TYPE_CHECKING, Any
 
 # external
 import transformers.modeling_utils as _mu
@@ -19,18 +21,35 @@ for name in (
     if not hasattr(_mu, name) and hasattr(_pu, name):
         setattr(_mu, name, getattr(_pu, name))
 
+import numpy as np
 import torch
+from PIL import Image
 from ram import get_transform
-from ram import inference_ram as inference
 from ram.models import ram_plus
 
 # project
+from pppp import artifacts, tracing
+from pppp.engine import backends
+from pppp.engine.batching import MicroBatcher
 from pppp.settings import settings
-from pppp.utils.images import iter_image_frames
+from pppp.utils.images import LazyFrames, decode_image, keyframe_params
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+    from pppp.utils.images import DecodedImage
 
 _lock = Lock()
 _model = None
 _transform = None
+# dtype the forward pass runs under autocast with, set by the inference backend
+_autocast: torch.dtype | None = None
+# each tag's own decision threshold, as tuned for the checkpoint
+_class_thresholds: np.ndarray | None = None
+_batcher: MicroBatcher[torch.Tensor, FrameOutput] | None = None
+
+# (unit-norm image embedding, probability of every tag) for one image
+type FrameOutput = tuple[np.ndarray, np.ndarray]
 
 
 @dataclass(frozen=True)
@@ -38,12 +57,47 @@ class TagsResult:
     tags: list[str]
     engine: str
     elapsed_ms: int
+    frames_total: int = 1
+    frames_analyzed: int = 1
+    # score of each tag, in the same order
+    scores: list[float] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class FrameTags:
+    frame: int
+    tags: list[str]
+    scores: list[float] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class FrameFeatures:
+    frame: int
+    embedding: list[float]
+    # [tag, score, the tag's own threshold] for every tag scoring at least rampp_score_floor, best first
+    candidates: list[tuple[str, float, float]]
+
+
+@dataclass(frozen=True)
+class ImageFeatures:
+    """Everything one forward pass yields per analyzed frame; tags for any top_k or threshold come from it.
+
+    Flat lists, one entry per frame, so it round-trips through the JSON result cache as is.
+    """
+
+    frames: list[int]
+    embeddings: list[list[float]]
+    candidates: list[list[tuple[str, float, float]]]
+    engine: str
+    elapsed_ms: int
+    frames_total: int = 1
+    frames_analyzed: int = 1
 
 
 def _get_model_and_transform():
     """Singleton for fucked up ram library because it has version conflicts."""
 
-    global _model, _transform
+    global _model, _transform, _autocast, _class_thresholds
 
     if _model is not None and _transform is not None:
         return _model, _transform
@@ -58,47 +112,302 @@ def _get_model_and_transform():
         else:
             device = torch.device("cpu")
 
-        _transform = get_transform(image_size=settings.rampp_image_size)
+        if settings.rampp_num_threads > 0:
+            torch.set_num_threads(settings.rampp_num_threads)
+
+        with tracing.span("model_load", engine="rampp"):
+            _transform = get_transform(image_size=settings.rampp_image_size)
+
+            model = ram_plus(
+                pretrained=artifacts.rampp_checkpoint(),
+                image_size=settings.rampp_image_size,
+                vit=settings.rampp_vit,
+            )
+            model.eval()
+            model = model.to(device)
 
-        model = ram_plus(
-            pretrained=settings.rampp_checkpoint,
-            image_size=settings.rampp_image_size,
-            vit=settings.rampp_vit,
-        )
-        model.eval()
-        model = model.to(device)
+            example = torch.zeros(1, 3, settings.rampp_image_size, settings.rampp_image_size)
+            model, _autocast = backends.optimize(
+                model,
+                backend=settings.rampp_backend,
+                device=device,
+                example=example,
+            )
+            _class_thresholds = model.class_threshold.float().cpu().numpy()
 
         _model = model
         return _model, _transform
 
 
+def load_model() -> None:
+    """Load the model and transform ahead of the first request."""
+
+    _get_model_and_transform()
+
+
+def warmup() -> None:
+    """Load the model and run one dummy forward pass at the configured image size.
+
+    The first forward pass initializes kernels and allocators, and would otherwise land on the first request.
+    """
+
+    _model, transform = _get_model_and_transform()
+    dummy = Image.new("RGB", (settings.rampp_image_size, settings.rampp_image_size))
+
+    with tracing.span("warmup", engine="rampp"):
+        _run_batch([transform(dummy)])
+
+
+def decode_min_side() -> int | None:
+    """How small images may be decoded for tagging, ``None`` for full size.
+
+    The transform resizes every frame to ``rampp_image_size`` square, anything decoded beyond that is thrown away.
+    """
+
+    return settings.rampp_image_size if settings.rampp_decode_reduce else None
+
+
+def cache_params() -> dict[str, Any]:
+    """Settings that change the features, for keying cached results; top_k and threshold only filter them."""
+
+    return {
+        "checkpoint": settings.rampp_checkpoint,
+        "image_size": settings.rampp_image_size,
+        "vit": settings.rampp_vit,
+        "decode_min_side": decode_min_side(),
+        # quantized and bf16 weights can tip a tag over or under its threshold
+        "backend": settings.rampp_backend,
+        "keyframes": keyframe_params(),
+        "score_floor": settings.rampp_score_floor,
+    }
+
+
+def _forward(model: torch.nn.Module, batch: torch.Tensor) -> tuple[torch.Tensor, torch.Tensor]:
+    """RAM++'s ``generate_tag`` up to the tag probabilities, keeping the image embedding it computes on the way.
+
+    The library method only returns the thresholded tag string. Same math, with its per-image loop over
+    the description weights done as one einsum.
+    """
+
+    image_embeds = model.image_proj(model.visual_encoder(batch))
+    image_atts = torch.ones(image_embeds.size()[:-1], dtype=torch.long, device=batch.device)
+    cls = image_embeds[:, 0, :]
+    cls = cls / cls.norm(dim=-1, keepdim=True)
+
+    des_per_class = model.label_embed.shape[0] // model.num_class
+    logits_per_image = model.reweight_scale.exp() * cls @ model.label_embed.t()
+    weights = torch.softmax(logits_per_image.view(batch.shape[0], model.num_class, des_per_class), dim=2)
+    descriptions = model.label_embed.view(model.num_class, des_per_class, -1)
+    label_embed = torch.relu(model.wordvec_proj(torch.einsum("bcd,cde->bce", weights, descriptions.to(weights.dtype))))
+
+    tagging_embed = model.tagging_head(
+        encoder_embeds=label_embed,
+        encoder_hidden_states=image_embeds,
+        encoder_attention_mask=image_atts,
+        return_dict=False,
+        mode="tagging",
+    )
+    probs = torch.sigmoid(model.fc(tagging_embed[0]).squeeze(-1))
+    probs[:, model.delete_tag_index] = 0
+    return cls, probs
+
+
+def _run_batch(images: list[torch.Tensor]) -> list[FrameOutput]:
+    """Embed and score a batch of preprocessed images in one forward pass."""
+
+    model, _transform = _get_model_and_transform()
+    device = next(model.parameters()).device
+
+    batch = torch.stack(images).to(device)
+    with backends.inference(device, _autocast):
+        embeddings, probs = _forward(model, batch)
+    return list(zip(embeddings.float().cpu().numpy(), probs.float().cpu().numpy(), strict=True))
+
+
+def get_batcher() -> MicroBatcher[torch.Tensor, FrameOutput]:
+    """Get the RAM++ micro-batcher singleton."""
+
+    global _batcher
+    if _batcher is not None:
+        return _batcher
+
+    with _lock:
+        if _batcher is None:
+            _batcher = MicroBatcher(
+                "rampp",
+                _run_batch,
+                max_batch_size=backends.max_batch_size(settings.rampp_backend, settings.rampp_max_batch_size),
+                max_wait_ms=settings.rampp_max_batch_wait_ms,
+            )
+        return _batcher
+
+
+def batching_stats() -> dict[str, Any] | None:
+    """Achieved batch sizes so far, or None before the first tag request."""
+
+    return _batcher.stats() if _batcher is not None else None
+
+
+def _candidates(probs: np.ndarray) -> list[tuple[str, float, float]]:
+    model, _transform = _get_model_and_transform()
+    above = np.flatnonzero(probs >= settings.rampp_score_floor)
+    ranked = above[np.argsort(-probs[above], kind="stable")]
+    return [
+        (str(model.tag_list[i]).strip(), round(float(probs[i]), 4), round(float(_class_thresholds[i]), 4))
+        for i in ranked
+    ]
+
+
+def _embed_chunk(
+    batcher: MicroBatcher[torch.Tensor, FrameOutput],
+    chunk: list[tuple[int, torch.Tensor]],
+) -> Iterator[FrameFeatures]:
+    # includes the wait for the batcher to fill up, it is what the request actually spends
+    with tracing.span("forward", engine="rampp", frames=len(chunk)):
+        outputs = batcher.submit([tensor for _frame_index, tensor in chunk])
+
+    with tracing.span("postprocess", engine="rampp"):
+        frames = [
+            FrameFeatures(
+                frame=frame_index,
+                embedding=[round(x, 6) for x in embedding.tolist()],
+                candidates=_candidates(probs),
+            )
+            for (frame_index, _tensor), (embedding, probs) in zip(chunk, outputs, strict=True)
+        ]
+    yield from frames
+
+
+def iter_frame_features(frames: Iterable[tuple[int, Image.Image]]) -> Iterator[FrameFeatures]:
+    """Embed and score frames in order, yielding each one as soon as its batch comes back."""
+
+    _model, transform = _get_model_and_transform()
+    batcher = get_batcher()
+
+    # normalize on each, frames then ride along with whatever other requests are in flight.
+    # frames go out a batch at a time so long gifs don't hold every tensor at once
+    pending: list[tuple[int, torch.Tensor]] = []
+    for frame_index, rgb in frames:
+        with tracing.span("preprocess", engine="rampp"):
+            pending.append((frame_index, transform(rgb)))
+        if len(pending) >= batcher.max_batch_size:
+            yield from _embed_chunk(batcher, pending)
+            pending = []
+    if pending:
+        yield from _embed_chunk(batcher, pending)
+
+
+def _combine_frames(
+    frames: list[FrameFeatures],
+    *,
+    start: float,
+    frames_total: int,
+    frames_analyzed: int,
+) -> ImageFeatures:
+    return ImageFeatures(
+        frames=[f.frame for f in frames],
+        embeddings=[f.embedding for f in frames],
+        candidates=[f.candidates for f in frames],
+        engine="ram++",
+        elapsed_ms=int((time.perf_counter() - start) * 1000),
+        frames_total=frames_total,
+        frames_analyzed=frames_analyzed,
+    )
+
+
+def _passing(candidates: list[tuple[str, float, float]], threshold: float | None) -> list[tuple[str, float]]:
+    # a threshold given with the request replaces every tag's own one; like RAM++ itself, a tag scoring
+    # exactly its threshold is left out
+    return [(tag, score) for tag, score, own in candidates if score > (own if threshold is None else threshold)]
+
+
+def frame_tags(frame: FrameFeatures, *, threshold: float | None = None) -> FrameTags:
+    passing = _passing(frame.candidates, threshold)
+    return FrameTags(frame=frame.frame, tags=[t for t, _s in passing], scores=[s for _t, s in passing])
+
+
+def tags_from_features(features: ImageFeatures, *, top_k: int = 50, threshold: float | None = None) -> TagsResult:
+    """Tags of every frame ranked by score, a tag seen in several frames counting with its best one.
+
+    Needs no model, so cached features are re-tagged with another ``top_k`` or ``threshold`` for free.
+    """
+
+    best: dict[str, float] = {}
+    for candidates in features.candidates:
+        for tag, score in _passing(candidates, threshold):
+            best[tag] = max(score, best.get(tag, 0.0))
+
+    ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)
+    if top_k > 0:
+        ranked = ranked[:top_k]
+
+    return TagsResult(
+        tags=[t for t, _s in ranked],
+        engine=features.engine,
+        elapsed_ms=features.elapsed_ms,
+        frames_total=features.frames_total,
+        frames_analyzed=features.frames_analyzed,
+        scores=[s for _t, s in ranked],
+    )
+
+
+def image_embedding(features: ImageFeatures) -> list[float]:
+    """One unit-norm embedding for the image, the mean over its analyzed frames."""
+
+    if not features.embeddings:
+        return []
+    mean = np.mean(np.asarray(features.embeddings, dtype=np.float32), axis=0)
+    norm = float(np.linalg.norm(mean))
+    return [round(x, 6) for x in (mean / norm if norm > 0 else mean).tolist()]
+
+
+def image_features(image: DecodedImage) -> ImageFeatures:
+    """Embed and score already decoded frames with RAM++."""
+
+    start = time.perf_counter()
+    return _combine_frames(
+        list(iter_frame_features(image.frames)),
+        start=start,
+        frames_total=image.frames_total,
+        frames_analyzed=len(image.frames),
+    )
+
+
+def tag_image(image: DecodedImage, *, top_k: int = 50, threshold: float | None = None) -> TagsResult:
+    """Generate tags using RAM++ for already decoded frames."""
+
+    return tags_from_features(image_features(image), top_k=top_k, threshold=threshold)
+
+
+def stream_features(image_bytes: bytes, *, content_type: str | None) -> Iterator[FrameFeatures | ImageFeatures]:
+    """Embed and score frame by frame, yielding each frame of an animation and then the combined features.
+
+    Frames are decoded only as they are read, so a long gif never holds more than a batch of them.
+    """
+
+    start = time.perf_counter()
+    frames = LazyFrames(image_bytes, content_type=content_type, min_side=decode_min_side())
+
+    analyzed: list[FrameFeatures] = []
+    for frame in iter_frame_features(frames):
+        analyzed.append(frame)
+        # a still is a single frame, the result is all there is to stream
+        if frames.animated:
+            yield frame
+
+    yield _combine_frames(analyzed, start=start, frames_total=frames.total, frames_analyzed=frames.decoded)
+
+
 def tag_bytes(
     image_bytes: bytes,
     *,
     content_type: str | None,
     top_k: int = 50,
+    threshold: float | None = None,
 ) -> TagsResult:
     """Generate tags using RAM++."""
 
     start = time.perf_counter()
-
-    model, transform = _get_model_and_transform()
-    device = next(model.parameters()).device
-
-    tags_set: dict[str, None] = {}
-
-    for _frame_index, rgb in iter_image_frames(image_bytes, content_type=content_type):
-        # normalize on each
-        image = transform(rgb).unsqueeze(0).to(device)
-        tags_str, _tags_zh = inference(image, model)
-        for t in (tags_str or "").split("|"):
-            t = t.strip()
-            if t:
-                tags_set[t] = None
-
-    tags = list(tags_set.keys())
-    if top_k > 0:
-        tags = tags[:top_k]
-
-    elapsed_ms = int((time.perf_counter() - start) * 1000)
-    return TagsResult(tags=tags, engine="ram++", elapsed_ms=elapsed_ms)
+    image = decode_image(image_bytes, content_type=content_type, min_side=decode_min_side())
+    result = tag_image(image, top_k=top_k, threshold=threshold)
+    return dataclasses.replace(result, elapsed_ms=int((time.perf_counter() - start) * 1000))
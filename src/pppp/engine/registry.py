@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+# built-in
+import importlib
+import sys
+from typing import TYPE_CHECKING, Literal
+
+# project
+from pppp.settings import settings
+
+if TYPE_CHECKING:
+    from types import ModuleType
+
+type EngineName = Literal["paddle", "rampp"]
+
+# engine modules pull in their model libraries (paddle, torch, transformers) when imported, so nothing
+# imports them at module level; they load on first use, and never when disabled
+ENGINE_MODULES: dict[EngineName, str] = {
+    "paddle": "pppp.engine.paddle",
+    "rampp": "pppp.engine.rampp",
+}
+
+
+class EngineDisabledError(Exception):
+    """The engine is not in ``engines_enabled`` on this server."""
+
+    def __init__(self, engine: str) -> None:
+        super().__init__(f"the {engine} engine is disabled on this server")
+        self.engine = engine
+
+
+def engine_enabled(engine: str) -> bool:
+    return engine in settings.engines_enabled
+
+
+def load_engine(engine: EngineName) -> ModuleType:
+    """Import an engine module, on first use; raises :class:`EngineDisabledError` for disabled engines."""
+
+    if not engine_enabled(engine):
+        raise EngineDisabledError(engine)
+    return importlib.import_module(ENGINE_MODULES[engine])
+
+
+def loaded_engine(engine: EngineName) -> ModuleType | None:
+    """The engine module if something already imported it, without importing it.
+
+    A module still being imported (e.g. by the warmup thread) is in ``sys.modules`` before its
+    functions are defined, so it only counts once the import finished.
+    """
+
+    module = sys.modules.get(ENGINE_MODULES[engine])
+    if module is None or getattr(module.__spec__, "_initializing", False):
+        return None
+    return module
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+# built-in
+import logging
+from dataclasses import dataclass
+from multiprocessing.shared_memory import SharedMemory
+
+# external
+from PIL import Image
+
+# project
+from pppp.utils.images import DecodedImage
+
+logger = logging.getLogger(__name__)
+
+# bytes copied into the block at a time, so packing never holds a second full-size copy of a frame
+_STRIP_BYTES = 256 * 1024
+
+
+@dataclass(frozen=True)
+class SharedFrames:
+    """A :class:`DecodedImage` whose RGB pixels sit in one shared memory block.
+
+    Only this handle is pickled to a worker process; the pixels are written once by the front end and
+    read straight out of the block by the worker, instead of going through pickle and a pipe.
+    """
+
+    name: str
+    # (frame_index, width, height, offset into the block)
+    layout: list[tuple[int, int, int, int]]
+    frames_total: int
+    animated: bool
+
+    @classmethod
+    def pack(cls, image: DecodedImage) -> tuple[SharedFrames, SharedMemory]:
+        """Copy the frames into a new block; the caller owns it and must :func:`release` it."""
+
+        sizes = [rgb.width * rgb.height * 3 for _frame_index, rgb in image.frames]
+        shm = SharedMemory(create=True, size=max(1, sum(sizes)))
+
+        layout: list[tuple[int, int, int, int]] = []
+        offset = 0
+        try:
+            for (frame_index, rgb), size in zip(image.frames, sizes, strict=True):
+                _write_strips(shm, rgb, offset)
+                layout.append((frame_index, rgb.width, rgb.height, offset))
+                offset += size
+        except BaseException:
+            release(shm)
+            raise
+
+        return cls(name=shm.name, layout=layout, frames_total=image.frames_total, animated=image.animated), shm
+
+    def load(self) -> DecodedImage:
+        """Rebuild the frames in the worker and detach from the block."""
+
+        shm = SharedMemory(name=self.name)
+        try:
+            frames = []
+            for frame_index, width, height, offset in self.layout:
+                with shm.buf[offset : offset + width * height * 3] as view:
+                    frames.append((frame_index, Image.frombytes("RGB", (width, height), view)))
+        finally:
+            shm.close()
+
+        return DecodedImage(frames=frames, frames_total=self.frames_total, animated=self.animated)
+
+
+def _write_strips(shm: SharedMemory, rgb: Image.Image, offset: int) -> None:
+    row = rgb.width * 3
+    rows = max(1, _STRIP_BYTES // row)
+    for top in range(0, rgb.height, rows):
+        strip = rgb.crop((0, top, rgb.width, min(top + rows, rgb.height))).tobytes()
+        shm.buf[offset + top * row : offset + top * row + len(strip)] = strip
+
+
+def release(shm: SharedMemory) -> None:
+    """Close and remove a block made by :meth:`SharedFrames.pack`."""
+
+    shm.close()
+    try:
+        shm.unlink()
+    except FileNotFoundError:
+        logger.warning("shared memory block %s was already removed", shm.name)
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+# built-in
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from threading import Lock
+from typing import TYPE_CHECKING, Literal
+
+# project
+from pppp import metrics
+from pppp.engine.executor import ProcessEnginePool
+from pppp.engine.registry import ENGINE_MODULES, engine_enabled, load_engine
+from pppp.settings import settings
+
+if TYPE_CHECKING:
+    from pppp.engine.executor import InferenceExecutor
+
+logger = logging.getLogger(__name__)
+
+# "lazy" engines are not warmed at startup and load on their first request, they never hold back readiness
+type EngineStatus = Literal["lazy", "loading", "ready", "failed"]
+
+_lock = Lock()
+_readiness: Readiness | None = None
+
+
+@dataclass(frozen=True)
+class EngineState:
+    status: EngineStatus
+    load_s: float | None = None
+    error: str | None = None
+
+
+class Readiness:
+    """Load state of each engine, for the /ready probe."""
+
+    def __init__(self, states: dict[str, EngineState]) -> None:
+        self._lock = Lock()
+        self._states = dict(states)
+
+    def set(self, engine: str, state: EngineState) -> None:
+        with self._lock:
+            self._states[engine] = state
+        metrics.ENGINE_READY.set(int(state.status == "ready"), engine=engine)
+
+    @property
+    def ready(self) -> bool:
+        with self._lock:
+            return all(s.status in {"lazy", "ready"} for s in self._states.values())
+
+    def snapshot(self) -> dict[str, EngineState]:
+        with self._lock:
+            return dict(self._states)
+
+
+def get_readiness() -> Readiness:
+    """Get the readiness singleton."""
+
+    global _readiness
+    if _readiness is not None:
+        return _readiness
+
+    with _lock:
+        if _readiness is None:
+            # engines to be warmed start out loading, so the pod is not ready before the warmup task runs
+            _readiness = Readiness(
+                {
+                    e: EngineState("loading" if warmup_enabled(e) else "lazy")
+                    for e in ENGINE_MODULES
+                    if engine_enabled(e)
+                }
+            )
+        return _readiness
+
+
+def warmup_enabled(engine: str) -> bool:
+    return settings.warmup_on_start and engine in settings.warmup_engines and engine_enabled(engine)
+
+
+async def _warm(executor: InferenceExecutor, engine: str, readiness: Readiness) -> None:
+    readiness.set(engine, EngineState("loading"))
+    start = time.perf_counter()
+    try:
+        pool = executor.pools[engine]
+        if isinstance(pool, ProcessEnginePool):
+            # the front end never loads a model in process mode, each worker warms itself as it starts
+            await pool.start()
+        else:
+            # the engine module is imported here too, off the event loop
+            await asyncio.to_thread(lambda: load_engine(engine).warmup())
+    except Exception as e:
+        logger.exception("warming up %s failed, it will load on its first request instead", engine)
+        readiness.set(engine, EngineState("failed", error=f"{type(e).__name__}: {e}"))
+        return
+
+    load_s = time.perf_counter() - start
+    logger.info("%s warmed up in %.1fs", engine, load_s)
+    readiness.set(engine, EngineState("ready", load_s=round(load_s, 3)))
+
+
+async def warmup_engines(executor: InferenceExecutor) -> None:
+    """Load the configured engines and run one dummy forward pass through each, concurrently."""
+
+    readiness = get_readiness()
+    await asyncio.gather(*(_warm(executor, e, readiness) for e in ENGINE_MODULES if warmup_enabled(e)))
@@ -0,0 +1,313 @@
+from __future__ import annotations
+
+# built-in
+import dataclasses
+import heapq
+import itertools
+import json
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from pathlib import Path
+from threading import Lock
+from typing import Any, Literal
+
+type JobKind = Literal["ocr", "tags", "analyze"]
+type JobStatus = Literal["pending", "running", "succeeded", "failed"]
+
+
+@dataclass(frozen=True)
+class Job:
+    id: str
+    kind: JobKind
+    # engine options, as the synchronous endpoint would take them (verbose, top_k, engines)
+    params: dict[str, Any]
+    priority: int
+    created_at: float
+    status: JobStatus = "pending"
+    # exactly one of the two, a url is fetched when the job runs
+    image_bytes: bytes | None = None
+    image_url: str | None = None
+    callback_url: str | None = None
+    started_at: float | None = None
+    finished_at: float | None = None
+    attempts: int = 0
+    result: dict[str, Any] | None = None
+    # {"status_code": ..., "detail": ...} like a batch item error
+    error: dict[str, Any] | None = None
+
+
+class JobQueue(ABC):
+    """Durable-enough store of jobs, handing out pending ones highest priority first, oldest first."""
+
+    # backends that touch the filesystem are called off the event loop
+    blocking: bool = False
+
+    @abstractmethod
+    def put(self, job: Job) -> None: ...
+
+    @abstractmethod
+    def claim(self, *, lease_s: float) -> Job | None:
+        """Mark the next job running and return it; a running job whose lease ran out counts as pending."""
+
+    @abstractmethod
+    def renew(self, job_id: str, *, lease_s: float) -> None: ...
+
+    @abstractmethod
+    def finish(self, job_id: str, *, result: dict[str, Any] | None, error: dict[str, Any] | None) -> Job | None:
+        """Record the outcome and drop the image, returning the finished job."""
+
+    @abstractmethod
+    def get(self, job_id: str) -> Job | None: ...
+
+    @abstractmethod
+    def pending(self) -> int: ...
+
+    @abstractmethod
+    def purge(self, *, ttl_s: float) -> int:
+        """Remove jobs that finished more than ``ttl_s`` ago, returning how many."""
+
+    def stats(self) -> dict[str, int]:
+        return {}
+
+
+class MemoryJobQueue(JobQueue):
+    """In-process queue; jobs are lost on restart and not shared between workers."""
+
+    def __init__(self) -> None:
+        self._jobs: dict[str, Job] = {}
+        # (-priority, created_at, arrival, id); finished or claimed ids are skipped when popped
+        self._heap: list[tuple[int, float, int, str]] = []
+        self._arrival = itertools.count()
+        # running job id -> time its lease runs out
+        self._leases: dict[str, float] = {}
+        self._lock = Lock()
+
+    def _push(self, job: Job) -> None:
+        heapq.heappush(self._heap, (-job.priority, job.created_at, next(self._arrival), job.id))
+
+    def put(self, job: Job) -> None:
+        with self._lock:
+            self._jobs[job.id] = job
+            self._push(job)
+
+    def claim(self, *, lease_s: float) -> Job | None:
+        now = time.time()
+        with self._lock:
+            # a job whose worker task died goes back in line, in its original place
+            for job_id in [job_id for job_id, until in self._leases.items() if until < now]:
+                del self._leases[job_id]
+                self._jobs[job_id] = job = dataclasses.replace(self._jobs[job_id], status="pending")
+                self._push(job)
+
+            while self._heap:
+                *_order, job_id = heapq.heappop(self._heap)
+                job = self._jobs.get(job_id)
+                if job is None or job.status != "pending":
+                    continue
+                job = dataclasses.replace(job, status="running", started_at=now, attempts=job.attempts + 1)
+                self._jobs[job_id] = job
+                self._leases[job_id] = now + lease_s
+                return job
+            return None
+
+    def renew(self, job_id: str, *, lease_s: float) -> None:
+        with self._lock:
+            if job_id in self._leases:
+                self._leases[job_id] = time.time() + lease_s
+
+    def finish(self, job_id: str, *, result: dict[str, Any] | None, error: dict[str, Any] | None) -> Job | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            self._leases.pop(job_id, None)
+            job = dataclasses.replace(
+                job,
+                status="failed" if error is not None else "succeeded",
+                finished_at=time.time(),
+                result=result,
+                error=error,
+                image_bytes=None,
+            )
+            self._jobs[job_id] = job
+            return job
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def pending(self) -> int:
+        with self._lock:
+            return sum(job.status == "pending" for job in self._jobs.values())
+
+    def purge(self, *, ttl_s: float) -> int:
+        cutoff = time.time() - ttl_s
+        with self._lock:
+            expired = [j.id for j in self._jobs.values() if j.finished_at is not None and j.finished_at < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+            return len(expired)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            counts: dict[str, int] = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return counts
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    status TEXT NOT NULL,
+    image BLOB,
+    image_url TEXT,
+    callback_url TEXT,
+    started_at REAL,
+    finished_at REAL,
+    leased_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_next ON jobs (status, priority DESC, created_at);
+CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished_at);
+"""
+
+# every query reading whole jobs selects these columns in this order, see _job
+_SELECT_JOBS = (
+    "SELECT id, kind, params, priority, created_at, status, image, image_url, callback_url,"
+    " started_at, finished_at, attempts, result, error FROM jobs"
+)
+
+
+class SqliteJobQueue(JobQueue):
+    """Jobs in one SQLite file, which every worker process on the host can share.
+
+    Claims run in an immediate transaction, so two processes never take the same job. A claim holds
+    a lease the running worker keeps renewing; if the worker dies the lease runs out and the job is
+    claimed again.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str) -> None:
+        db_path = Path(path).expanduser()
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        # autocommit, transactions are opened explicitly where they matter
+        self._db = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False, timeout=30.0)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._lock = Lock()
+
+    @staticmethod
+    def _job(row: tuple[Any, ...]) -> Job:
+        (job_id, kind, params, priority, created_at, status, image, image_url, callback_url) = row[:9]
+        (started_at, finished_at, attempts, result, error) = row[9:]
+        return Job(
+            id=job_id,
+            kind=kind,
+            params=json.loads(params),
+            priority=priority,
+            created_at=created_at,
+            status=status,
+            image_bytes=image,
+            image_url=image_url,
+            callback_url=callback_url,
+            started_at=started_at,
+            finished_at=finished_at,
+            attempts=attempts,
+            result=json.loads(result) if result is not None else None,
+            error=json.loads(error) if error is not None else None,
+        )
+
+    def put(self, job: Job) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, kind, params, priority, created_at, status, image, image_url, callback_url)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job.id,
+                    job.kind,
+                    json.dumps(job.params),
+                    job.priority,
+                    job.created_at,
+                    job.status,
+                    job.image_bytes,
+                    job.image_url,
+                    job.callback_url,
+                ),
+            )
+
+    def claim(self, *, lease_s: float) -> Job | None:
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    _SELECT_JOBS + " WHERE status = 'pending' OR (status = 'running' AND leased_until < ?)"
+                    " ORDER BY priority DESC, created_at LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if row is not None:
+                    self._db.execute(
+                        "UPDATE jobs SET status = 'running', started_at = ?, leased_until = ?, attempts = attempts + 1"
+                        " WHERE id = ?",
+                        (now, now + lease_s, row[0]),
+                    )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+        if row is None:
+            return None
+        return dataclasses.replace(self._job(row), status="running", started_at=now, attempts=row[11] + 1)
+
+    def renew(self, job_id: str, *, lease_s: float) -> None:
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET leased_until = ? WHERE id = ? AND status = 'running'",
+                (time.time() + lease_s, job_id),
+            )
+
+    def finish(self, job_id: str, *, result: dict[str, Any] | None, error: dict[str, Any] | None) -> Job | None:
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, leased_until = NULL, image = NULL, result = ?, error = ?"
+                " WHERE id = ?",
+                (
+                    "failed" if error is not None else "succeeded",
+                    time.time(),
+                    json.dumps(result) if result is not None else None,
+                    json.dumps(error) if error is not None else None,
+                    job_id,
+                ),
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            row = self._db.execute(_SELECT_JOBS + " WHERE id = ?", (job_id,)).fetchone()
+        return self._job(row) if row is not None else None
+
+    def pending(self) -> int:
+        with self._lock:
+            (count,) = self._db.execute("SELECT COUNT(*) FROM jobs WHERE status = 'pending'").fetchone()
+        return count
+
+    def purge(self, *, ttl_s: float) -> int:
+        with self._lock:
+            cur = self._db.execute("DELETE FROM jobs WHERE finished_at < ?", (time.time() - ttl_s,))
+        return cur.rowcount
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
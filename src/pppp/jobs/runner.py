@@ -0,0 +1,261 @@
+from __future__ import annotations
+
+# built-in
+import asyncio
+import contextlib
+import logging
+import time
+import uuid
+from threading import Lock
+from typing import TYPE_CHECKING, Any
+
+# external
+from fastapi import HTTPException
+
+# project
+from pppp import metrics
+from pppp.api.image_io import fetch_image, get_http_client
+from pppp.api.models import BatchItemError, JobResponse
+from pppp.api.pipeline import run_analyze, run_ocr, run_tags
+from pppp.engine.executor import EngineBusyError
+from pppp.jobs.backends import Job, MemoryJobQueue, SqliteJobQueue
+from pppp.settings import settings
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from pydantic import BaseModel
+
+    from pppp.jobs.backends import JobKind, JobQueue
+
+logger = logging.getLogger(__name__)
+
+_lock = Lock()
+_runner: JobRunner | None = None
+
+# how often finished jobs past their TTL are removed
+_PURGE_INTERVAL_S = 60.0
+
+
+class JobQueueFullError(Exception):
+    """Too many jobs are already waiting."""
+
+    def __init__(self, pending: int) -> None:
+        super().__init__(f"{pending} jobs are pending, limit is {settings.job_max_pending}")
+        self.retry_after_s = settings.inference_retry_after_s
+
+
+def job_response(job: Job) -> JobResponse:
+    return JobResponse(
+        id=job.id,
+        kind=job.kind,
+        status=job.status,
+        priority=job.priority,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        attempts=job.attempts,
+        result=job.result,
+        error=BatchItemError(**job.error) if job.error is not None else None,
+    )
+
+
+class JobRunner:
+    """Runs queued jobs on ``job_workers`` tasks, through the same pipeline as the synchronous endpoints.
+
+    Job workers take engine slots like any request, so ``job_workers`` bounds how much of each pool
+    bulk work can hold while interactive requests keep the rest.
+    """
+
+    def __init__(self, queue: JobQueue) -> None:
+        self.queue = queue
+        self._wakeup = asyncio.Event()
+        self._workers: list[asyncio.Task[None]] = []
+        self._purger: asyncio.Task[None] | None = None
+
+    async def _call[**P, T](self, fn: Callable[P, T], *args: P.args, **kwargs: P.kwargs) -> T:
+        if self.queue.blocking:
+            return await asyncio.to_thread(fn, *args, **kwargs)
+        return fn(*args, **kwargs)
+
+    async def submit(
+        self,
+        kind: JobKind,
+        *,
+        params: dict[str, Any],
+        priority: int = 0,
+        image_bytes: bytes | None = None,
+        image_url: str | None = None,
+        callback_url: str | None = None,
+    ) -> Job:
+        pending = await self._call(self.queue.pending)
+        if pending >= settings.job_max_pending:
+            raise JobQueueFullError(pending)
+
+        job = Job(
+            id=uuid.uuid4().hex,
+            kind=kind,
+            params=params,
+            priority=priority,
+            created_at=time.time(),
+            image_bytes=image_bytes,
+            image_url=image_url,
+            callback_url=callback_url,
+        )
+        await self._call(self.queue.put, job)
+        metrics.JOBS_SUBMITTED.inc(kind=kind)
+        self._wakeup.set()
+        return job
+
+    async def get(self, job_id: str) -> Job | None:
+        return await self._call(self.queue.get, job_id)
+
+    async def pending(self) -> int:
+        return await self._call(self.queue.pending)
+
+    async def stats(self) -> dict[str, Any]:
+        return {
+            "backend": type(self.queue).__name__,
+            "workers": len(self._workers),
+            **(await self._call(self.queue.stats)),
+        }
+
+    def start(self) -> None:
+        if self._workers or settings.job_workers <= 0:
+            return
+        self._workers = [asyncio.create_task(self._work()) for _ in range(settings.job_workers)]
+        self._purger = asyncio.create_task(self._purge())
+
+    async def stop(self) -> None:
+        tasks = [*self._workers, *([self._purger] if self._purger is not None else [])]
+        self._workers, self._purger = [], None
+        for task in tasks:
+            task.cancel()
+        # a job cut off here keeps its lease running out, and is picked up again after a restart
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _work(self) -> None:
+        while True:
+            job = await self._call(self.queue.claim, lease_s=settings.job_lease_s)
+            if job is None:
+                self._wakeup.clear()
+                # jobs put by other processes sharing the queue only show up on the next poll
+                with contextlib.suppress(TimeoutError):
+                    await asyncio.wait_for(self._wakeup.wait(), settings.job_poll_interval_s)
+                continue
+
+            try:
+                await self._run(job)
+            except Exception:
+                logger.exception("job %s crashed its worker", job.id)
+
+    async def _run(self, job: Job) -> None:
+        result, error = None, None
+        if job.attempts > settings.job_max_attempts:
+            # every earlier attempt died with its worker, this image is not going to work either
+            error = {"status_code": 500, "detail": f"gave up after {job.attempts - 1} attempts"}
+        else:
+            renew = asyncio.create_task(self._renew(job.id))
+            try:
+                result = (await self._execute(job)).model_dump()
+            except HTTPException as e:
+                error = {"status_code": e.status_code, "detail": str(e.detail)}
+            except Exception:
+                logger.exception("job %s failed", job.id)
+                error = {"status_code": 500, "detail": "failed to process image"}
+            finally:
+                renew.cancel()
+
+        finished = await self._call(self.queue.finish, job.id, result=result, error=error)
+        if finished is None:
+            return
+        metrics.JOBS_FINISHED.inc(kind=job.kind, status=finished.status)
+        metrics.JOB_SECONDS.observe((finished.finished_at or time.time()) - job.created_at, kind=job.kind)
+        if finished.callback_url:
+            await self._callback(finished)
+
+    async def _execute(self, job: Job) -> BaseModel:
+        fetch_timings: dict[str, int] = {}
+        image_bytes = job.image_bytes
+        if image_bytes is None:
+            image_bytes = await fetch_image(job.image_url or "", timings=fetch_timings)
+
+        p = job.params
+        deadline = time.monotonic() + settings.job_busy_timeout_s
+        while True:
+            try:
+                if job.kind == "ocr":
+                    return await run_ocr(image_bytes, verbose=p["verbose"], fetch_timings=fetch_timings)
+                if job.kind == "tags":
+                    return await run_tags(image_bytes, top_k=p["top_k"], fetch_timings=fetch_timings)
+                return await run_analyze(
+                    image_bytes,
+                    engines=set(p["engines"]),
+                    verbose=p["verbose"],
+                    top_k=p["top_k"],
+                    fetch_timings=fetch_timings,
+                )
+            except EngineBusyError as e:
+                # a busy engine is the normal state under bulk load, the job just waits its turn, up to a point
+                if time.monotonic() + e.retry_after_s > deadline:
+                    raise HTTPException(
+                        status_code=503,
+                        detail=f"the {e.engine} engine stayed busy for {settings.job_busy_timeout_s:g}s",
+                    ) from e
+                await asyncio.sleep(e.retry_after_s)
+
+    async def _renew(self, job_id: str) -> None:
+        while True:
+            await asyncio.sleep(settings.job_lease_s / 3)
+            await self._call(self.queue.renew, job_id, lease_s=settings.job_lease_s)
+
+    async def _callback(self, job: Job) -> None:
+        body = job_response(job).model_dump(mode="json")
+        for attempt in range(settings.job_callback_retries + 1):
+            try:
+                resp = await get_http_client().post(
+                    job.callback_url or "",
+                    json=body,
+                    timeout=settings.job_callback_timeout_s,
+                    follow_redirects=False,
+                )
+                if resp.is_success:
+                    metrics.JOB_CALLBACKS.inc(result="delivered")
+                    return
+                logger.warning("callback for job %s returned %d", job.id, resp.status_code)
+            except Exception as e:
+                logger.warning("callback for job %s failed: %s", job.id, e)
+            if attempt < settings.job_callback_retries:
+                await asyncio.sleep(2**attempt)
+
+        metrics.JOB_CALLBACKS.inc(result="failed")
+        logger.error("giving up on the callback for job %s, the result can still be polled", job.id)
+
+    async def _purge(self) -> None:
+        while True:
+            try:
+                removed = await self._call(self.queue.purge, ttl_s=settings.job_result_ttl_s)
+                if removed:
+                    logger.info("removed %d expired jobs", removed)
+            except Exception:
+                logger.exception("purging expired jobs failed")
+            await asyncio.sleep(_PURGE_INTERVAL_S)
+
+
+def _make_queue() -> JobQueue:
+    if settings.job_backend == "sqlite":
+        return SqliteJobQueue(settings.job_db_path)
+    return MemoryJobQueue()
+
+
+def get_job_runner() -> JobRunner:
+    """Get the job runner singleton for the configured queue backend."""
+
+    global _runner
+    if _runner is not None:
+        return _runner
+
+    with _lock:
+        if _runner is None:
+            _runner = JobRunner(_make_queue())
+        return _runner
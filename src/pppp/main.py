@@ -1,30 +1,89 @@
 from __future__ import annotations
 
 # built-in
+import asyncio
+import contextlib
+import dataclasses
+import time
 from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Any
 
 # external
-import torch
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 # project
+from pppp import metrics
+from pppp.api.analyze import router as analyze_router
+from pppp.api.embed import router as embed_router
+from pppp.api.image_io import close_http_client, get_http_client
+from pppp.api.jobs import router as jobs_router
 from pppp.api.ocr import router as ocr_router
 from pppp.api.tags import router as tags_router
-from pppp.engine.paddle import get_ocr
+from pppp.cache.results import get_result_cache
+from pppp.cache.similar import get_near_duplicate_index
+from pppp.engine.executor import EngineBusyError, get_executor, shutdown_executor
+from pppp.engine.registry import loaded_engine
+from pppp.engine.warmup import get_readiness, warmup_engines
+from pppp.jobs.runner import get_job_runner
 from pppp.settings import settings
 
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+
+    from fastapi import Request, Response
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    if settings.warmup_on_start:
-        get_ocr()
+    executor = get_executor()
+    get_http_client()
+    get_readiness()
+    # models load in the background so /health answers straight away, /ready reports when they are warm
+    warmup = asyncio.create_task(warmup_engines(executor)) if settings.warmup_on_start else None
+    jobs = get_job_runner()
+    jobs.start()
 
     yield
 
+    await jobs.stop()
+    if warmup is not None:
+        warmup.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await warmup
+    await close_http_client()
+    shutdown_executor()
+
 
 app = FastAPI(lifespan=lifespan, title="pppp", version="0.1.0")
 
 
+@app.exception_handler(EngineBusyError)
+async def engine_busy_handler(_request: Request, exc: EngineBusyError) -> JSONResponse:
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail, "engine": exc.engine},
+        headers={"Retry-After": str(exc.retry_after_s)},
+    )
+
+
+@app.middleware("http")
+async def http_metrics(request: Request, call_next: Callable[[Request], Awaitable[Response]]) -> Response:
+    start = time.perf_counter()
+    metrics.HTTP_INFLIGHT.inc()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        metrics.HTTP_INFLIGHT.dec()
+        # the route template, not the raw path, so label values stay bounded
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        metrics.HTTP_REQUESTS.inc(method=request.method, route=route, status=str(status))
+        metrics.HTTP_SECONDS.observe(time.perf_counter() - start, method=request.method, route=route)
+
+
 @app.get("/")
 async def root():
     return {"message": "Nothing here, teehehheheheheheh!"}
@@ -35,5 +94,38 @@ async def health():
     return {"status": "ok"}
 
 
+@app.get("/ready")
+async def ready() -> JSONResponse:
+    readiness = get_readiness()
+    engines = {name: dataclasses.asdict(state) for name, state in readiness.snapshot().items()}
+    ok = readiness.ready
+    return JSONResponse(status_code=200 if ok else 503, content={"ready": ok, "engines": engines})
+
+
+@app.get("/stats")
+async def stats() -> dict[str, Any]:
+    return {
+        "executor": get_executor().stats(),
+        # rampp is not imported just to report that it has not batched anything yet
+        "batching": {"rampp": rampp.batching_stats() if (rampp := loaded_engine("rampp")) is not None else None},
+        "cache": get_result_cache().stats(),
+        "near_duplicates": index.stats() if (index := get_near_duplicate_index()) is not None else None,
+        "jobs": await get_job_runner().stats(),
+    }
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics() -> PlainTextResponse:
+    for name, pool in get_executor().stats().items():
+        metrics.ENGINE_QUEUED.set(pool["pending"] - pool["running"], engine=name)
+        metrics.ENGINE_RUNNING.set(pool["running"], engine=name)
+    metrics.JOBS_PENDING.set(await get_job_runner().pending())
+
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 app.include_router(ocr_router)
 app.include_router(tags_router)
+app.include_router(embed_router)
+app.include_router(analyze_router)
+app.include_router(jobs_router)
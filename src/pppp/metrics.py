@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+# built-in
+import bisect
+import math
+from abc import ABC, abstractmethod
+from threading import Lock
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+_registry: list[_Metric] = []
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+FRAME_BUCKETS = (1, 2, 4, 8, 16, 24, 32, 64, 128, 256)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+BATCH_WAIT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+JOB_BUCKETS = (0.1, 0.5, 1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Iterable[tuple[str, str]]) -> str:
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in labels)
+    return f"{{{pairs}}}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, description: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.description = description
+        self.labelnames = labelnames
+        self._lock = Lock()
+        _registry.append(self)
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    @abstractmethod
+    def _samples(self) -> Iterator[str]: ...
+
+    def render(self) -> str:
+        header = f"# HELP {self.name} {self.description}\n# TYPE {self.name} {self.kind}\n"
+        with self._lock:
+            return header + "".join(f"{line}\n" for line in self._samples())
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, description: str, labelnames: tuple[str, ...] = ()) -> None:
+        super().__init__(name, description, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> Iterator[str]:
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(zip(self.labelnames, key, strict=True))} {_format_value(value)}"
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, description: str, labelnames: tuple[str, ...] = ()) -> None:
+        super().__init__(name, description, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def _samples(self) -> Iterator[str]:
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(zip(self.labelnames, key, strict=True))} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labelnames: tuple[str, ...] = (),
+        *,
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, description, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: a count per bucket (non-cumulative, last slot is +Inf), then the sum
+        self._values: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            total[0] += value
+
+    def _samples(self) -> Iterator[str]:
+        for key, (counts, total) in sorted(self._values.items()):
+            labels = list(zip(self.labelnames, key, strict=True))
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts, strict=True):
+                cumulative += count
+                le = _format_labels([*labels, ("le", _format_value(bound))])
+                yield f"{self.name}_bucket{le} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(labels)} {_format_value(total[0])}"
+            yield f"{self.name}_count{_format_labels(labels)} {cumulative}"
+
+
+def render() -> str:
+    """Every registered metric in the Prometheus text exposition format."""
+
+    return "".join(metric.render() for metric in _registry)
+
+
+STAGE_SECONDS = Histogram(
+    "pppp_stage_seconds",
+    "Time spent in each pipeline stage (fetch, sniff, decode, queue, preprocess, forward, postprocess, ...).",
+    ("stage", "engine"),
+)
+REQUEST_SECONDS = Histogram(
+    "pppp_engine_request_seconds",
+    "Time from an image reaching the pipeline to its engine result, cache hits included.",
+    ("engine",),
+)
+HTTP_REQUESTS = Counter("pppp_http_requests_total", "HTTP requests served.", ("method", "route", "status"))
+HTTP_SECONDS = Histogram("pppp_http_request_seconds", "HTTP request latency.", ("method", "route"))
+HTTP_INFLIGHT = Gauge("pppp_http_inflight_requests", "HTTP requests being served right now.")
+ENGINE_QUEUED = Gauge("pppp_engine_queued_jobs", "Jobs admitted to an engine pool and waiting to run.", ("engine",))
+ENGINE_RUNNING = Gauge("pppp_engine_running_jobs", "Jobs running on an engine pool.", ("engine",))
+ENGINE_READY = Gauge("pppp_engine_ready", "1 once an engine warmed up at startup is loaded.", ("engine",))
+ENGINE_REJECTED = Counter(
+    "pppp_engine_rejected_total",
+    "Jobs an engine pool turned away, by reason (queue_full, queue_timeout).",
+    ("engine", "reason"),
+)
+CACHE_REQUESTS = Counter("pppp_cache_requests_total", "Result cache lookups.", ("engine", "result"))
+FRAMES_ANALYZED = Histogram(
+    "pppp_frames_analyzed",
+    "Frames an engine ran on per image.",
+    ("engine",),
+    buckets=FRAME_BUCKETS,
+)
+BATCH_SIZE = Histogram(
+    "pppp_batch_size",
+    "Items an engine's micro-batcher ran through the model in one call.",
+    ("engine",),
+    buckets=BATCH_SIZE_BUCKETS,
+)
+BATCH_WAIT_SECONDS = Histogram(
+    "pppp_batch_wait_seconds",
+    "Time an item waited in an engine's micro-batcher before its batch ran.",
+    ("engine",),
+    buckets=BATCH_WAIT_BUCKETS,
+)
+FRAMES_SKIPPED = Counter("pppp_frames_skipped_total", "Animation frames dropped before any model ran.", ("engine",))
+JOBS_SUBMITTED = Counter("pppp_jobs_submitted_total", "Async jobs accepted.", ("kind",))
+JOBS_FINISHED = Counter("pppp_jobs_finished_total", "Async jobs finished, by outcome.", ("kind", "status"))
+JOBS_PENDING = Gauge("pppp_jobs_pending", "Async jobs waiting for a worker.")
+JOB_SECONDS = Histogram(
+    "pppp_job_seconds",
+    "Time from an async job being submitted to its result.",
+    ("kind",),
+    buckets=JOB_BUCKETS,
+)
+JOB_CALLBACKS = Counter("pppp_job_callbacks_total", "Async job callbacks, delivered or given up on.", ("result",))
@@ -0,0 +1,74 @@
+"""Fill and check the model artifact cache.
+
+    pppp-models fetch                  # download everything both engines load into model_cache_dir
+    pppp-models fetch --engine rampp
+    pppp-models verify                 # re-hash every cached file against the manifest
+
+Run ``fetch`` at image build time, then set ``PPPP_MODEL_OFFLINE=true`` so pods only ever load from disk.
+"""
+
+from __future__ import annotations
+
+# built-in
+import argparse
+import importlib
+import logging
+import sys
+
+# project
+from pppp import artifacts
+from pppp.engine.registry import ENGINE_MODULES
+from pppp.settings import settings
+
+# the function of each engine module that loads its models; the module itself is only imported by
+# ``fetch``, so ``verify`` and ``--help`` do not pull in paddle or torch
+_LOADERS = {"paddle": "get_ocr", "rampp": "load_model"}
+
+
+def fetch(engines: list[str]) -> None:
+    if settings.model_offline:
+        sys.exit("model_offline is set, nothing can be fetched")
+
+    # loading an engine downloads exactly what it needs, including what its libraries pull in themselves
+    for engine in engines:
+        print(f"fetching {engine} into {artifacts.cache_dir()}")
+        getattr(importlib.import_module(ENGINE_MODULES[engine]), _LOADERS[engine])()
+    print(f"{len(artifacts.read_manifest())} files recorded in the manifest")
+
+
+def verify() -> None:
+    root = artifacts.cache_dir()
+    failures = 0
+    for name, expected in sorted(artifacts.read_manifest().items()):
+        path = root / name
+        if not path.is_file():
+            status = "missing"
+        elif artifacts.sha256_file(path) != expected:
+            status = "MISMATCH"
+        else:
+            status = "ok"
+        failures += status != "ok"
+        print(f"{status:8s} {name}")
+    if failures:
+        sys.exit(f"{failures} artifact(s) failed verification")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="pppp-models", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    fetch_cmd = commands.add_parser("fetch", help="download model artifacts into the cache")
+    fetch_cmd.add_argument("--engine", nargs="*", choices=list(_LOADERS), default=list(_LOADERS))
+    commands.add_parser("verify", help="check cached artifacts against their recorded checksums")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.command == "fetch":
+        fetch(args.engine)
+    else:
+        verify()
+
+
+if __name__ == "__main__":
+    main()
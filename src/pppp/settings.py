@@ -1,6 +1,10 @@
 from __future__ import annotations
 
+# built-in
+from typing import Literal, Self
+
 # external
+from pydantic import model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -11,10 +15,52 @@ class Settings(BaseSettings):
     paddle_use_angle_cls: bool = True
     paddle_enable_mkldnn: bool = True
     paddle_min_line_confidence: float = 0.7
+    # images are decoded only as small as keeps their short side at least this long, 0 decodes at full size.
+    # recognition reads each line resized to 48px high, so this keeps ordinary text well above that
+    paddle_decode_min_side: int = 1536
+    # detection runs alone first, on a copy at most this long on its long side. No boxes means no text and
+    # nothing else runs; otherwise only the detected lines are cropped at full resolution and recognized
+    paddle_roi_enabled: bool = True
+    paddle_roi_det_max_side: int = 960
+    # when every box is this close to level the angle classifier is skipped, which misses upside-down
+    # text; a negative tolerance always classifies
+    paddle_roi_level_tolerance_deg: float = 5.0
+    # animated images: a frame whose text shares this much of its character trigrams (Jaccard) with any
+    # earlier kept frame is dropped, and lines this similar in overlapping boxes merge across frames
+    paddle_gif_dedup_threshold: float = 0.8
+    # frames longer than paddle_tile_min_long_side, or more than paddle_tile_min_aspect times longer than
+    # wide (or wide than tall), are read as overlapping tiles of paddle_tile_size at full resolution instead
+    # of being shrunk whole for detection. The overlap must exceed the tallest text line
+    paddle_tile_enabled: bool = True
+    paddle_tile_min_long_side: int = 2400
+    paddle_tile_min_aspect: float = 2.5
+    paddle_tile_size: int = 1280
+    paddle_tile_overlap: int = 160
+    # PaddleOCR instances per process, each a full copy of the models and used by one image or tile at a
+    # time. Tiles of one image are read on as many at once; concurrent requests share them too
+    paddle_predictors: int = 1
+    # animated images: frames read at once while a producer thread decodes the next ones, 1 reads them one
+    # after another. Each frame holds a predictor while it is read, so going above paddle_predictors gains
+    # nothing
+    paddle_gif_parallelism: int = 1
+    # engines this server runs at all; a disabled engine is never imported (nor paddle or torch with it)
+    # and requests for it get 501, so an OCR-only pod starts without loading torch
+    engines_enabled: list[Literal["paddle", "rampp"]] = ["paddle", "rampp"]
     warmup_on_start: bool = True
+    # engines loaded and run on a dummy image in the background at startup, /ready waits for them
+    warmup_engines: list[Literal["paddle", "rampp"]] = ["paddle", "rampp"]
     max_image_bytes: int = 25 * 1024 * 1024
+    # width * height from the image header, larger images are refused before anything is decoded
+    max_image_pixels: int = 100_000_000
     fetch_timeout_s: int = 20
 
+    # shared client for image_url fetches, connections are kept alive and reused across requests
+    fetch_max_connections: int = 100
+    fetch_max_keepalive_connections: int = 20
+    fetch_keepalive_expiry_s: float = 30.0
+    # needs the optional h2 package, plain HTTP/1.1 is used without it
+    fetch_http2: bool = False
+
     allowed_mime_types: list[str] = [
         "image/png",
         "image/jpeg",
@@ -29,13 +75,109 @@ class Settings(BaseSettings):
         r"^(localhost|127\.0\.0\.1|::1|.+\.amazonaws\.com|.+\.amazonaws\.com|.+\.cloudfront\.net)$"
     )
 
+    # animated images, frames that barely change are skipped before any model runs
+    keyframe_enabled: bool = True
+    keyframe_max_frames: int = 24
+    # gray levels the most-changed region must move by, above the frame-wide noise floor
+    keyframe_min_change: float = 1.5
+    keyframe_thumb_size: int = 128
+
+    # model artifacts are downloaded once into this directory (`pppp-models fetch` fills it ahead of time)
+    model_cache_dir: str = "~/.cache/pppp/models"
+    # load only from model_cache_dir and never download, startup fails fast if something is missing
+    model_offline: bool = False
+    # re-hash cached artifacts against the checksums recorded when they were downloaded, once per file until
+    # its size or mtime changes; in process mode the front end checks for all of its workers
+    model_verify_checksums: bool = True
+
     # recognize-anything settings
     rampp_checkpoint: str = (
         "https://huggingface.co/xinyu1205/recognize-anything-plus-model/resolve/main/ram_plus_swin_large_14m.pth"
     )
+    # pins the checkpoint download when set
+    rampp_checkpoint_sha256: str = ""
     rampp_image_size: int = 384
+    # decode no larger than needed for rampp_image_size, rather than at full size only to be resized
+    rampp_decode_reduce: bool = True
     rampp_vit: str = "swin_l"
     rampp_use_gpu: bool = False
+    # "eager" is plain fp32; "int8" quantizes the linear layers dynamically (cpu only); "bf16" autocasts
+    # where the hardware has native bf16; "compile" and "torchscript" optimize the image encoder.
+    # scripts/bench_rampp_backends.py measures the speed and tag agreement of each against eager.
+    # "torchscript" runs one image at a time, its traced graph is fixed to one batch size
+    rampp_backend: Literal["eager", "int8", "bf16", "compile", "torchscript"] = "eager"
+    # intra-op threads per model, 0 keeps torch's default of one per core. In process mode every rampp
+    # worker gets this many, so keep workers * threads at or below the cores available
+    rampp_num_threads: int = 0
+    # tags scoring at least this are kept with the cached features, so any top_k or a request threshold
+    # down to this floor is answered without running the model again
+    rampp_score_floor: float = 0.3
+    rampp_max_batch_size: int = 8
+    rampp_max_batch_wait_ms: float = 10.0
+
+    # inference executor, queue limits are per engine on top of the running jobs
+    paddle_concurrency: int = 1
+    paddle_max_queue: int = 16
+    # rampp requests only preprocess on the pool, the forward pass is shared by the batcher
+    rampp_concurrency: int = 4
+    rampp_max_queue: int = 16
+    inference_queue_timeout_s: float = 30.0
+    inference_retry_after_s: int = 5
+
+    # "thread" runs the models in this process, "process" in spawned engine workers that each load one copy.
+    # in process mode the *_workers counts replace *_concurrency
+    serving_mode: Literal["thread", "process"] = "thread"
+    paddle_workers: int = 1
+    rampp_workers: int = 1
+
+    # batch endpoints, items are fetched and run concurrently up to these bounds
+    batch_max_items: int = 64
+    batch_fetch_concurrency: int = 8
+    batch_concurrency: int = 8
+
+    # async jobs (/jobs) for images too slow to answer within a gateway timeout. Job workers take engine
+    # slots like any request, so job_workers bounds how much of each pool bulk work can hold.
+    # "sqlite" keeps jobs across restarts and shares them between processes on the host; job_db_path
+    # must then be on a writable volume, the image's root filesystem is read-only
+    job_backend: Literal["memory", "sqlite"] = "memory"
+    job_db_path: str = "~/.cache/pppp/jobs.sqlite3"
+    job_workers: int = 2
+    job_max_pending: int = 1000
+    job_result_ttl_s: int = 24 * 60 * 60
+    # a running job whose worker stops renewing its lease for this long is claimed again
+    job_lease_s: float = 60.0
+    job_max_attempts: int = 3
+    # a job keeps waiting for a busy engine slot this long before it fails with 503
+    job_busy_timeout_s: float = 15 * 60.0
+    job_poll_interval_s: float = 1.0
+    job_callback_host_regex: str = r"^(localhost|127\.0\.0\.1|::1)$"
+    job_callback_timeout_s: float = 10.0
+    job_callback_retries: int = 3
+
+    # result cache, keyed by image digest and the engine settings that affect output
+    cache_backend: Literal["memory", "disk", "none"] = "memory"
+    cache_max_bytes: int = 64 * 1024 * 1024
+    cache_ttl_s: int = 24 * 60 * 60
+    cache_dir: str = "~/.cache/pppp/results"
+
+    # near-duplicate reuse: a still whose perceptual hash is at most near_dup_max_distance bits (of 64)
+    # from an image already run gets that image's cached result, so a resized or re-encoded copy is not
+    # run again. One meme template with two captions hashes close as well, so OCR is opt-in
+    near_dup_engines: list[Literal["paddle", "rampp"]] = ["rampp"]
+    near_dup_max_distance: int = 5
+    # "memory" keeps up to near_dup_max_entries in process (about 1 KB each); "sqlite" scales to millions
+    # on disk and is shared by every process on the host
+    near_dup_backend: Literal["memory", "sqlite"] = "memory"
+    near_dup_max_entries: int = 100_000
+    near_dup_db_path: str = "~/.cache/pppp/near-dup.sqlite3"
+
+    @model_validator(mode="after")
+    def _check_tiles(self) -> Self:
+        # tiles start every paddle_tile_size - paddle_tile_overlap pixels, which has to be a step forward
+        if not 0 <= self.paddle_tile_overlap < self.paddle_tile_size:
+            msg = "paddle_tile_overlap must be at least 0 and smaller than paddle_tile_size"
+            raise ValueError(msg)
+        return self
 
 
 settings = Settings()
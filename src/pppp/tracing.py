@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+# built-in
+import importlib.util
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+# project
+from pppp import metrics
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+# OpenTelemetry is optional, spans are only exported when it is installed and configured
+if importlib.util.find_spec("opentelemetry") is not None:
+    # external
+    from opentelemetry import trace as _otel_trace
+
+    _tracer = _otel_trace.get_tracer("pppp")
+else:
+    _tracer = None
+
+type Attribute = str | int | float | bool
+
+# spans finished while capturing, so a worker process can send them back with its result
+_captured: ContextVar[list[SpanRecord] | None] = ContextVar("pppp_captured_spans", default=None)
+
+
+@dataclass(frozen=True)
+class SpanRecord:
+    name: str
+    engine: str
+    start_ns: int
+    duration_s: float
+    attributes: dict[str, Attribute] = field(default_factory=dict)
+
+
+def _finish(record: SpanRecord) -> None:
+    metrics.STAGE_SECONDS.observe(record.duration_s, stage=record.name, engine=record.engine)
+    captured = _captured.get()
+    if captured is not None:
+        captured.append(record)
+
+
+@contextmanager
+def span(name: str, *, engine: str = "", **attributes: Attribute) -> Iterator[None]:
+    """Time a pipeline stage into ``pppp_stage_seconds`` and, with OpenTelemetry, a trace span."""
+
+    start_ns = time.time_ns()
+    start = time.perf_counter()
+    otel = (
+        _tracer.start_as_current_span(f"pppp.{name}", attributes={"pppp.engine": engine, **attributes})
+        if _tracer is not None
+        else nullcontext()
+    )
+    with otel:
+        try:
+            yield
+        finally:
+            _finish(SpanRecord(name, engine, start_ns, time.perf_counter() - start, attributes))
+
+
+def _emit(r: SpanRecord) -> None:
+    if _tracer is not None:
+        otel = _tracer.start_span(
+            f"pppp.{r.name}",
+            start_time=r.start_ns,
+            attributes={"pppp.engine": r.engine, **r.attributes},
+        )
+        otel.end(end_time=r.start_ns + int(r.duration_s * 1e9))
+    _finish(r)
+
+
+def record(name: str, duration_s: float, *, engine: str = "", **attributes: Attribute) -> None:
+    """Record a stage that was timed elsewhere (e.g. queue wait) as a span that ends now."""
+
+    _emit(SpanRecord(name, engine, time.time_ns() - int(duration_s * 1e9), duration_s, attributes))
+
+
+@contextmanager
+def capture() -> Iterator[list[SpanRecord]]:
+    """Collect the spans finished inside the block, to ship them to another process."""
+
+    captured: list[SpanRecord] = []
+    token = _captured.set(captured)
+    try:
+        yield captured
+    finally:
+        _captured.reset(token)
+
+
+def replay(records: list[SpanRecord]) -> None:
+    """Record spans captured in another process here, keeping their original start times."""
+
+    for r in records:
+        _emit(r)
@@ -1,11 +1,53 @@
 from __future__ import annotations
 
 # built-in
-from collections.abc import Iterable
+from dataclasses import dataclass
 from io import BytesIO
+from typing import TYPE_CHECKING
 
 # external
-from PIL import Image, ImageSequence
+import numpy as np
+from PIL import Image, ImageOps, ImageSequence
+
+# project
+from pppp.settings import settings
+
+if TYPE_CHECKING:
+    from collections.abc import Collection, Iterable, Iterator
+
+_EXIF_ORIENTATION = 0x0112
+
+# keyframe thumbnails are compared in square cells of this many pixels
+_CELL = 8
+# perceptual hash: the lowest 8x8 frequencies of a 32x32 grayscale thumbnail
+_PHASH_SIZE = 32
+_PHASH_BITS = 8
+_DCT = np.sqrt(2 / _PHASH_SIZE) * np.cos(
+    np.pi * np.arange(_PHASH_SIZE)[:, None] * (2 * np.arange(_PHASH_SIZE)[None, :] + 1) / (2 * _PHASH_SIZE)
+)
+
+
+class ImageTooLargeError(ValueError):
+    """The image header claims more pixels than ``max_image_pixels``, it is refused before decoding."""
+
+
+@dataclass(frozen=True)
+class KeyframeSelection:
+    indices: list[int]
+    total: int
+
+    @property
+    def skipped(self) -> int:
+        return self.total - len(self.indices)
+
+
+@dataclass(frozen=True)
+class DecodedImage:
+    """The frames an engine should look at, decoded once so several engines can share them."""
+
+    frames: list[tuple[int, Image.Image]]
+    frames_total: int
+    animated: bool
 
 
 def is_gif(image_bytes: bytes, *, content_type: str | None) -> bool:
@@ -16,17 +58,220 @@ def is_gif(image_bytes: bytes, *, content_type: str | None) -> bool:
         if ct == "image/gif":
             return True
 
-    return image_bytes[:6] in {b"GIF87a", b"GIF89a"}
+    return image_bytes.startswith((b"GIF87a", b"GIF89a"))
 
 
-def iter_image_frames(image_bytes: bytes, *, content_type: str | None) -> Iterable[tuple[int, Image.Image]]:
-    """Yield (frame_index, frame_image) for a still or animated image."""
+def open_image(image_bytes: bytes) -> Image.Image:
+    """Open an image lazily, reading only its header, and refuse it if it is too big to decode.
+
+    The pixel count comes from the header, so a decompression bomb is rejected before any pixel
+    buffer is allocated. For animations this is the canvas, every frame is decoded at that size.
+    """
 
     im = Image.open(BytesIO(image_bytes))
+    pixels = im.width * im.height
+    if pixels > settings.max_image_pixels:
+        raise ImageTooLargeError(
+            f"image is {im.width}x{im.height} ({pixels} pixels), limit is {settings.max_image_pixels}"
+        )
+    return im
+
+
+def _reduce(im: Image.Image, min_side: int | None) -> Image.Image:
+    # an integer box reduce, as long as both sides stay at least min_side
+    factor = min(im.size) // min_side if min_side else 1
+    return im.reduce(factor) if factor >= 2 else im
+
+
+def iter_image_frames(
+    image_bytes: bytes,
+    *,
+    content_type: str | None,
+    indices: Collection[int] | None = None,
+    min_side: int | None = None,
+) -> Iterable[tuple[int, Image.Image]]:
+    """Yield (frame_index, frame_image) for a still or animated image, optionally only for ``indices``.
+
+    With ``min_side``, frames come out downscaled as far as they can be while both sides stay at least
+    that long. JPEGs are decoded straight at the smaller size (DCT scaling in draft mode), so a large
+    photo never exists at full resolution; other formats are decoded fully, then box-reduced.
+    """
+
+    im = open_image(image_bytes)
 
     if is_gif(image_bytes, content_type=content_type):
+        wanted = set(indices) if indices is not None else None
         for frame_index, frame in enumerate(ImageSequence.Iterator(im)):
-            yield frame_index, frame.copy().convert("RGB")
+            if wanted is not None and frame_index not in wanted:
+                continue
+            rgb = _reduce(to_rgb(frame), min_side)
+            # the iterator reuses one image for every frame; converting or reducing already made a new one
+            yield frame_index, (rgb.copy() if rgb is frame else rgb)
         return
 
-    yield 0, im.convert("RGB")
+    if min_side and im.format == "JPEG":
+        # picks the largest 1/2, 1/4 or 1/8 scale that keeps both sides at least min_side
+        im.draft("RGB", (min_side, min_side))
+
+    # honour exif orientation like cv2.imread does, exif_transpose copies even when there is nothing to do
+    if im.getexif().get(_EXIF_ORIENTATION, 1) != 1:
+        im = ImageOps.exif_transpose(im)
+
+    yield 0, _reduce(to_rgb(im), min_side)
+
+
+def check_image_size(image_bytes: bytes) -> None:
+    """Raise :class:`ImageTooLargeError` if the image is too big to decode, without decoding it."""
+
+    open_image(image_bytes)
+
+
+def to_rgb(im: Image.Image) -> Image.Image:
+    """Convert to RGB, flattening any transparency onto white rather than whatever the hidden pixels hold.
+
+    An image that is already RGB is returned as is, not copied.
+    """
+
+    if im.mode == "RGB":
+        im.load()
+        return im
+
+    has_alpha = im.mode in {"RGBA", "LA", "PA"} or (im.mode == "P" and "transparency" in im.info)
+    if not has_alpha:
+        return im.convert("RGB")
+
+    # pasting through the alpha band blends exactly like alpha_composite over opaque white, without
+    # the RGBA background and result buffers
+    rgba = im if im.mode == "RGBA" else im.convert("RGBA")
+    flat = Image.new("RGB", rgba.size, (255, 255, 255))
+    flat.paste(rgba, mask=rgba)
+    return flat
+
+
+def _thumbnail(frame: Image.Image, size: int) -> np.ndarray:
+    size = max(_CELL, size - size % _CELL)
+    return np.asarray(frame.convert("L").resize((size, size), Image.Resampling.BOX), dtype=np.float32)
+
+
+def perceptual_hash(im: Image.Image) -> int:
+    """64-bit pHash of ``im``: which low frequencies sit above their median.
+
+    Resizing, recompression and format changes barely move the low frequencies, so copies of one
+    picture land a few bits apart, while unrelated pictures differ in about half of them.
+    """
+
+    thumb = np.asarray(
+        im.resize((_PHASH_SIZE, _PHASH_SIZE), Image.Resampling.BOX, reducing_gap=2.0).convert("L"),
+        dtype=np.float64,
+    )
+    low = (_DCT @ thumb @ _DCT.T)[:_PHASH_BITS, :_PHASH_BITS].ravel()
+    # the DC term is just overall brightness, it stays out of the median
+    bits = low > np.median(low[1:])
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def _region_change(a: np.ndarray, b: np.ndarray) -> float:
+    """How far the most-changed cell moved, above the frame-wide noise floor (dither, compression)."""
+
+    n = a.shape[0] // _CELL
+    cells = np.abs(a - b).reshape(n, _CELL, n, _CELL).mean(axis=(1, 3))
+    return float(cells.max() - np.median(cells))
+
+
+def _uniform_subsample(indices: list[int], budget: int) -> list[int]:
+    if budget <= 0 or len(indices) <= budget:
+        return indices
+    if budget == 1:
+        return indices[:1]
+    step = (len(indices) - 1) / (budget - 1)
+    return [indices[round(i * step)] for i in range(budget)]
+
+
+def keyframe_params() -> dict[str, object]:
+    """Keyframe settings that change which frames the engines see, for keying cached results."""
+
+    if not settings.keyframe_enabled:
+        return {"enabled": False}
+    return {
+        "enabled": True,
+        "max_frames": settings.keyframe_max_frames,
+        "min_change": settings.keyframe_min_change,
+        "thumb_size": settings.keyframe_thumb_size,
+    }
+
+
+def select_keyframes(
+    image_bytes: bytes,
+    *,
+    content_type: str | None,
+    max_frames: int | None = None,
+    min_change: float | None = None,
+    thumb_size: int | None = None,
+) -> KeyframeSelection:
+    """Pick the frames of an animated image worth running a model on.
+
+    Each frame is reduced to a small grayscale thumbnail and kept only when some region of it moved
+    by more than ``min_change`` gray levels since the last kept frame, so a caption swap still counts
+    while dither noise does not. If that still leaves more than
+    ``max_frames`` (e.g. video-like gifs where every frame differs), the survivors are thinned to an
+    even stride across the animation. Unset arguments come from the ``keyframe_*`` settings.
+    """
+
+    if not is_gif(image_bytes, content_type=content_type):
+        return KeyframeSelection(indices=[0], total=1)
+
+    max_frames = settings.keyframe_max_frames if max_frames is None else max_frames
+    min_change = settings.keyframe_min_change if min_change is None else min_change
+    thumb_size = settings.keyframe_thumb_size if thumb_size is None else thumb_size
+
+    im = open_image(image_bytes)
+
+    kept: list[int] = []
+    last: np.ndarray | None = None
+    total = 0
+    for frame_index, frame in enumerate(ImageSequence.Iterator(im)):
+        total += 1
+        thumb = _thumbnail(frame, thumb_size)
+        if last is not None and _region_change(thumb, last) <= min_change:
+            continue
+        kept.append(frame_index)
+        last = thumb
+
+    return KeyframeSelection(indices=_uniform_subsample(kept, max_frames), total=total)
+
+
+class LazyFrames:
+    """The frames of an image an engine should look at, decoded one at a time as they are iterated.
+
+    Keyframe selection still scans the whole animation up front, but only on small thumbnails, so
+    at most one full-size frame is held at once. ``decoded`` counts the frames handed out so far.
+    ``min_side`` is passed on to :func:`iter_image_frames`.
+    """
+
+    def __init__(self, image_bytes: bytes, *, content_type: str | None, min_side: int | None = None) -> None:
+        self.animated = is_gif(image_bytes, content_type=content_type)
+        self.decoded = 0
+
+        indices = None
+        if not self.animated:
+            self.total = 1
+        elif settings.keyframe_enabled:
+            selection = select_keyframes(image_bytes, content_type=content_type)
+            self.total = selection.total
+            indices = selection.indices
+        else:
+            self.total = getattr(open_image(image_bytes), "n_frames", 1)
+
+        self._frames = iter_image_frames(image_bytes, content_type=content_type, indices=indices, min_side=min_side)
+
+    def __iter__(self) -> Iterator[tuple[int, Image.Image]]:
+        for frame in self._frames:
+            self.decoded += 1
+            yield frame
+
+
+def decode_image(image_bytes: bytes, *, content_type: str | None, min_side: int | None = None) -> DecodedImage:
+    """Decode a still, or the keyframes of an animated image, to RGB, optionally downscaled to ``min_side``."""
+
+    lazy = LazyFrames(image_bytes, content_type=content_type, min_side=min_side)
+    return DecodedImage(frames=list(lazy), frames_total=lazy.total, animated=lazy.animated)
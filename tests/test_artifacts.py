@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import hashlib
+import os
+from typing import TYPE_CHECKING
+
+import pytest
+
+from pppp import artifacts
+from pppp.settings import settings
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+@pytest.fixture
+def cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    monkeypatch.setattr(settings, "model_cache_dir", str(tmp_path))
+    monkeypatch.setattr(artifacts, "_verified_here", {})
+    model = tmp_path / "paddle" / "en" / "det" / "inference.pdiparams"
+    model.parent.mkdir(parents=True)
+    model.write_bytes(b"weights")
+    artifacts.record(tmp_path / "paddle")
+    return tmp_path
+
+
+@pytest.fixture
+def hashed(monkeypatch: pytest.MonkeyPatch) -> list[Path]:
+    calls: list[Path] = []
+    sha256_file = artifacts.sha256_file
+
+    def counting(path: Path) -> str:
+        calls.append(path)
+        return sha256_file(path)
+
+    monkeypatch.setattr(artifacts, "sha256_file", counting)
+    return calls
+
+
+def test_record_remembers_the_checksum_it_just_computed(cache: Path, hashed: list[Path]) -> None:
+    assert artifacts.read_manifest() == {"paddle/en/det/inference.pdiparams": hashlib.sha256(b"weights").hexdigest()}
+
+    artifacts.verify(cache / "paddle")
+    artifacts.verify_cache()
+
+    assert hashed == []
+
+
+def test_a_changed_file_is_hashed_again_and_rejected(cache: Path, hashed: list[Path]) -> None:
+    model = cache / "paddle" / "en" / "det" / "inference.pdiparams"
+    model.write_bytes(b"tampered")
+
+    with pytest.raises(artifacts.ArtifactError, match="expected"):
+        artifacts.verify(cache / "paddle")
+    assert hashed == [model]
+
+
+def test_a_touched_but_intact_file_is_hashed_once(cache: Path, hashed: list[Path]) -> None:
+    model = cache / "paddle" / "en" / "det" / "inference.pdiparams"
+    os.utime(model, ns=(0, 0))
+
+    artifacts.verify(cache / "paddle")
+    artifacts.verify(cache / "paddle")
+
+    assert hashed == [model]
+
+
+def test_a_read_only_cache_still_remembers_in_process(
+    cache: Path, hashed: list[Path], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    model = cache / "paddle" / "en" / "det" / "inference.pdiparams"
+    os.utime(model, ns=(0, 0))
+
+    def read_only(**_kwargs: object) -> tuple[int, str]:
+        raise PermissionError("read-only file system")
+
+    monkeypatch.setattr(artifacts.tempfile, "mkstemp", read_only)
+    artifacts.verify(cache / "paddle")
+    artifacts.verify(cache / "paddle")
+
+    assert hashed == [model]
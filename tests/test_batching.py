@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from pppp import metrics
+from pppp.engine.batching import MicroBatcher
+
+
+class Recorder:
+    """A run_batch that doubles its inputs and remembers every batch it was given."""
+
+    def __init__(self) -> None:
+        self.batches: list[list[int]] = []
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, items: list[int]) -> list[int]:
+        self.entered.set()
+        self.release.wait(5)
+        self.batches.append(list(items))
+        return [2 * item for item in items]
+
+
+def test_submit_returns_outputs_in_order() -> None:
+    run = Recorder()
+    batcher = MicroBatcher("test", run, max_batch_size=8, max_wait_ms=0)
+
+    assert batcher.submit([1, 2, 3]) == [2, 4, 6]
+    assert sum(len(batch) for batch in run.batches) == 3
+
+
+def test_concurrent_callers_share_batches_up_to_max_batch_size() -> None:
+    run = Recorder()
+    # hold the model while the callers queue up, so the next batches are full
+    run.release.clear()
+    batcher = MicroBatcher("test", run, max_batch_size=4, max_wait_ms=50)
+    blocker = threading.Thread(target=batcher.submit, args=([0],))
+    blocker.start()
+    assert run.entered.wait(5)
+
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        futures = [pool.submit(batcher.submit, [i]) for i in range(1, 11)]
+        for _ in range(5000):
+            if batcher._queue.qsize() == 10:
+                break
+            time.sleep(0.001)
+        run.release.set()
+        outputs = [f.result(timeout=5) for f in futures]
+    blocker.join(5)
+
+    assert outputs == [[2 * i] for i in range(1, 11)]
+    assert [len(batch) for batch in run.batches] == [1, 4, 4, 2]
+    stats = batcher.stats()
+    assert stats["batches"] == 4
+    assert stats["items"] == 11
+    assert stats["batch_sizes"] == {1: 1, 2: 1, 4: 2}
+
+
+def test_waits_at_most_max_wait_for_a_batch_to_fill() -> None:
+    run = Recorder()
+    batcher = MicroBatcher("test", run, max_batch_size=64, max_wait_ms=5)
+
+    assert batcher.submit([7]) == [14]
+    assert run.batches == [[7]]
+
+
+def test_batch_size_and_wait_are_exported() -> None:
+    batcher = MicroBatcher("metrics-test", Recorder(), max_batch_size=8, max_wait_ms=0)
+    batcher.submit([1, 2, 3])
+
+    exported = metrics.render()
+    assert 'pppp_batch_size_sum{engine="metrics-test"} 3' in exported
+    assert 'pppp_batch_wait_seconds_count{engine="metrics-test"} 3' in exported
+
+
+def test_a_failing_batch_fails_every_caller_in_it() -> None:
+    def run(_items: list[int]) -> list[int]:
+        raise ValueError("model exploded")
+
+    batcher = MicroBatcher("test", run, max_batch_size=8, max_wait_ms=0)
+
+    with pytest.raises(ValueError, match="model exploded"):
+        batcher.submit([1, 2])
+    # the loop survives a failed batch
+    with pytest.raises(ValueError, match="model exploded"):
+        batcher.submit([3])
+
+
+def test_a_batch_with_the_wrong_number_of_outputs_is_an_error() -> None:
+    batcher = MicroBatcher("test", lambda items: items[:-1], max_batch_size=8, max_wait_ms=0)
+
+    with pytest.raises(RuntimeError, match="outputs for"):
+        batcher.submit([1, 2])
+
+
+def test_max_batch_size_is_at_least_one() -> None:
+    batcher = MicroBatcher("test", Recorder(), max_batch_size=0, max_wait_ms=-1)
+
+    assert batcher.max_batch_size == 1
+    assert batcher.max_wait_s == 0.0
+    assert batcher.submit([5, 6]) == [10, 12]
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+from pppp.engine.dedup import LineMerger, TextIndex, merge_tiles, shingles
+
+
+def _line(text: str, box: tuple[float, float, float, float], confidence: float = 0.9) -> dict:
+    x0, y0, x1, y1 = box
+    return {"text": text, "box": [[x0, y0], [x1, y0], [x1, y1], [x0, y1]], "confidence": confidence}
+
+
+def test_shingles_normalize_case_and_whitespace() -> None:
+    assert shingles("Hello  World") == shingles("hello world")
+    assert shingles("ab") == frozenset({"ab"})
+    assert shingles("   ") == frozenset()
+
+
+def test_text_index_finds_near_duplicates_most_similar_first() -> None:
+    index = TextIndex(threshold=0.5)
+    exact = index.add(shingles("the quick brown fox"))
+    typo = index.add(shingles("the quick brown f0x"))
+    index.add(shingles("something else entirely"))
+
+    matches = index.similar(shingles("the quick brown fox"))
+
+    assert [entry for entry, _sim in matches] == [exact, typo]
+    assert matches[0][1] == 1.0
+    assert len(index) == 3
+
+
+def test_text_index_seen() -> None:
+    index = TextIndex(threshold=0.8)
+    index.add(shingles("limited time offer"))
+
+    assert index.seen(shingles("Limited  time offer"))
+    assert not index.seen(shingles("unlimited rice flour"))
+    # an empty text is never a duplicate, even of another empty text
+    index.add(frozenset())
+    assert not index.seen(frozenset())
+
+
+def test_merge_tiles_keeps_the_whole_line_over_the_cut_one() -> None:
+    left = (0.0, 0.0, 600.0, 100.0)
+    right = (500.0, 0.0, 1100.0, 100.0)
+    # the line runs across the seam: the left tile reads it whole, the right one only its tail
+    whole = _line("a line across the seam", (400, 10, 580, 30), confidence=0.8)
+    tail = _line("the seam", (500, 10, 580, 30), confidence=0.95)
+    only_left = _line("left only", (10, 50, 100, 70))
+    only_right = _line("right only", (900, 50, 1000, 70))
+
+    merged = merge_tiles([(left, [whole, only_left]), (right, [tail, only_right])])
+
+    assert merged == [whole, only_left, only_right]
+
+
+def test_merge_tiles_equal_boxes_keep_the_more_confident_reading() -> None:
+    top = (0.0, 0.0, 100.0, 300.0)
+    bottom = (0.0, 200.0, 100.0, 500.0)
+    a = _line("rcad", (10, 220, 90, 240), confidence=0.6)
+    b = _line("read", (10, 220, 90, 240), confidence=0.9)
+
+    assert merge_tiles([(top, [a]), (bottom, [b])]) == [b]
+
+
+def test_merge_tiles_leaves_tiles_that_do_not_overlap_alone() -> None:
+    a = _line("same text", (10, 10, 90, 30))
+    b = _line("same text", (110, 10, 190, 30))
+
+    assert merge_tiles([((0, 0, 100, 100), [a]), ((100, 0, 200, 100), [b])]) == [a, b]
+
+
+def test_line_merger_joins_a_line_across_frames() -> None:
+    merger = LineMerger(threshold=0.5)
+    merger.add(0, [_line("SALE ENDS SOON", (10, 10, 200, 40), confidence=0.7)])
+    merger.add(1, [_line("SALE ENDS S0ON", (12, 11, 201, 41), confidence=0.9)])
+    merger.add(2, [_line("SALE ENDS SOON", (11, 10, 200, 40), confidence=0.8)])
+
+    (line,) = merger.lines()
+    assert line["frames"] == [0, 1, 2]
+    # the most confident reading wins
+    assert line["text"] == "SALE ENDS S0ON"
+    assert line["confidence"] == 0.9
+
+
+def test_line_merger_keeps_the_same_text_at_another_position() -> None:
+    merger = LineMerger(threshold=0.7)
+    merger.add(0, [_line("caption", (10, 10, 100, 30))])
+    merger.add(1, [_line("caption", (10, 400, 100, 420))])
+    merger.add(2, [_line("other words", (10, 10, 100, 30))])
+
+    assert [(line["text"], line["frames"]) for line in merger.lines()] == [
+        ("caption", [0]),
+        ("caption", [1]),
+        ("other words", [2]),
+    ]
+
+
+def test_line_merger_without_boxes_merges_on_text() -> None:
+    merger = LineMerger(threshold=0.7)
+    merger.add(0, [{"text": "no box here", "box": None, "confidence": 0.5}])
+    merger.add(3, [{"text": "no box here", "box": None, "confidence": 0.4}])
+
+    (line,) = merger.lines()
+    assert line["frames"] == [0, 3]
+    assert line["confidence"] == 0.5
@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+from typing import TYPE_CHECKING
+
+import pytest
+
+from pppp.engine import executor
+from pppp.engine.executor import EnginePool, ProcessEnginePool, QueueFullError, QueueTimeoutError
+from pppp.settings import settings
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+
+async def _settle(pool: EnginePool) -> None:
+    # a slot is given back by a done callback on the worker thread, shortly after the result
+    for _ in range(500):
+        if pool.pending == 0:
+            return
+        await asyncio.sleep(0.01)
+
+
+def test_submit_returns_the_result_and_frees_the_slot() -> None:
+    pool = EnginePool("test", concurrency=2, max_queue=0)
+
+    async def run() -> None:
+        submission = await pool.submit(lambda x: x + 1, 41)
+        assert submission.result == 42
+        assert submission.queue_ms >= 0
+        await _settle(pool)
+
+    asyncio.run(run())
+    assert (pool.pending, pool.running) == (0, 0)
+    pool.shutdown()
+
+
+def test_rejects_past_concurrency_plus_queue_with_429() -> None:
+    pool = EnginePool("test", concurrency=1, max_queue=1)
+    release = threading.Event()
+
+    async def run() -> None:
+        running = asyncio.ensure_future(pool.submit(release.wait, 5))
+        queued = asyncio.ensure_future(pool.submit(release.wait, 5))
+        await asyncio.sleep(0.05)
+
+        with pytest.raises(QueueFullError) as rejected:
+            await pool.submit(release.wait, 5)
+        assert rejected.value.status_code == 429
+        assert rejected.value.retry_after_s == settings.inference_retry_after_s
+
+        release.set()
+        await asyncio.gather(running, queued)
+        await _settle(pool)
+        # admitted again once the slots are back
+        assert (await pool.submit(lambda: "ok")).result == "ok"
+
+    asyncio.run(run())
+    assert pool.pending == 0
+    pool.shutdown()
+
+
+def test_a_job_queued_past_the_timeout_fails_with_503(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "inference_queue_timeout_s", 0.05)
+    pool = EnginePool("test", concurrency=1, max_queue=1)
+    ran = []
+
+    async def run() -> None:
+        slow = asyncio.ensure_future(pool.submit(time.sleep, 0.2))
+        await asyncio.sleep(0.01)
+        with pytest.raises(QueueTimeoutError) as timed_out:
+            await pool.submit(ran.append, "late")
+        assert timed_out.value.status_code == 503
+        await slow
+        await _settle(pool)
+
+    asyncio.run(run())
+    # the job that waited too long never ran
+    assert ran == []
+    assert pool.pending == 0
+    pool.shutdown()
+
+
+def test_iterate_gives_the_slot_back_when_the_consumer_stops_early() -> None:
+    pool = EnginePool("test", concurrency=1, max_queue=0)
+    closed = threading.Event()
+
+    def endless() -> Iterator[int]:
+        try:
+            i = 0
+            while True:
+                yield i
+                i += 1
+                time.sleep(0.001)
+        finally:
+            closed.set()
+
+    async def run() -> list[int]:
+        seen = []
+        items = pool.iterate(endless)
+        async for item in items:
+            seen.append(item)
+            if len(seen) == 3:
+                break
+        await items.aclose()
+        await _settle(pool)
+        return seen
+
+    assert asyncio.run(run()) == [0, 1, 2]
+    assert closed.wait(5)
+    assert pool.pending == 0
+    pool.shutdown()
+
+
+def test_iterate_passes_items_and_errors_through() -> None:
+    pool = EnginePool("test", concurrency=1, max_queue=0)
+
+    def failing() -> Iterator[str]:
+        yield "first"
+        raise ValueError("frame 2 is broken")
+
+    async def run() -> list[str]:
+        seen = []
+
+        async def consume() -> None:
+            async for item in pool.iterate(failing):
+                seen.append(item)  # noqa: PERF401
+
+        with pytest.raises(ValueError, match="frame 2"):
+            await consume()
+        await _settle(pool)
+        return seen
+
+    assert asyncio.run(run()) == ["first"]
+    assert pool.pending == 0
+    pool.shutdown()
+
+
+def test_start_returns_once_every_worker_process_is_up() -> None:
+    pool = ProcessEnginePool("test", workers=3, max_queue=0, loader="time:time")
+
+    async def run() -> set[int]:
+        await pool.start()
+        # every worker is loaded, so a round of these lands one on each
+        futures = [asyncio.wrap_future(pool._pool.submit(executor._wait_for_siblings)) for _ in range(3)]
+        return set(await asyncio.gather(*futures))
+
+    try:
+        assert len(asyncio.run(run())) == 3
+    finally:
+        pool.shutdown()
+
+
+def test_start_fails_when_a_worker_cannot_load_its_model() -> None:
+    pool = ProcessEnginePool("test", workers=2, max_queue=0, loader="time:no_such_loader")
+
+    try:
+        with pytest.raises(BrokenProcessPool):
+            asyncio.run(pool.start())
+    finally:
+        pool.shutdown()
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import io
+
+import pytest
+from PIL import Image
+
+from pppp.api.image_io import _signature_mime_type
+
+
+@pytest.mark.parametrize(
+    ("fmt", "mime_type"),
+    [
+        ("PNG", "image/png"),
+        ("JPEG", "image/jpeg"),
+        ("GIF", "image/gif"),
+        ("BMP", "image/bmp"),
+        ("WEBP", "image/webp"),
+        ("TIFF", "image/tiff"),
+    ],
+)
+def test_images_pillow_writes_are_recognized(fmt: str, mime_type: str) -> None:
+    buf = io.BytesIO()
+    Image.new("RGB", (4, 3), "red").save(buf, format=fmt)
+
+    assert _signature_mime_type(buf.getvalue()) == mime_type
+
+
+def _bmp(dib_header_size: int) -> bytes:
+    # 14 bytes of file header, then the DIB header starting with its own size
+    return b"BM" + bytes(12) + dib_header_size.to_bytes(4, "little") + bytes(dib_header_size - 4)
+
+
+@pytest.mark.parametrize(
+    ("data", "mime_type"),
+    [
+        (b"II*\x00" + bytes(4), "image/tiff"),
+        (b"MM\x00*" + bytes(4), "image/tiff"),
+        # the two byte orders each need their own magic number order
+        (b"II\x00*" + bytes(4), None),
+        (b"MM*\x00" + bytes(4), None),
+        (b"GIF87a", "image/gif"),
+        (b"RIFF" + bytes(4) + b"WEBPVP8 ", "image/webp"),
+        # RIFF holds other things too
+        (b"RIFF" + bytes(4) + b"WAVEfmt ", None),
+        (_bmp(12), "image/bmp"),
+        (_bmp(40), "image/bmp"),
+        (_bmp(124), "image/bmp"),
+        # text that happens to start with BM
+        (b"BMW owners club minutes, 2024\n", None),
+        (_bmp(41), None),
+    ],
+)
+def test_signatures(data: bytes, mime_type: str | None) -> None:
+    assert _signature_mime_type(data) == mime_type
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"",
+        b"\x89PNG\r\n",
+        b"\xff\xd8",
+        b"GIF8",
+        b"RIFF",
+        b"RIFF\x00\x00\x00\x00WEB",
+        b"BM",
+        b"BM" + bytes(12) + b"\x28\x00",
+    ],
+)
+def test_truncated_headers_are_left_to_magika(data: bytes) -> None:
+    assert _signature_mime_type(data) is None
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import io
+
+import pytest
+from fastapi import HTTPException
+from PIL import Image, ImageFile
+
+from pppp.api.image_io import sniff_image
+from pppp.settings import settings
+from pppp.utils import images
+
+
+def _encoded(size: tuple[int, int], fmt: str) -> bytes:
+    buf = io.BytesIO()
+    Image.linear_gradient("L").resize(size).convert("RGB").save(buf, format=fmt)
+    return buf.getvalue()
+
+
+def _frames(data: bytes, *, min_side: int | None, content_type: str | None = None) -> list[tuple[int, Image.Image]]:
+    return list(images.iter_image_frames(data, content_type=content_type, min_side=min_side))
+
+
+@pytest.mark.parametrize(
+    ("min_side", "size"),
+    [(None, (1000, 700)), (700, (1000, 700)), (350, (500, 350)), (200, (334, 234)), (100, (143, 100))],
+)
+def test_reduce_shrinks_by_a_whole_factor_keeping_both_sides_at_least_min_side(
+    min_side: int | None, size: tuple[int, int]
+) -> None:
+    im = Image.new("RGB", (1000, 700))
+
+    reduced = images._reduce(im, min_side)
+
+    assert reduced.size == size
+    assert min(reduced.size) >= (min_side or 0)
+    if size == im.size:
+        assert reduced is im
+
+
+def test_jpegs_are_decoded_at_a_smaller_scale_never_below_min_side() -> None:
+    # draft mode decodes at 1/2 (1/4 would be 250x175), which is then too small to reduce further;
+    # decoded at full size, the same photo is box-reduced by 3
+    [(_index, jpeg)] = _frames(_encoded((1000, 700), "JPEG"), min_side=200)
+    [(_index, png)] = _frames(_encoded((1000, 700), "PNG"), min_side=200)
+
+    assert jpeg.size == (500, 350)
+    assert png.size == (334, 234)
+    assert jpeg.mode == png.mode == "RGB"
+
+
+@pytest.mark.parametrize("min_side", [64, 300, 699, 700, 1000])
+def test_decoded_frames_keep_min_side_or_their_own_size(min_side: int) -> None:
+    for fmt in ("JPEG", "PNG"):
+        [(_index, rgb)] = _frames(_encoded((1000, 700), fmt), min_side=min_side)
+
+        assert min(rgb.size) >= min(min_side, 700)
+
+
+def test_without_min_side_images_are_decoded_at_full_size() -> None:
+    [(_index, rgb)] = _frames(_encoded((1000, 700), "JPEG"), min_side=None)
+
+    assert rgb.size == (1000, 700)
+
+
+def test_gif_frames_are_reduced_too() -> None:
+    buf = io.BytesIO()
+    frames = [Image.new("RGB", (400, 300), color) for color in ("red", "blue")]
+    frames[0].save(buf, format="GIF", save_all=True, append_images=frames[1:])
+
+    decoded = _frames(buf.getvalue(), min_side=100, content_type="image/gif")
+
+    assert [(index, rgb.size) for index, rgb in decoded] == [(0, (134, 100)), (1, (134, 100))]
+
+
+def test_oversized_images_are_refused_from_their_header(monkeypatch: pytest.MonkeyPatch) -> None:
+    data = _encoded((1000, 700), "PNG")
+    monkeypatch.setattr(settings, "max_image_pixels", 1000 * 700 - 1)
+
+    def load(_im: ImageFile.ImageFile) -> None:
+        raise AssertionError("decoded an image it should have refused")
+
+    monkeypatch.setattr(ImageFile.ImageFile, "load", load)
+
+    with pytest.raises(images.ImageTooLargeError, match="1000x700"):
+        images.open_image(data)
+    with pytest.raises(HTTPException) as e:
+        sniff_image(data)
+    assert e.value.status_code == 413
+
+
+def test_an_image_at_the_pixel_limit_is_opened(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "max_image_pixels", 1000 * 700)
+
+    assert images.open_image(_encoded((1000, 700), "PNG")).size == (1000, 700)
+
+
+def _gif(frames: list[Image.Image]) -> bytes:
+    buf = io.BytesIO()
+    frames[0].save(buf, format="GIF", save_all=True, append_images=frames[1:], duration=100, loop=0)
+    return buf.getvalue()
+
+
+def _scene(caption: int | None = None, *, speck: int = 0) -> Image.Image:
+    """A 256x256 gradient, with a white caption box at position ``caption`` and a one-pixel speck of noise."""
+
+    frame = Image.linear_gradient("L").copy()
+    if caption is not None:
+        frame.paste(255, (16 + 24 * caption, 200, 56 + 24 * caption, 232))
+    # pillow merges frames that are exactly alike, a speck keeps them apart without being a change
+    frame.putpixel((speck, 0), 40)
+    return frame
+
+
+def test_frames_that_barely_change_collapse_into_one() -> None:
+    selection = images.select_keyframes(_gif([_scene(speck=i) for i in range(5)]), content_type="image/gif")
+
+    assert (selection.indices, selection.total, selection.skipped) == ([0], 5, 4)
+
+
+def test_a_caption_change_is_kept() -> None:
+    frames = [_scene(speck=0), _scene(speck=1), _scene(0, speck=2), _scene(0, speck=3), _scene(1, speck=4)]
+
+    selection = images.select_keyframes(_gif(frames), content_type="image/gif")
+
+    assert selection.indices == [0, 2, 4]
+
+
+def test_keyframes_are_thinned_to_max_frames_evenly(monkeypatch: pytest.MonkeyPatch) -> None:
+    data = _gif([_scene(i % 8, speck=i) for i in range(10)])
+
+    assert images.select_keyframes(data, content_type="image/gif").indices == list(range(10))
+    assert images.select_keyframes(data, content_type="image/gif", max_frames=4).indices == [0, 3, 6, 9]
+    monkeypatch.setattr(settings, "keyframe_max_frames", 1)
+    assert images.select_keyframes(data, content_type="image/gif").indices == [0]
+
+
+def test_a_still_is_its_own_only_keyframe() -> None:
+    selection = images.select_keyframes(_encoded((64, 64), "PNG"), content_type="image/png")
+
+    assert (selection.indices, selection.total) == ([0], 1)
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import TYPE_CHECKING
+
+import pytest
+from fastapi import HTTPException
+
+from pppp.api import jobs as jobs_api
+from pppp.engine.executor import EngineBusyError
+from pppp.jobs import runner
+from pppp.jobs.backends import Job, MemoryJobQueue, SqliteJobQueue
+from pppp.settings import settings
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from pppp.jobs.backends import JobQueue
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def queue(request: pytest.FixtureRequest, tmp_path: Path) -> JobQueue:
+    if request.param == "sqlite":
+        return SqliteJobQueue(str(tmp_path / "jobs" / "jobs.sqlite3"))
+    return MemoryJobQueue()
+
+
+def _job(job_id: str, *, priority: int = 0, created_at: float = 0.0, image: bytes | None = b"png") -> Job:
+    return Job(
+        id=job_id,
+        kind="ocr",
+        params={"verbose": False},
+        priority=priority,
+        created_at=created_at or time.time(),
+        image_bytes=image,
+    )
+
+
+def test_claims_highest_priority_first_then_oldest(queue: JobQueue) -> None:
+    queue.put(_job("low", priority=-5, created_at=1.0))
+    queue.put(_job("second", created_at=3.0))
+    queue.put(_job("first", created_at=2.0))
+    queue.put(_job("urgent", priority=10, created_at=4.0))
+
+    claimed = [queue.claim(lease_s=60) for _ in range(5)]
+
+    assert [job.id if job else None for job in claimed] == ["urgent", "first", "second", "low", None]
+    assert all(job.status == "running" and job.attempts == 1 for job in claimed if job)
+    assert queue.pending() == 0
+
+
+def test_round_trips_a_job(queue: JobQueue) -> None:
+    job = _job("a", priority=3)
+    queue.put(job)
+
+    assert queue.get("a") == job
+    assert queue.get("missing") is None
+
+
+def test_finish_records_the_outcome_and_drops_the_image(queue: JobQueue) -> None:
+    queue.put(_job("ok"))
+    queue.put(_job("bad"))
+    queue.claim(lease_s=60)
+    queue.claim(lease_s=60)
+
+    done = queue.finish("ok", result={"text": "hi"}, error=None)
+    failed = queue.finish("bad", result=None, error={"status_code": 400, "detail": "not an image"})
+
+    assert done is not None
+    assert (done.status, done.result, done.image_bytes) == ("succeeded", {"text": "hi"}, None)
+    assert failed is not None
+    assert (failed.status, failed.error) == ("failed", {"status_code": 400, "detail": "not an image"})
+    assert queue.get("ok") == done
+    assert queue.stats() == {"succeeded": 1, "failed": 1}
+
+
+def test_an_expired_lease_is_claimed_again(queue: JobQueue) -> None:
+    queue.put(_job("a", created_at=1.0))
+    queue.put(_job("b", created_at=2.0))
+
+    first = queue.claim(lease_s=0.05)
+    assert first is not None
+    assert first.id == "a"
+    time.sleep(0.1)
+
+    # the worker holding "a" stopped renewing, so it goes before the younger "b"
+    again = queue.claim(lease_s=60)
+    assert again is not None
+    assert (again.id, again.attempts) == ("a", 2)
+    assert queue.claim(lease_s=60).id == "b"
+
+
+def test_a_renewed_lease_is_not_claimed_again(queue: JobQueue) -> None:
+    queue.put(_job("a"))
+    job = queue.claim(lease_s=0.2)
+    assert job is not None
+
+    for _ in range(3):
+        time.sleep(0.1)
+        queue.renew("a", lease_s=0.2)
+        assert queue.claim(lease_s=60) is None
+
+
+def test_a_finished_job_is_not_reclaimed(queue: JobQueue) -> None:
+    queue.put(_job("a"))
+    queue.claim(lease_s=0.01)
+    queue.finish("a", result={}, error=None)
+    time.sleep(0.05)
+
+    assert queue.claim(lease_s=60) is None
+    assert queue.get("a").status == "succeeded"
+
+
+def test_purge_removes_only_jobs_finished_long_enough_ago(queue: JobQueue) -> None:
+    queue.put(_job("done"))
+    queue.put(_job("waiting"))
+    queue.claim(lease_s=60)
+    queue.finish("done", result={}, error=None)
+
+    assert queue.purge(ttl_s=60) == 0
+    time.sleep(0.02)
+    assert queue.purge(ttl_s=0.01) == 1
+    assert queue.get("done") is None
+    assert queue.get("waiting") is not None
+
+
+def test_sqlite_jobs_survive_a_restart(tmp_path: Path) -> None:
+    path = str(tmp_path / "jobs.sqlite3")
+    SqliteJobQueue(path).put(_job("a", image=b"\x89PNG"))
+
+    reopened = SqliteJobQueue(path)
+
+    assert reopened.pending() == 1
+    assert reopened.claim(lease_s=60).image_bytes == b"\x89PNG"
+
+
+def test_a_job_waits_out_a_busy_engine(monkeypatch: pytest.MonkeyPatch) -> None:
+    answers: list[object] = [EngineBusyError("paddle", "busy", retry_after_s=0)] * 2 + ["read"]
+
+    async def run_ocr(*_args: object, **_kwargs: object) -> object:
+        answer = answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    monkeypatch.setattr(runner, "run_ocr", run_ocr)
+
+    assert asyncio.run(runner.JobRunner(MemoryJobQueue())._execute(_job("a"))) == "read"
+    assert answers == []
+
+
+def test_a_job_fails_once_the_engine_stays_busy_too_long(monkeypatch: pytest.MonkeyPatch) -> None:
+    async def run_ocr(*_args: object, **_kwargs: object) -> object:
+        raise EngineBusyError("paddle", "busy", retry_after_s=1)
+
+    monkeypatch.setattr(runner, "run_ocr", run_ocr)
+    monkeypatch.setattr(settings, "job_busy_timeout_s", 0.5)
+
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(runner.JobRunner(MemoryJobQueue())._execute(_job("a")))
+    assert (e.value.status_code, e.value.detail) == (503, "the paddle engine stayed busy for 0.5s")
+
+
+@pytest.mark.parametrize(("kind", "engines"), [("tags", []), ("analyze", ["ocr", "tags"])])
+def test_jobs_for_a_disabled_engine_are_refused_at_submission(
+    monkeypatch: pytest.MonkeyPatch, kind: str, engines: list[str]
+) -> None:
+    monkeypatch.setattr(settings, "engines_enabled", ["paddle"])
+
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(jobs_api._submit(kind, params={"engines": engines}, priority=0, callback_url=None))
+    assert (e.value.status_code, e.value.detail) == (501, "the rampp engine is disabled on this server")
+
+
+def test_callback_hosts_are_checked_against_the_configured_pattern(monkeypatch: pytest.MonkeyPatch) -> None:
+    jobs_api._check_callback_url("http://LOCALHOST:8080/done")
+    with pytest.raises(HTTPException, match="not allowed"):
+        jobs_api._check_callback_url("http://example.com/done")
+
+    monkeypatch.setattr(settings, "job_callback_host_regex", "(")
+    monkeypatch.setattr(jobs_api, "_callback_host_re", jobs_api._callback_host_re.__wrapped__)
+    with pytest.raises(HTTPException, match="invalid job_callback_host_regex"):
+        jobs_api._check_callback_url("http://localhost/done")
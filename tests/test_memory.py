@@ -0,0 +1,180 @@
+"""Peak memory of each stage of a single request, against a budget per stage.
+
+A stage's peak is the process high-water mark (VmHWM, reset through /proc/self/clear_refs) above what
+was resident when it started, so it counts everything the stage touches: Python objects, Pillow and
+numpy buffers, shared memory. Budgets are multiples of the bytes the stage has to produce (the image
+for base64 and fetching, the RGB frames for the rest) plus a small fixed slack; a stage that makes an
+extra full copy goes over. Linux only.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import ctypes
+import gc
+import io
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import httpx
+import numpy as np
+import pytest
+from PIL import Image
+
+from pppp.api import image_io
+from pppp.engine import shm
+from pppp.utils.images import decode_image
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator
+
+_STATUS = Path("/proc/self/status")
+_CLEAR_REFS = Path("/proc/self/clear_refs")
+
+# strips, codec state and allocator overhead that do not grow with the image
+SLACK = 4 * 2**20
+
+pytestmark = pytest.mark.skipif(not _CLEAR_REFS.exists(), reason="needs /proc/self/clear_refs to reset VmHWM")
+
+try:
+    _malloc_trim = ctypes.CDLL("libc.so.6").malloc_trim
+except (OSError, AttributeError):
+    _malloc_trim = None
+
+
+def _status_kb(field: str) -> int:
+    for line in _STATUS.read_text().splitlines():
+        if line.startswith(f"{field}:"):
+            return int(line.split()[1])
+    raise KeyError(field)
+
+
+def measure[T](fn: Callable[[], T]) -> tuple[T, int]:
+    """Run ``fn`` and return (its result, peak bytes it added to RSS)."""
+
+    gc.collect()
+    if _malloc_trim is not None:
+        # hand freed heap back to the OS, or the stage reuses it and looks cheaper than it is
+        _malloc_trim(0)
+    _CLEAR_REFS.write_text("5")
+    before = _status_kb("VmRSS")
+    result = fn()
+    return result, max(0, _status_kb("VmHWM") - before) * 1024
+
+
+@pytest.fixture(scope="module")
+def photo() -> bytes:
+    """A noisy 4000x3000 JPEG, a phone photo that barely compresses."""
+
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 256, (3000, 4000, 3), dtype=np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(pixels).save(buf, "JPEG", quality=95)
+    return buf.getvalue()
+
+
+def _rgb_bytes(image: object) -> int:
+    return sum(im.width * im.height * 3 for _frame_index, im in image.frames)
+
+
+def test_b64_decode(photo: bytes) -> None:
+    payload = base64.b64encode(photo).decode("ascii")
+    raw, peak = measure(lambda: image_io.decode_image_b64(payload))
+
+    assert raw == photo
+    assert peak <= 1.1 * len(raw) + SLACK
+
+
+@pytest.fixture(scope="module")
+def image_server(photo: bytes) -> Iterator[str]:
+    """A local server for ``photo``, at /sized with Content-Length and at /unsized without (HTTP/1.0)."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            if self.path == "/sized":
+                self.send_header("Content-Length", str(len(photo)))
+            self.end_headers()
+            view = memoryview(photo)
+            for start in range(0, len(view), 64 * 1024):
+                self.wfile.write(view[start : start + 64 * 1024])
+
+        def log_message(self, *_args: object) -> None:
+            return
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize("path", ["/sized", "/unsized"])
+def test_fetch(photo: bytes, image_server: str, monkeypatch: pytest.MonkeyPatch, path: str) -> None:
+    async def fetch() -> bytearray:
+        client = httpx.AsyncClient()
+        monkeypatch.setattr(image_io, "_client", client)
+        try:
+            return await image_io.fetch_image(image_server + path)
+        finally:
+            await client.aclose()
+
+    # not asyncio.run, whose SIGINT check can repr the main task on 3.12, the whole result included
+    loop = asyncio.new_event_loop()
+    try:
+        data, peak = measure(lambda: loop.run_until_complete(fetch()))
+    finally:
+        loop.close()
+
+    assert data == photo
+    # without a length the buffer is appended to; realloc grows it in place when it can, and a growth
+    # step that has to move it holds both copies for a moment
+    limit = 1.1 if path == "/sized" else 2.2
+    assert peak <= limit * len(data) + SLACK
+
+
+def test_decode(photo: bytes) -> None:
+    decoded, peak = measure(lambda: decode_image(photo, content_type="image/jpeg"))
+
+    assert peak <= 1.5 * _rgb_bytes(decoded) + SLACK
+
+
+def test_to_bgr(photo: bytes) -> None:
+    paddle = pytest.importorskip("pppp.engine.paddle", exc_type=ImportError)
+    decoded = decode_image(photo, content_type="image/jpeg")
+
+    _arrays, peak = measure(lambda: [paddle._to_bgr(im) for _frame_index, im in decoded.frames])
+
+    assert peak <= 1.1 * _rgb_bytes(decoded) + SLACK
+
+
+def test_shm_pack(photo: bytes) -> None:
+    decoded = decode_image(photo, content_type="image/jpeg")
+
+    (_handle, block), peak = measure(lambda: shm.SharedFrames.pack(decoded))
+    shm.release(block)
+
+    assert peak <= 1.1 * _rgb_bytes(decoded) + SLACK
+
+
+def test_single_request(photo: bytes) -> None:
+    """A base64 request as /ocr handles it up to the engine: decode the payload, sniff, decode, pack."""
+
+    payload = base64.b64encode(photo).decode("ascii")
+
+    def request() -> int:
+        raw = image_io.decode_image_b64(payload)
+        decoded = decode_image(raw, content_type=image_io.sniff_image(raw))
+        _handle, block = shm.SharedFrames.pack(decoded)
+        shm.release(block)
+        return _rgb_bytes(decoded)
+
+    rgb, peak = measure(request)
+
+    # the image, its frames while they are decoded, and one copy of them in shared memory
+    assert peak <= 1.1 * len(photo) + (1.5 + 1.1) * rgb + SLACK
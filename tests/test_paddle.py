@@ -0,0 +1,338 @@
+from __future__ import annotations
+
+import itertools
+import math
+import threading
+import time
+from typing import TYPE_CHECKING
+
+import pytest
+from PIL import Image
+
+from pppp.settings import settings
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+paddle = pytest.importorskip("pppp.engine.paddle", exc_type=ImportError)
+
+
+def _rect(x0: float, y0: float, x1: float, y1: float) -> list[list[float]]:
+    return [[x0, y0], [x1, y0], [x1, y1], [x0, y1]]
+
+
+def _rotated(cx: float, cy: float, width: float, height: float, degrees: float) -> list[list[float]]:
+    """A width x height box centred on (cx, cy), turned clockwise by ``degrees`` (image y points down)."""
+
+    a = math.radians(degrees)
+    corners = [(-width / 2, -height / 2), (width / 2, -height / 2), (width / 2, height / 2), (-width / 2, height / 2)]
+    return [[cx + x * math.cos(a) - y * math.sin(a), cy + x * math.sin(a) + y * math.cos(a)] for x, y in corners]
+
+
+class StubOcr:
+    """The detector, classifier and recognizer of a PaddleOCR, answering with fixed boxes and readings."""
+
+    def __init__(self, boxes: list[list[list[float]]], readings: list[tuple[str, float]]) -> None:
+        self.boxes = boxes
+        self.readings = readings
+        self.classified = False
+
+    def text_detector(self, _bgr: object) -> tuple[list[list[list[float]]], float]:
+        return self.boxes, 0.0
+
+    def text_classifier(self, crops: list) -> tuple[list, list, float]:
+        self.classified = True
+        return crops, [], 0.0
+
+    def text_recognizer(self, crops: list) -> tuple[list[tuple[str, float]], float]:
+        assert len(crops) == len(self.readings)
+        return self.readings, 0.0
+
+
+def test_small_frames_are_detected_as_they_are() -> None:
+    rgb = Image.new("RGB", (settings.paddle_roi_det_max_side, 100))
+
+    small, scale = paddle._for_detection(rgb)
+
+    assert (small.size, scale) == (rgb.size, 1.0)
+
+
+def test_large_frames_are_detected_on_a_copy_at_most_det_max_side_long() -> None:
+    rgb = Image.new("RGB", (4 * settings.paddle_roi_det_max_side, 300))
+
+    small, scale = paddle._for_detection(rgb)
+
+    assert small.size == (settings.paddle_roi_det_max_side, 75)
+    assert scale == pytest.approx(0.25)
+
+
+def test_boxes_are_scaled_back_to_the_full_frame_and_clamped() -> None:
+    boxes = paddle._to_full_resolution([_rect(10, 20, 30, 40), _rect(240, 0, 251, 5)], 0.25, (1000, 400))
+
+    assert boxes[0] == _rect(40, 80, 120, 160)
+    # detector boxes can reach a little past the edge of the downscaled copy
+    assert boxes[1] == _rect(960, 0, 1000, 20)
+
+
+def test_reading_order_is_top_to_bottom_then_left_to_right() -> None:
+    right = _rect(200, 12, 300, 30)
+    left = _rect(0, 15, 100, 30)
+    below = _rect(0, 50, 100, 70)
+
+    # the top edges of right and left are within _SAME_LINE_PX, so they are one line
+    assert paddle._reading_order([below, right, left], box=lambda b: b) == [left, right, below]
+
+
+def test_reading_order_keeps_lines_apart_past_same_line_px() -> None:
+    higher = _rect(200, 10, 300, 30)
+    lower = _rect(0, 10 + paddle._SAME_LINE_PX, 100, 40)
+
+    assert paddle._reading_order([lower, higher], box=lambda b: b) == [higher, lower]
+
+
+@pytest.mark.parametrize(("degrees", "level"), [(0, True), (4, True), (-4, True), (10, False), (-30, False)])
+def test_is_level_within_the_tolerance(degrees: float, *, level: bool) -> None:
+    assert settings.paddle_roi_level_tolerance_deg == 5.0
+    assert paddle._is_level(_rotated(200, 200, 100, 20, degrees)) is level
+
+
+def test_a_negative_tolerance_counts_nothing_as_level(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "paddle_roi_level_tolerance_deg", -1.0)
+
+    assert not paddle._is_level(_rect(0, 0, 100, 20))
+
+
+def test_crop_line_cuts_a_level_box_at_full_resolution() -> None:
+    rgb = Image.new("RGB", (400, 300))
+
+    assert paddle._crop_line(rgb, _rect(10.4, 20.6, 110.2, 40.1)).size == (101, 21)
+
+
+def test_crop_line_turns_vertical_text_on_its_side() -> None:
+    rgb = Image.new("RGB", (400, 300))
+
+    # exactly _VERTICAL_RATIO times taller than wide is read as vertical
+    crop = paddle._crop_line(rgb, _rect(0, 0, 20, 20 * paddle._VERTICAL_RATIO))
+
+    assert crop.size == (30, 20)
+    assert paddle._crop_line(rgb, _rect(0, 0, 20, 29)).size == (20, 29)
+
+
+def test_crop_line_straightens_a_tilted_box() -> None:
+    rgb = Image.new("RGB", (400, 300), "white")
+    rgb.paste("black", (0, 0, 400, 150))
+
+    crop = paddle._crop_line(rgb, _rotated(200, 150, 120, 30, 20))
+
+    assert crop.size == (120, 30)
+    # straightened, the dividing line runs along the middle of the crop, dark above and light below
+    assert crop.getpixel((60, 5)) == (0, 0, 0)
+    assert crop.getpixel((60, 25)) == (255, 255, 255)
+
+
+@pytest.mark.parametrize(
+    ("length", "size", "overlap"), [(1280, 1280, 160), (1281, 1280, 160), (5000, 1280, 160), (3000, 640, 0)]
+)
+def test_tiles_cover_the_length_and_overlap_at_least_as_asked(length: int, size: int, overlap: int) -> None:
+    starts = paddle._tile_starts(length, size, overlap)
+
+    assert (starts[0], starts[-1] + size) == (0, max(length, size))
+    assert all(later - earlier <= size - overlap for earlier, later in itertools.pairwise(starts))
+
+
+def test_a_frame_no_larger_than_a_tile_is_one_tile() -> None:
+    assert paddle._tile_starts(900, 1280, 160) == [0]
+    assert paddle._tile_rects(900, 1280) == [(0, 0, 900, 1280)]
+
+
+def test_tile_rects_cover_the_frame_row_by_row(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "paddle_tile_size", 100)
+    monkeypatch.setattr(settings, "paddle_tile_overlap", 20)
+
+    rects = paddle._tile_rects(250, 150)
+
+    assert rects == [
+        (0, 0, 100, 100),
+        (75, 0, 175, 100),
+        (150, 0, 250, 100),
+        (0, 50, 100, 150),
+        (75, 50, 175, 150),
+        (150, 50, 250, 150),
+    ]
+
+
+@pytest.mark.parametrize(
+    ("size", "tiled"),
+    [
+        # neither long enough nor elongated enough
+        ((2400, 1800), False),
+        # past paddle_tile_min_long_side
+        ((2401, 1800), True),
+        # more than paddle_tile_min_aspect times longer than wide, either way round
+        ((1300, 500), True),
+        ((500, 1300), True),
+        ((1250, 500), False),
+        # elongated, but it fits in one tile anyway
+        ((1280, 100), False),
+    ],
+)
+def test_frames_are_tiled_when_long_or_elongated(size: tuple[int, int], *, tiled: bool) -> None:
+    assert paddle._needs_tiles(Image.new("RGB", size)) is tiled
+
+
+def test_tiling_can_be_turned_off(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "paddle_tile_enabled", False)
+
+    assert not paddle._needs_tiles(Image.new("RGB", (10000, 100)))
+
+
+def test_roi_path_drops_lines_below_the_drop_score_and_skips_the_classifier_for_level_text(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(settings, "paddle_min_line_confidence", 0.0)
+    rgb = Image.new("RGB", (300, 200))
+    ocr = StubOcr(
+        [_rect(0, 100, 100, 120), _rect(0, 0, 100, 20), _rect(0, 50, 100, 70)],
+        [("top", 0.6), ("middle", 0.4), ("bottom", 0.8)],
+    )
+    ocr.drop_score = 0.5
+
+    text, confidence, lines, path = paddle._ocr_roi(ocr, rgb)
+
+    assert text == "top\nbottom"
+    assert confidence == pytest.approx(0.7)
+    assert [line["box"] for line in lines] == [_rect(0, 0, 100, 20), _rect(0, 100, 100, 120)]
+    assert (path, ocr.classified) == ("roi", False)
+
+
+def test_roi_path_classifies_tilted_text() -> None:
+    ocr = StubOcr([_rotated(150, 100, 100, 20, 30)], [("tilted", 0.9)])
+
+    _text, _confidence, _lines, path = paddle._ocr_roi(ocr, Image.new("RGB", (300, 200)))
+
+    assert (path, ocr.classified) == ("roi_cls", settings.paddle_use_angle_cls)
+
+
+def test_roi_path_defaults_to_paddles_drop_score(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "paddle_min_line_confidence", 0.0)
+    ocr = StubOcr([_rect(0, 0, 100, 20), _rect(0, 50, 100, 70)], [("kept", 0.5), ("dropped", 0.49)])
+
+    assert paddle._ocr_roi(ocr, Image.new("RGB", (300, 200)))[0] == "kept"
+
+
+def test_roi_path_without_boxes_reads_nothing() -> None:
+    assert paddle._ocr_roi(StubOcr([], []), Image.new("RGB", (300, 200))) == ("", None, [], "no_text")
+
+
+@pytest.fixture
+def frame_reads(monkeypatch: pytest.MonkeyPatch) -> Iterator[list[int]]:
+    """Stub out paddle for _read_frames: a frame reads as its number, which is also in its ``info``."""
+
+    read: list[int] = []
+
+    def ocr_frame(rgb: Image.Image) -> tuple[str, float | None, list, str]:
+        # odd frames take longer, so reads finish out of order
+        time.sleep(rgb.info.get("delay", 0.02 * (rgb.info["frame"] % 2)))
+        if rgb.info.get("broken"):
+            raise ValueError(f"frame {rgb.info['frame']} is broken")
+        read.append(rgb.info["frame"])
+        return str(rgb.info["frame"]), None, [], "full"
+
+    monkeypatch.setattr(paddle, "_ocr_frame", ocr_frame)
+    monkeypatch.setattr(paddle, "_frame_pool", None)
+    yield read
+    if paddle._frame_pool is not None:
+        paddle._frame_pool.shutdown(wait=True)
+
+
+def _frame(index: int, **info: object) -> tuple[int, Image.Image]:
+    rgb = Image.new("RGB", (8, 8))
+    rgb.info.update(frame=index, **info)
+    return index, rgb
+
+
+def _frames(count: int, *, undecodable: int | None = None) -> Iterator[tuple[int, Image.Image]]:
+    for i in range(count):
+        if i == undecodable:
+            raise OSError(f"cannot decode frame {i}")
+        yield _frame(i)
+
+
+def _read_until_error(items: Iterator[tuple[int, object]], seen: list[int]) -> None:
+    for index, _item in items:
+        seen.append(index)
+
+
+def test_run_ahead_passes_items_and_raises_errors_in_place() -> None:
+    seen = []
+    with pytest.raises(OSError, match="frame 3"):
+        _read_until_error(paddle._run_ahead(_frames(10, undecodable=3), depth=2), seen)
+    assert seen == [0, 1, 2]
+
+
+def test_run_ahead_stops_the_producer_when_the_consumer_goes_away() -> None:
+    produced = []
+
+    def items() -> Iterator[int]:
+        for i in range(1000):
+            produced.append(i)
+            yield i
+
+    ahead = paddle._run_ahead(items(), depth=2)
+    assert next(ahead) == 0
+    ahead.close()
+
+    # the one taken, up to depth buffered, and at most one more waiting to be put
+    assert len(produced) <= 4
+    assert not any(t.name == "pppp-paddle-frames" for t in threading.enumerate())
+
+
+@pytest.mark.parametrize("workers", [2, 3])
+@pytest.mark.usefixtures("frame_reads")
+def test_parallel_frame_reads_match_the_serial_loop(monkeypatch: pytest.MonkeyPatch, workers: int) -> None:
+    monkeypatch.setattr(settings, "paddle_gif_parallelism", 1)
+    serial = list(paddle._read_frames(_frames(12)))
+    monkeypatch.setattr(settings, "paddle_gif_parallelism", workers)
+
+    assert list(paddle._read_frames(_frames(12))) == serial
+    assert [index for index, _read in serial] == list(range(12))
+
+
+def test_parallel_frame_reads_stop_when_the_consumer_goes_away(
+    monkeypatch: pytest.MonkeyPatch, frame_reads: list[int]
+) -> None:
+    monkeypatch.setattr(settings, "paddle_gif_parallelism", 2)
+
+    reads = paddle._read_frames(_frames(100))
+    assert next(reads)[0] == 0
+    reads.close()
+    paddle._frame_pool.shutdown(wait=True)
+
+    # what was in flight when the consumer left, not the other ninety-odd frames
+    assert len(frame_reads) <= 2 * 2 + 2
+
+
+@pytest.mark.usefixtures("frame_reads")
+def test_parallel_frame_reads_raise_errors_in_frame_order(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "paddle_gif_parallelism", 3)
+
+    def frames() -> Iterator[tuple[int, Image.Image]]:
+        yield from _frames(2)
+        # frame 2 fails after a while, frame 3 at once
+        yield _frame(2, broken=True, delay=0.1)
+        yield _frame(3, broken=True, delay=0.0)
+
+    seen = []
+    with pytest.raises(ValueError, match="frame 2 is broken"):
+        _read_until_error(paddle._read_frames(frames()), seen)
+    assert seen == [0, 1]
+
+
+@pytest.mark.usefixtures("frame_reads")
+def test_parallel_frame_reads_raise_decode_errors_after_the_frames_before(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "paddle_gif_parallelism", 2)
+
+    seen = []
+    with pytest.raises(OSError, match="frame 5"):
+        _read_until_error(paddle._read_frames(_frames(10, undecodable=5)), seen)
+    assert seen == [0, 1, 2, 3, 4]
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import math
+
+import pytest
+
+rampp = pytest.importorskip("pppp.engine.rampp", exc_type=ImportError)
+
+
+def _features(*frames: rampp.FrameFeatures) -> rampp.ImageFeatures:
+    return rampp._combine_frames(list(frames), start=0.0, frames_total=len(frames), frames_analyzed=len(frames))
+
+
+def test_a_tag_scoring_exactly_its_threshold_is_left_out() -> None:
+    candidates = [("cat", 0.7, 0.6), ("dog", 0.6, 0.6), ("sky", 0.5, 0.6)]
+
+    assert rampp._passing(candidates, None) == [("cat", 0.7)]
+
+
+def test_a_requested_threshold_replaces_every_tags_own() -> None:
+    candidates = [("cat", 0.7, 0.9), ("dog", 0.6, 0.1), ("sky", 0.5, 0.1)]
+
+    assert rampp._passing(candidates, 0.5) == [("cat", 0.7), ("dog", 0.6)]
+
+
+def test_tags_are_ranked_by_their_best_score_over_all_frames() -> None:
+    features = _features(
+        rampp.FrameFeatures(frame=0, embedding=[1.0, 0.0], candidates=[("cat", 0.6, 0.5), ("sky", 0.9, 0.5)]),
+        rampp.FrameFeatures(frame=3, embedding=[0.0, 1.0], candidates=[("cat", 0.95, 0.5), ("dog", 0.4, 0.5)]),
+    )
+
+    result = rampp.tags_from_features(features)
+
+    assert (result.tags, result.scores) == (["cat", "sky"], [0.95, 0.9])
+    assert (result.frames_total, result.frames_analyzed) == (2, 2)
+
+
+def test_top_k_keeps_the_best_tags_and_zero_keeps_all() -> None:
+    candidates = [("a", 0.9, 0.0), ("b", 0.8, 0.0), ("c", 0.7, 0.0)]
+    features = _features(rampp.FrameFeatures(frame=0, embedding=[1.0], candidates=candidates))
+
+    assert rampp.tags_from_features(features, top_k=2).tags == ["a", "b"]
+    assert rampp.tags_from_features(features, top_k=0).tags == ["a", "b", "c"]
+
+
+def test_the_image_embedding_is_the_normalized_mean_of_its_frames() -> None:
+    features = _features(
+        rampp.FrameFeatures(frame=0, embedding=[1.0, 0.0, 0.0], candidates=[]),
+        rampp.FrameFeatures(frame=1, embedding=[0.0, 3.0, 0.0], candidates=[]),
+    )
+
+    # the mean (0.5, 1.5, 0) then normalized, not the mean of the frames normalized one by one
+    embedding = rampp.image_embedding(features)
+
+    assert embedding == pytest.approx([0.5 / math.sqrt(2.5), 1.5 / math.sqrt(2.5), 0.0], abs=1e-6)
+    assert math.hypot(*embedding) == pytest.approx(1.0, abs=1e-5)
+
+
+def test_an_image_without_frames_or_with_a_zero_mean_has_no_direction() -> None:
+    assert rampp.image_embedding(_features()) == []
+    zero = _features(
+        rampp.FrameFeatures(frame=0, embedding=[1.0, -1.0], candidates=[]),
+        rampp.FrameFeatures(frame=1, embedding=[-1.0, 1.0], candidates=[]),
+    )
+    assert rampp.image_embedding(zero) == [0.0, 0.0]
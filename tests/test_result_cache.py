@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+
+import pytest
+
+from pppp.cache.backends import MemoryCache
+from pppp.cache.results import Computed, ResultCache, result_key
+
+
+@dataclass(frozen=True)
+class Result:
+    text: str
+
+
+def _cache() -> ResultCache:
+    return ResultCache(MemoryCache(max_bytes=1 << 20, ttl_s=60))
+
+
+def test_concurrent_misses_for_one_key_compute_once() -> None:
+    cache = _cache()
+    calls = 0
+
+    async def compute() -> Computed[Result]:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return Computed(Result(text="hello"))
+
+    async def run() -> list[tuple[Computed[Result], bool]]:
+        return await asyncio.gather(*(cache.get_or_compute("k", compute, result_type=Result) for _ in range(5)))
+
+    results = asyncio.run(run())
+
+    assert calls == 1
+    assert [computed.result for computed, _hit in results] == [Result(text="hello")] * 5
+    # only the caller whose compute ran reports a miss
+    assert sorted(hit for _computed, hit in results) == [False, True, True, True, True]
+    assert (cache.hits, cache.misses) == (4, 1)
+    assert cache.stats()["inflight"] == 0
+
+
+def test_callers_that_join_a_computation_share_what_it_found() -> None:
+    cache = _cache()
+
+    async def compute() -> Computed[Result]:
+        await asyncio.sleep(0.05)
+        return Computed(Result(text="reused"), near_duplicate=True, timings={"decode": 3})
+
+    async def never() -> Computed[Result]:
+        raise AssertionError("computed twice")
+
+    async def run() -> list[tuple[Computed[Result], bool]]:
+        first = asyncio.ensure_future(cache.get_or_compute("k", compute, result_type=Result))
+        await asyncio.sleep(0.01)
+        second = await cache.get_or_compute("k", never, result_type=Result)
+        return [await first, second]
+
+    (started, started_hit), (joined, joined_hit) = asyncio.run(run())
+
+    assert (started_hit, joined_hit) == (False, True)
+    assert joined == started == Computed(Result(text="reused"), near_duplicate=True, timings={"decode": 3})
+
+
+def test_a_stored_result_is_a_hit_without_computing() -> None:
+    cache = _cache()
+
+    async def compute() -> Computed[Result]:
+        return Computed(Result(text="first"), timings={"ocr": 5})
+
+    async def never() -> Computed[Result]:
+        raise AssertionError("computed twice")
+
+    async def run() -> tuple[tuple[Computed[Result], bool], tuple[Computed[Result], bool]]:
+        first = await cache.get_or_compute("k", compute, result_type=Result)
+        second = await cache.get_or_compute("k", never, result_type=Result)
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert first == (Computed(Result(text="first"), timings={"ocr": 5}), False)
+    # read back from the backend, so nothing was timed
+    assert second == (Computed(Result(text="first")), True)
+
+
+def test_a_failed_compute_fails_every_waiter_and_is_not_cached() -> None:
+    cache = _cache()
+    calls = 0
+
+    async def failing() -> Computed[Result]:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise ValueError("engine failed")
+
+    async def run() -> list[object]:
+        return await asyncio.gather(
+            *(cache.get_or_compute("k", failing, result_type=Result) for _ in range(3)),
+            return_exceptions=True,
+        )
+
+    outcomes = asyncio.run(run())
+
+    assert calls == 1
+    assert all(isinstance(outcome, ValueError) for outcome in outcomes)
+    assert cache.stats()["inflight"] == 0
+    assert cache.backend.get("k") is None
+
+
+def test_a_cancelled_waiter_does_not_cancel_the_shared_compute() -> None:
+    cache = _cache()
+
+    async def compute() -> Computed[Result]:
+        await asyncio.sleep(0.05)
+        return Computed(Result(text="done"))
+
+    async def run() -> tuple[Computed[Result], bool]:
+        first = asyncio.ensure_future(cache.get_or_compute("k", compute, result_type=Result))
+        second = asyncio.ensure_future(cache.get_or_compute("k", compute, result_type=Result))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == (Computed(Result(text="done")), True)
+
+
+def test_without_a_backend_nothing_is_stored() -> None:
+    cache = ResultCache(None)
+    calls = 0
+
+    async def compute() -> Computed[Result]:
+        nonlocal calls
+        calls += 1
+        return Computed(Result(text="x"))
+
+    async def run() -> None:
+        await cache.get_or_compute("k", compute, result_type=Result)
+        await cache.get_or_compute("k", compute, result_type=Result)
+
+    asyncio.run(run())
+    assert calls == 2
+
+
+def test_result_key_depends_on_engine_params_and_bytes() -> None:
+    key = result_key("paddle", b"image", {"lang": "en", "tiles": True})
+
+    assert key == result_key("paddle", b"image", {"tiles": True, "lang": "en"})
+    assert key != result_key("rampp", b"image", {"lang": "en", "tiles": True})
+    assert key != result_key("paddle", b"image", {"lang": "de", "tiles": True})
+    assert key != result_key("paddle", b"imagf", {"lang": "en", "tiles": True})
@@ -0,0 +1,16 @@
+from __future__ import annotations
+
+import pytest
+from pydantic import ValidationError
+
+from pppp.settings import Settings
+
+
+@pytest.mark.parametrize("overlap", [-1, 1280, 2000])
+def test_tile_overlap_must_leave_tiles_a_step_forward(overlap: int) -> None:
+    with pytest.raises(ValidationError, match="paddle_tile_overlap"):
+        Settings(paddle_tile_size=1280, paddle_tile_overlap=overlap)
+
+
+def test_tile_overlap_may_be_zero() -> None:
+    assert Settings(paddle_tile_size=1280, paddle_tile_overlap=0).paddle_tile_overlap == 0
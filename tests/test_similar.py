@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING
+
+import pytest
+
+from pppp.cache import similar
+from pppp.cache.similar import MemorySimilarIndex, NearDuplicateIndex, SqliteSimilarIndex, scope_key
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from pppp.cache.similar import SimilarIndex
+
+# the top bit set, so the hash does not fit a signed 64-bit sqlite integer as is
+HIGH = 0xF0E1_D2C3_B4A5_9687
+LOW = 0x0123_4567_89AB_CDEF
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_index(request: pytest.FixtureRequest, tmp_path: Path):
+    def make(*, max_distance: int = 5, max_entries: int = 1000) -> SimilarIndex:
+        if request.param == "sqlite":
+            return SqliteSimilarIndex(
+                str(tmp_path / "near.sqlite3"), max_distance=max_distance, max_entries=max_entries
+            )
+        return MemorySimilarIndex(max_distance=max_distance, max_entries=max_entries)
+
+    return make
+
+
+def _flip(phash: int, *bits: int) -> int:
+    for bit in bits:
+        phash ^= 1 << bit
+    return phash
+
+
+@pytest.mark.parametrize("max_distance", [0, 3, 5, 12])
+def test_bands_cover_every_bit_once(max_distance: int) -> None:
+    bands = similar._bands(max_distance)
+
+    assert len(bands) == max_distance + 1
+    covered = 0
+    for shift, mask in bands:
+        assert covered & (mask << shift) == 0
+        covered |= mask << shift
+    assert covered == (1 << 64) - 1
+
+
+@pytest.mark.parametrize("phash", [HIGH, LOW, (1 << 64) - 1, 0], ids=["high", "low", "all_ones", "zero"])
+def test_exact_match(make_index, phash: int) -> None:
+    index = make_index()
+    index.add("s", phash, "key")
+
+    assert index.nearest("s", phash) == ("key", 0)
+
+
+def test_signed_hash_round_trips(make_index) -> None:
+    index = make_index()
+    index.add("s", HIGH, "high")
+
+    # bits flipped on both sides of the sign bit
+    assert index.nearest("s", _flip(HIGH, 63, 1)) == ("high", 2)
+    assert similar._signed(HIGH) < 0
+    assert similar._signed(LOW) == LOW
+
+
+def test_nearest_within_max_distance(make_index) -> None:
+    index = make_index(max_distance=5)
+    index.add("s", HIGH, "far")
+    index.add("s", _flip(HIGH, 0, 20, 40), "near")
+
+    assert index.nearest("s", _flip(HIGH, 0, 20, 40, 60)) == ("near", 1)
+    # six bits from the only entry, one more than allowed
+    assert index.nearest("s", _flip(LOW, 1, 11, 21, 31, 41, 51)) is None
+    index.add("s", LOW, "low")
+    assert index.nearest("s", _flip(LOW, 1, 11, 21, 31, 41)) == ("low", 5)
+
+
+def test_scopes_do_not_match_each_other(make_index) -> None:
+    index = make_index()
+    index.add("paddle", LOW, "ocr")
+
+    assert index.nearest("rampp", LOW) is None
+    assert index.nearest("paddle", LOW) == ("ocr", 0)
+
+
+def test_memory_index_drops_the_oldest_past_max_entries() -> None:
+    index = MemorySimilarIndex(max_distance=2, max_entries=2)
+    index.add("s", 0b000, "a")
+    index.add("s", 0b111 << 20, "b")
+    index.add("s", 0b111 << 40, "c")
+
+    assert index.nearest("s", 0b000) is None
+    assert index.nearest("s", 0b111 << 40) == ("c", 0)
+    assert index.stats()["entries"] == 2
+
+
+def test_sqlite_index_trims_to_max_entries(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(similar, "_TRIM_EVERY", 4)
+    index = SqliteSimilarIndex(str(tmp_path / "near.sqlite3"), max_distance=0, max_entries=2)
+    for i in range(4):
+        index.add("s", i << 32, f"k{i}")
+
+    assert index.stats() == {"entries": 2}
+    assert index.nearest("s", 0) is None
+    assert index.nearest("s", 3 << 32) == ("k3", 0)
+
+
+def test_sqlite_indexes_with_another_max_distance_share_the_file_apart(tmp_path: Path) -> None:
+    path = str(tmp_path / "near.sqlite3")
+    SqliteSimilarIndex(path, max_distance=5, max_entries=10).add("s", LOW, "key")
+
+    other = SqliteSimilarIndex(path, max_distance=3, max_entries=10)
+    assert other.nearest("s", LOW) is None
+    other.add("s", LOW, "other")
+
+    # opening with another slicing left the first one's entries alone
+    assert SqliteSimilarIndex(path, max_distance=5, max_entries=10).nearest("s", LOW) == ("key", 0)
+    assert other.nearest("s", LOW) == ("other", 0)
+
+
+def test_near_duplicate_index_counts_hits_and_misses(make_index) -> None:
+    index = NearDuplicateIndex(make_index())
+    params = {"threshold": 0.5}
+
+    async def run() -> tuple:
+        miss = await index.find("rampp", params, HIGH)
+        await index.add("rampp", params, HIGH, "key")
+        hit = await index.find("rampp", params, _flip(HIGH, 3))
+        other = await index.find("rampp", {"threshold": 0.6}, HIGH)
+        return miss, hit, other
+
+    assert asyncio.run(run()) == (None, ("key", 1), None)
+    assert (index.hits, index.misses) == (1, 2)
+    assert scope_key("rampp", params) == scope_key("rampp", {"threshold": 0.5})